@@ -0,0 +1,64 @@
+"""Micro-benchmark: cache hit path.
+
+Compare the CPU time of a cache hit when the endpoint response is cached (the
+API Gateway response is rendered on each hit) and when the rendered response is
+cached (`cache_rendered=True`).
+
+    $ python benchmarks/bench_hit_path.py
+
+"""
+
+import os
+import time
+
+from lambda_proxy_cache.backends.memory import MemoryCache
+from lambda_proxy_cache.proxy import API
+
+body = os.urandom(64 * 1024)
+
+
+def tile(z, x, y):
+    """Return a fake tile."""
+    return ("OK", "application/x-protobuf", body)
+
+
+def create_app(**kwargs):
+    """Create app with one tile route."""
+    app = API(name="bench", cache_layer=MemoryCache(), configure_logs=False)
+    app._add_route(
+        "/tiles/<int:z>/<int:x>/<int:y>",
+        tile,
+        cors=True,
+        payload_compression_method="gzip",
+        binary_b64encode=True,
+        cache_control="public,max-age=3600",
+        **kwargs,
+    )
+    return app
+
+
+def run(app, number):
+    """Return the CPU time per hit."""
+    event = {
+        "path": "/tiles/1/2/3",
+        "httpMethod": "GET",
+        "headers": {"Accept-Encoding": "gzip, deflate, br"},
+        "queryStringParameters": {},
+    }
+    app(event, {})  # miss
+    start = time.process_time()
+    for _ in range(number):
+        app(event, {})
+    return (time.process_time() - start) / number
+
+
+if __name__ == "__main__":
+    number = 2000
+    results = {
+        "endpoint response": run(create_app(cache_compression=False), number),
+        "compressed entry": run(create_app(), number),
+        "rendered response": run(create_app(cache_rendered=True), number),
+    }
+    ref = results["endpoint response"]
+    for name, duration in results.items():
+        print(f"{name:<20} {duration * 1e6:10.1f} us/hit  x{ref / duration:.1f}")
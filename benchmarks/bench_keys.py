@@ -0,0 +1,59 @@
+"""Micro-benchmark: cache key creation.
+
+Compare the legacy `get_hash` (json.dumps + sha224) with the precompiled
+`KeyBuilder`, with and without the endpoint arguments canonicalization (as
+registered by `API._add_route`).
+
+    $ python benchmarks/bench_keys.py
+
+"""
+
+import timeit
+
+from lambda_proxy_cache.keys import KeyBuilder
+from lambda_proxy_cache.proxy import get_hash
+
+route_id = "/tiles/<int:z>/<int:x>/<int:y>-app-0.0.1"
+kwargs = {"z": 10, "x": 512, "y": 384, "scale": "2", "ext": "png", "url": "s3://a/b"}
+
+
+def tile(z: int, x: int, y: int, scale: int = 1, ext: str = "png", url: str = None):
+    """Tile endpoint."""
+
+
+builders = {
+    "blake2b/base64url": KeyBuilder(route_id),
+    "blake2b/endpoint": KeyBuilder(route_id, endpoint=tile),
+    "blake2b/binary": KeyBuilder(route_id, encoding="binary"),
+    "sha224/hex": KeyBuilder(route_id, digest="sha224", encoding="hex"),
+}
+try:
+    import xxhash
+
+    builders["xxh3_128/binary"] = KeyBuilder(
+        route_id, digest=xxhash.xxh3_128, encoding="binary"
+    )
+except ImportError:
+    pass
+
+
+def legacy():
+    """Reproduce the legacy key creation."""
+    req = kwargs.copy()
+    req.update(dict(app_route_id=route_id))
+    return get_hash(**req)
+
+
+if __name__ == "__main__":
+    number = 100000
+    results = {"get_hash (legacy)": min(timeit.repeat(legacy, number=number, repeat=5))}
+    for name, builder in builders.items():
+        results[name] = min(
+            timeit.repeat(lambda: builder.build(kwargs), number=number, repeat=5)
+        )
+
+    ref = results["get_hash (legacy)"]
+    for name, duration in results.items():
+        print(
+            f"{name:<20} {duration / number * 1e6:8.2f} us/key  x{ref / duration:.2f}"
+        )
@@ -0,0 +1,261 @@
+"""Translate request from AWS api-gateway (asyncio)."""
+
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+import json
+import time
+import asyncio
+import inspect
+import functools
+
+from lambda_proxy_cache.proxy import API, RouteEntry
+from lambda_proxy_cache.utils import get_remaining_time
+
+
+class AsyncAPI(API):
+    """
+    API with an asyncio request path.
+
+    Endpoints can be `async def` functions (other endpoints run in the event
+    loop executor). Cache layers are used through their async methods
+    (`aget`/`aset`/`aget_many`/`aset_many`), so cache writes, background
+    revalidations and prefetches run concurrently with the endpoint.
+
+    Cache writes run as tasks: at the end of the invocation, the API waits for
+    them until `flush_margin` seconds before the Lambda deadline. Revalidations,
+    prefetches and hedged computations are not waited for. The event loop is
+    kept across warm invocations, so tasks not done by then resume with the
+    next invocation.
+
+    Concurrent misses on the same key are coalesced inside the process
+    (`single_flight` leases in the cache layer are not used).
+
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        """Initialize API object."""
+        self.flush_margin = kwargs.pop("flush_margin", 0.1)
+        super(AsyncAPI, self).__init__(*args, **kwargs)
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: Set[asyncio.Future] = set()
+        self._writes: Set[asyncio.Future] = set()
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def _spawn(self, coroutine, write: bool = False) -> asyncio.Future:
+        """Run a coroutine in the background (cache writes are flushed)."""
+        tasks = self._writes if write else self._tasks
+        task = asyncio.ensure_future(coroutine)
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        return task
+
+    def _set(self, key: str, value: Any, ttl: int = None) -> None:
+        """Set item in the cache layer in the background."""
+        self._spawn(self.cache_layer.aset(key, value, ttl=ttl), write=True)
+
+    async def _run_endpoint(
+        self, route_entry: RouteEntry, function_kwargs: Dict
+    ) -> Tuple:
+        """Run (or await) the endpoint."""
+        if inspect.iscoroutinefunction(route_entry.endpoint):
+            return await route_entry.endpoint(**function_kwargs)
+
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            None, functools.partial(route_entry.endpoint, **function_kwargs)
+        )
+
+    async def _aget_response(
+        self, route_entry: RouteEntry, function_kwargs: Dict, request_hash: str
+    ) -> Tuple:
+        """Run the endpoint and store its response in the cache layer."""
+        error = None
+        start = time.time()
+        try:
+            response = await self._run_endpoint(route_entry, function_kwargs)
+        except Exception as err:
+            self.log.error(str(err))
+            error = err
+            response = (
+                "ERROR",
+                "application/json",
+                json.dumps({"errorMessage": str(err)}),
+            )
+
+        self._cache_response(
+            route_entry, request_hash, response, time.time() - start, error
+        )
+        return response
+
+    async def _afetch(
+        self, route_entry: RouteEntry, function_kwargs: Dict, request_hash: str
+    ) -> Tuple:
+        """Run the endpoint, coalescing concurrent calls on the same key."""
+        call = self._inflight.get(request_hash)
+        if call is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(call)
+
+        call = asyncio.ensure_future(
+            self._aget_response(route_entry, function_kwargs, request_hash)
+        )
+        self._inflight[request_hash] = call
+        try:
+            return await asyncio.shield(call)
+        finally:
+            self._inflight.pop(request_hash, None)
+
+    async def _aread(self, key: str, compute: Callable = None) -> Any:
+        """Get item from the cache layer, hedging slow reads when configured."""
+        if not self.hedge:
+            return await self.cache_layer.aget(key)
+
+        def read():
+            return self.cache_layer.aget(key)
+
+        if self.hedge.compute and compute:
+            # the computed response is stored even if the read wins
+            return await self.hedge.arun(
+                read, lambda: self._spawn(compute()), accept=bool
+            )
+        return await self.hedge.arun(read, read)
+
+    async def _alookup(
+        self, route_entry: RouteEntry, function_kwargs: Dict, request_hash: str
+    ) -> Tuple[Optional[Tuple], Optional[Tuple]]:
+        """Get response from the cache layer."""
+        if not self.cache_layer or route_entry.no_cache:
+            return None, None
+
+        cached = await self._aread(
+            request_hash,
+            lambda: self._afetch(route_entry, function_kwargs, request_hash),
+        )
+        response, fallback, revalidate = self._check(route_entry, cached)
+        if revalidate:
+            remaining = get_remaining_time(self.context)
+            if remaining is not None and remaining < self.revalidate_budget:
+                self.stats["revalidations_skipped"] += 1
+            elif request_hash not in self._inflight:
+                self.stats["revalidations"] += 1
+                self._spawn(self._afetch(route_entry, function_kwargs, request_hash))
+        return response, fallback
+
+    async def _acompute(
+        self, route_entry: RouteEntry, function_kwargs: Dict, semaphore
+    ) -> Tuple:
+        """Run the endpoint for a prefetched request."""
+        async with semaphore:
+            start = time.time()
+            response = await self._run_endpoint(route_entry, function_kwargs)
+            return response, time.time() - start
+
+    async def _aprefetch(
+        self, route_entry: RouteEntry, function_kwargs: Dict, request_hash: str
+    ) -> None:
+        """Compute and store the related requests missing from the cache layer."""
+        if not route_entry.prefetch or not self.cache_layer or route_entry.no_cache:
+            return
+
+        if route_entry.cache_ttl == 0:
+            return
+
+        remaining = get_remaining_time(self.context)
+        if remaining is not None and remaining < self.prefetch_budget:
+            self.stats["prefetch_skipped"] += 1
+            return
+
+        related = self._related(route_entry, function_kwargs, request_hash)
+        if not related:
+            return
+
+        cached = await self.cache_layer.aget_many(list(related))
+        self.stats["prefetch_hits"] += len(cached)
+        missing = {k: v for k, v in related.items() if k not in cached}
+        if not missing:
+            return
+
+        semaphore = asyncio.Semaphore(self.prefetch_concurrency)
+        tasks = {
+            asyncio.ensure_future(self._acompute(route_entry, kwargs, semaphore)): key
+            for key, kwargs in missing.items()
+        }
+        done, not_done = await asyncio.wait(tasks, timeout=self.prefetch_budget)
+
+        items: Dict[str, Any] = {}
+        ttl = None
+        for task in done:
+            if task.exception() is not None:
+                self.stats["prefetch_errors"] += 1
+                continue
+            response, duration = task.result()
+            if response[0] == "OK":
+                items[tasks[task]], ttl = self._entry(route_entry, response, duration)
+
+        if items:
+            self.stats["prefetch_computed"] += len(items)
+            self._spawn(self.cache_layer.aset_many(items, ttl=ttl), write=True)
+
+        for task in not_done:
+            self.stats["prefetch_timeouts"] += 1
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            task.add_done_callback(
+                functools.partial(self._store_prefetched, route_entry, tasks[task])
+            )
+
+    async def _aflush(self) -> None:
+        """Wait for the cache writes before the Lambda container is frozen."""
+        timeout = None
+        remaining = get_remaining_time(self.context)
+        if remaining is not None:
+            timeout = max(remaining - self.flush_margin, 0)
+
+        while self._writes:
+            start = time.time()
+            _, not_done = await asyncio.wait(set(self._writes), timeout=timeout)
+            if not_done:
+                self.stats["flush_timeouts"] += 1
+                return
+            if timeout is not None:
+                timeout = max(timeout - (time.time() - start), 0)
+
+    async def dispatch(self, event: Dict, context: Dict) -> Dict:
+        """Handle a request."""
+        request = self._parse_request(event, context)
+        if isinstance(request, dict):
+            return request
+
+        route_entry, function_kwargs, request_hash = request
+
+        rendered_key = self._rendered_key(route_entry, request_hash)
+        if rendered_key:
+            rendered = await self._aread(rendered_key)
+            if isinstance(rendered, dict):
+                self.stats["rendered_hits"] += 1
+                return rendered
+
+        # related requests are prefetched while this one is handled
+        self._spawn(self._aprefetch(route_entry, function_kwargs, request_hash))
+
+        response, fallback = await self._alookup(
+            route_entry, function_kwargs, request_hash
+        )
+        if not response:
+            response = await self._afetch(route_entry, function_kwargs, request_hash)
+            if fallback is not None and response[0] == "ERROR":
+                self.stats["stale_if_error"] += 1
+                response = fallback
+
+        message = self._render(route_entry, response)
+        if rendered_key:
+            self._store_rendered(route_entry, rendered_key, response, message)
+
+        await self._aflush()
+        return message
+
+    def __call__(self, event: Dict, context: Dict):
+        """Handle a request in the API event loop (kept across invocations)."""
+        if self.loop is None or self.loop.is_closed():
+            self.loop = asyncio.new_event_loop()
+        return self.loop.run_until_complete(self.dispatch(event, context))
@@ -0,0 +1,59 @@
+"""Lambda-proxy.cache shared AWS clients."""
+
+from typing import Any, Dict, Tuple
+
+import json
+import threading
+
+from boto3.session import Session as boto3_session
+from botocore.config import Config
+
+# Caching calls should fail fast and fall through to the endpoint rather than
+# wait on a slow service.
+default_config = Config(
+    tcp_keepalive=True,
+    max_pool_connections=50,
+    connect_timeout=1,
+    read_timeout=2,
+    retries={"mode": "adaptive", "max_attempts": 3},
+)
+
+_clients: Dict[Tuple[str, str], Any] = {}
+_lock = threading.Lock()
+
+
+def _registry_key(service: str, config: Config, kwargs: Dict) -> Tuple[str, str]:
+    """Return registry key for a client configuration."""
+    options = getattr(config, "_user_provided_options", {})
+    return (service, json.dumps([options, kwargs], sort_keys=True, default=str))
+
+
+def get_client(service: str, config: Config = None, **kwargs: Any):
+    """
+    Return a boto3 client, shared by the backends with the same configuration.
+
+    Session creation, credential resolution and connection pools are paid once
+    per Lambda container instead of once per backend instance.
+
+    Parameters
+    ----------
+    service: string, AWS service name (e.g. s3, dynamodb)
+    config: botocore.config.Config, merged on top of `default_config`
+    kwargs: passed directly to boto3.session.Session
+
+    """
+    config = default_config.merge(config) if config else default_config
+    key = _registry_key(service, config, kwargs)
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = boto3_session(**kwargs).client(
+                service, config=config
+            )
+    return client
+
+
+def clear_clients() -> None:
+    """Remove all shared clients."""
+    with _lock:
+        _clients.clear()
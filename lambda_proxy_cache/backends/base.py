@@ -1,13 +1,59 @@
 """Lambda-proxy.cache abc class."""
 
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
 import abc
+import asyncio
+import functools
+import contextlib
+import contextvars
+
+from lambda_proxy_cache.codecs import Codec, default_codec
+
+_raise_errors: contextvars.ContextVar = contextvars.ContextVar(
+    "raise_errors", default=False
+)
+
+
+@contextlib.contextmanager
+def raising_errors() -> Iterator[None]:
+    """
+    Make the cache layers called in this context raise their backend errors.
+
+    Used by wrappers handling the errors (e.g. CircuitBreakerCache). The calls
+    made by nested cache layers are included, other calls are not affected.
+
+    """
+    token = _raise_errors.set(True)
+    try:
+        yield
+    finally:
+        _raise_errors.reset(token)
 
 
 class LambdaProxyCacheBase(abc.ABC):
     """Abstract base class for lambda proxy cache objects."""
 
+    # Serialization of the entries (for backends storing bytes)
+    codec: Codec = default_codec
+
+    @property
+    def raise_errors(self) -> bool:
+        """
+        Raise backend errors instead of returning a miss or a failed write.
+
+        Backends (e.g. connection refused, throttling) check it in their error
+        handling. It is only set in a `raising_errors` context.
+
+        """
+        return _raise_errors.get()
+
+    def __bool__(self) -> bool:
+        """Cache layers are truthy, even when they define `__len__` and are empty."""
+        return True
+
     @abc.abstractmethod
-    def set(self, key: str, value) -> bool:
+    def set(self, key: str, value, ttl: int = None) -> bool:
         """
         Set item in db.
 
@@ -15,6 +61,8 @@ class LambdaProxyCacheBase(abc.ABC):
         ----------
         key: string
         value:
+        ttl: integer, time to live in seconds (default to the backend setting,
+            0 is expired right away and not stored)
 
         Returns
         -------
@@ -35,3 +83,133 @@ class LambdaProxyCacheBase(abc.ABC):
         -------
 
         """
+
+    def add(self, key: str, value, ttl: int = None) -> bool:
+        """
+        Set item in db only if it does not exist yet.
+
+        Backends should override this method with an atomic operation, the
+        default implementation is not.
+
+        Parameters
+        ----------
+        key: string
+        value:
+        ttl: integer, time to live in seconds (default to the backend setting,
+            0 is expired right away and not stored)
+
+        Returns
+        -------
+        bool
+
+        """
+        if self.get(key):
+            return False
+        return bool(self.set(key, value, ttl=ttl))
+
+    def delete(self, key: str) -> bool:
+        """
+        Delete item in db.
+
+        Parameters
+        ----------
+        key: string
+
+        Returns
+        -------
+        bool
+
+        """
+        return False
+
+    def set_deadline(self, deadline: Optional[float]) -> None:
+        """
+        Set the current invocation deadline.
+
+        Called by the API on each invocation. Cache layers can use it to bound
+        their calls, the default implementation ignores it.
+
+        Parameters
+        ----------
+        deadline: float, unix time (None if unknown)
+
+        """
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, Any]:
+        """
+        Get items in db.
+
+        Backends should override this method with a bulk operation, the default
+        implementation gets the items one by one.
+
+        Parameters
+        ----------
+        keys: list of string
+
+        Returns
+        -------
+        dict, found items
+
+        """
+        items = {}
+        for key in keys:
+            value = self.get(key)
+            if value:
+                items[key] = value
+        return items
+
+    def set_many(self, items: Dict[str, Any], ttl: int = None) -> List[str]:
+        """
+        Set items in db.
+
+        Backends should override this method with a bulk operation, the default
+        implementation sets the items one by one.
+
+        Parameters
+        ----------
+        items: dict, key/value mapping
+        ttl: integer, time to live in seconds (default to the backend setting,
+            0 is expired right away and not stored)
+
+        Returns
+        -------
+        list, keys which could not be stored
+
+        """
+        return [
+            key for key, value in items.items() if not self.set(key, value, ttl=ttl)
+        ]
+
+    # Async protocol: by default, the blocking methods run in the event loop
+    # executor. Backends with an async client should override these methods.
+
+    async def _run_in_executor(self, method, *args: Any, **kwargs: Any) -> Any:
+        """Run a blocking method in the event loop executor."""
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            None, functools.partial(method, *args, **kwargs)
+        )
+
+    async def aget(self, key: str):
+        """Get item in db (async)."""
+        return await self._run_in_executor(self.get, key)
+
+    async def aset(self, key: str, value, ttl: int = None) -> bool:
+        """Set item in db (async)."""
+        return await self._run_in_executor(self.set, key, value, ttl=ttl)
+
+    async def aadd(self, key: str, value, ttl: int = None) -> bool:
+        """Set item in db only if it does not exist yet (async)."""
+        return await self._run_in_executor(self.add, key, value, ttl=ttl)
+
+    async def adelete(self, key: str) -> bool:
+        """Delete item in db (async)."""
+        return await self._run_in_executor(self.delete, key)
+
+    async def aget_many(self, keys: Sequence[str]) -> Dict[str, Any]:
+        """Get items in db (async)."""
+        return await self._run_in_executor(self.get_many, keys)
+
+    async def aset_many(self, items: Dict[str, Any], ttl: int = None) -> List[str]:
+        """Set items in db (async)."""
+        return await self._run_in_executor(self.set_many, items, ttl=ttl)
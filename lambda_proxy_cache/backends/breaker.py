@@ -0,0 +1,195 @@
+"""Lambda-proxy.cache circuit breaker layer."""
+
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import time
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from lambda_proxy_cache.backends.base import LambdaProxyCacheBase, raising_errors
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class CircuitBreakerCache(LambdaProxyCacheBase):
+    """
+    Circuit breaker around a cache layer.
+
+    Calls are run with a deadline: `call_timeout` seconds, and at most the
+    invocation remaining time minus `margin` (see `set_deadline`). Calls which
+    time out, raise or are slower than `slow_call` are failures. After
+    `failure_threshold` consecutive failures the circuit opens and the cache
+    layer is skipped (reads are misses, writes are dropped) for `reset_timeout`
+    seconds. Then one probe call is let through (half-open): the circuit closes
+    if it succeeds and opens again if it fails.
+
+    Calls are run in a `raising_errors` context, so the wrapped cache layer
+    errors (e.g. connection refused, including the errors of nested cache
+    layers) are failures instead of misses. The backend instance itself is not
+    changed and still fails silently when used elsewhere.
+
+    """
+
+    def __init__(
+        self,
+        backend: LambdaProxyCacheBase,
+        failure_threshold: int = 5,
+        slow_call: float = 0.5,
+        reset_timeout: float = 30.0,
+        call_timeout: float = 1.0,
+        margin: float = 0.5,
+        max_workers: int = 8,
+    ):
+        """
+        Initialize circuit breaker.
+
+        Parameters
+        ----------
+        backend: LambdaProxyCacheBase, cache layer to protect
+        failure_threshold: integer, consecutive failures opening the circuit
+        slow_call: float, duration in seconds above which a call is a failure
+        reset_timeout: float, time in seconds the circuit stays open
+        call_timeout: float, maximum duration of a call in seconds
+        margin: float, time in seconds kept before the invocation deadline
+        max_workers: integer, number of threads running the calls
+
+        """
+        if not isinstance(backend, LambdaProxyCacheBase):
+            raise TypeError("backend must be an instance of LambdaProxyCacheBase")
+
+        self.backend = backend
+        self.failure_threshold = failure_threshold
+        self.slow_call = slow_call
+        self.reset_timeout = reset_timeout
+        self.call_timeout = call_timeout
+        self.margin = margin
+        self.state = CLOSED
+        self.stats: Counter = Counter()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._deadline: Optional[float] = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    @property
+    def timeout(self) -> Optional[int]:
+        """Wrapped cache layer default time to live."""
+        return getattr(self.backend, "timeout", None)
+
+    def set_deadline(self, deadline: Optional[float]) -> None:
+        """Set the invocation deadline (unix time)."""
+        self._deadline = deadline
+        self.backend.set_deadline(deadline)
+
+    def _allow(self) -> bool:
+        """Check if a call can go through."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+
+            if self.state == OPEN:
+                if time.time() - self._opened_at < self.reset_timeout:
+                    return False
+                self.state = HALF_OPEN
+                self._probing = False
+
+            # half-open: only one probe at a time
+            if self._probing:
+                return False
+            self._probing = True
+            self.stats["probes"] += 1
+            return True
+
+    def _record(self, success: bool) -> None:
+        """Update circuit state with a call result."""
+        with self._lock:
+            self._probing = False
+            if success:
+                self._failures = 0
+                if self.state != CLOSED:
+                    self.stats["closed"] += 1
+                self.state = CLOSED
+                return
+
+            self._failures += 1
+            self.stats["failures"] += 1
+            if self.state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.stats["opened"] += 1
+                self.state = OPEN
+                self._opened_at = time.time()
+
+    def _call_timeout(self) -> float:
+        """Return the current call deadline in seconds."""
+        timeout = self.call_timeout
+        if self._deadline is not None:
+            timeout = min(timeout, self._deadline - time.time() - self.margin)
+        return max(timeout, 0)
+
+    def _run(self, method: Callable, *args: Any, **kwargs: Any) -> Any:
+        """Call a wrapped cache layer method, raising its backend errors."""
+        with raising_errors():
+            return method(*args, **kwargs)
+
+    def _call(self, default: Any, method: Callable, *args: Any, **kwargs: Any) -> Any:
+        """Run a call with a deadline, return `default` if it is skipped or fails."""
+        if not self._allow():
+            self.stats["skipped"] += 1
+            return default
+
+        timeout = self._call_timeout()
+        if not timeout:
+            # no time left for the call (e.g. the invocation is about to time out)
+            self.stats["skipped"] += 1
+            with self._lock:
+                self._probing = False
+            return default
+
+        start = time.time()
+        future = self._executor.submit(self._run, method, *args, **kwargs)
+        try:
+            result = future.result(timeout=timeout)
+        except FutureTimeoutError:
+            self.stats["timeouts"] += 1
+            self._record(False)
+            return default
+        except Exception:
+            self.stats["errors"] += 1
+            self._record(False)
+            return default
+
+        if time.time() - start > self.slow_call:
+            self.stats["slow_calls"] += 1
+            self._record(False)
+        else:
+            self._record(True)
+        return result
+
+    def set(self, key: str, value, ttl: int = None) -> bool:
+        """Set item in the wrapped cache layer."""
+        return self._call(False, self.backend.set, key, value, ttl=ttl)
+
+    def get(self, key: str):
+        """Get item from the wrapped cache layer."""
+        return self._call(None, self.backend.get, key)
+
+    def add(self, key: str, value, ttl: int = None) -> bool:
+        """Set item in the wrapped cache layer if it does not exist."""
+        return self._call(False, self.backend.add, key, value, ttl=ttl)
+
+    def delete(self, key: str) -> bool:
+        """Delete item in the wrapped cache layer."""
+        return self._call(False, self.backend.delete, key)
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, Any]:
+        """Get items from the wrapped cache layer."""
+        return self._call({}, self.backend.get_many, keys)
+
+    def set_many(self, items: Dict[str, Any], ttl: int = None) -> List[str]:
+        """Set items in the wrapped cache layer."""
+        return self._call(list(items), self.backend.set_many, items, ttl=ttl)
@@ -0,0 +1,242 @@
+"""Lambda-proxy.cache ephemeral storage (/tmp) layer."""
+
+from typing import Dict, Optional, TextIO
+
+import os
+import json
+import mmap
+import time
+import hashlib
+import tempfile
+import threading
+from collections import Counter, OrderedDict
+
+from lambda_proxy_cache.backends.base import LambdaProxyCacheBase
+from lambda_proxy_cache.codecs import Codec
+
+
+class DiskCache(LambdaProxyCacheBase):
+    """
+    Ephemeral storage cache.
+
+    Entries are stored as files in the Lambda ephemeral storage (`/tmp`), written
+    without concatenating the codec buffers, and are read through `mmap`. By
+    default, bytes bodies are returned as a `memoryview` over the mapped file,
+    without copies.
+
+    An index (key, size, expiry), kept in LRU order, is stored next to the
+    entries so the cache can be re-opened by a new process. Index changes are
+    appended to a journal, which is compacted when it gets larger than twice
+    the number of entries, so writes do not rewrite the whole index.
+
+    """
+
+    def __init__(
+        self,
+        directory: str = None,
+        max_size: int = 512 * 1024 * 1024,
+        time: int = 3600,
+        zero_copy: bool = True,
+        codec: Codec = None,
+    ):
+        """
+        Disk-backed cache.
+
+        Parameters
+        ----------
+        directory: string, cache directory (default to /tmp/lambda-proxy-cache)
+        max_size: integer, maximum size of the stored entries in bytes
+        time: integer, entries time to live in seconds
+        zero_copy: bool, return bytes bodies as memoryview over the mapped file
+        codec: Codec, entries serialization (default to BinaryCodec)
+
+        """
+        self.directory = directory or os.path.join(
+            tempfile.gettempdir(), "lambda-proxy-cache"
+        )
+        os.makedirs(self.directory, exist_ok=True)
+
+        self.max_size = max_size
+        self.timeout = time
+        self.zero_copy = zero_copy
+        if codec:
+            self.codec = codec
+        self.stats: Counter = Counter()
+        self._lock = threading.Lock()
+        self._add_lock = threading.Lock()
+        self._journal_path = os.path.join(self.directory, "index.log")
+        self._journal: Optional[TextIO] = None
+        self._records = 0
+        self._index: OrderedDict = OrderedDict()
+        self.size = 0
+        self._load_index()
+
+    def _load_index(self) -> None:
+        """Replay on-disk index journal."""
+        try:
+            with open(self._journal_path) as f:
+                lines = f.readlines()
+        except OSError:
+            lines = []
+
+        for line in lines:
+            try:
+                op, key, *entry = json.loads(line)
+            except ValueError:
+                # partially written record
+                continue
+
+            size, _ = self._index.pop(key, (0, None))
+            self.size -= size
+            if op == "set":
+                self._index[key] = tuple(entry)
+                self.size += entry[0]
+
+        for key in list(self._index):
+            if not os.path.exists(self._path(key)):
+                self.size -= self._index.pop(key)[0]
+
+        with self._lock:
+            self._compact()
+
+    def _compact(self) -> None:
+        """Rewrite the index journal with the current entries (lock must be held)."""
+        if self._journal is not None:
+            self._journal.close()
+
+        tmp = f"{self._journal_path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            for key, (size, expires) in self._index.items():
+                f.write(json.dumps(["set", key, size, expires]) + "\n")
+        os.replace(tmp, self._journal_path)
+
+        self._journal = open(self._journal_path, "a")
+        self._records = len(self._index)
+        self.stats["compactions"] += 1
+
+    def _log(self, *record) -> None:
+        """Append an index change to the journal (lock must be held)."""
+        self._journal.write(json.dumps(record) + "\n")
+        self._journal.flush()
+        self._records += 1
+        if self._records > max(1024, 2 * len(self._index)):
+            self._compact()
+
+    def _path(self, key: str) -> str:
+        """Return entry file path."""
+        return os.path.join(self.directory, hashlib.md5(key.encode()).hexdigest())
+
+    def _remove(self, key: str) -> None:
+        """Remove entry (lock must be held)."""
+        if key not in self._index:
+            return
+
+        size, _ = self._index.pop(key)
+        self.size -= size
+        self._log("del", key)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def __len__(self) -> int:
+        """Return the number of entries."""
+        return len(self._index)
+
+    def set(self, key: str, value, ttl: int = None) -> bool:
+        """Set item in ephemeral storage."""
+        if ttl == 0:
+            # expired right away
+            return False
+
+        try:
+            buffers = self.codec.encode(value)
+            size = sum(len(memoryview(buffer).cast("B")) for buffer in buffers)
+            if size > self.max_size:
+                return False
+
+            path = self._path(key)
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.writelines(buffers)
+
+            ttl = ttl if ttl is not None else self.timeout
+            expires = time.time() + ttl if ttl else None
+            with self._lock:
+                # Replacing the file keeps already mapped (old) entries valid
+                os.replace(tmp, path)
+                if key in self._index:
+                    self.size -= self._index.pop(key)[0]
+
+                while self._index and self.size + size > self.max_size:
+                    self._remove(next(iter(self._index)))
+                    self.stats["evictions"] += 1
+
+                self._index[key] = (size, expires)
+                self.size += size
+                self._log("set", key, size, expires)
+
+            return True
+
+        except Exception:
+            return False
+
+    def add(self, key: str, value, ttl: int = None) -> bool:
+        """Set item in ephemeral storage if it does not exist."""
+        with self._add_lock:
+            entry = self._index.get(key)
+            if entry is not None and (entry[1] is None or entry[1] > time.time()):
+                return False
+            return self.set(key, value, ttl=ttl)
+
+    def delete(self, key: str) -> bool:
+        """Delete item in ephemeral storage."""
+        with self._lock:
+            deleted = key in self._index
+            self._remove(key)
+        return deleted
+
+    def get(self, key: str):
+        """Get item from ephemeral storage."""
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+
+            if entry[1] is not None and entry[1] <= time.time():
+                self._remove(key)
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return None
+
+            self._index.move_to_end(key)
+
+        try:
+            with open(self._path(key), "rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            value = self.codec.decode(memoryview(data), zero_copy=self.zero_copy)
+            self.stats["hits"] += 1
+            return value
+
+        except Exception:
+            self.stats["misses"] += 1
+            return None
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        with self._lock:
+            for key in self._index:
+                try:
+                    os.remove(self._path(key))
+                except OSError:
+                    pass
+            self._index.clear()
+            self.size = 0
+            self._compact()
+
+    def info(self) -> Dict:
+        """Return cache statistics."""
+        return dict(
+            self.stats, entries=len(self._index), size=self.size, max_size=self.max_size
+        )
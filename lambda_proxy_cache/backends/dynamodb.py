@@ -1,13 +1,28 @@
 """Lambda-proxy-cache dynamodb layer."""
 
-from typing import Dict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 import json
 import time
+import uuid
+from collections import Counter
 
-from boto3.session import Session as boto3_session
+from botocore.config import Config
 
+from lambda_proxy_cache.backends.aws import get_client
 from lambda_proxy_cache.backends.base import LambdaProxyCacheBase
+from lambda_proxy_cache.codecs import Codec
+
+# DynamoDB batch operations limits
+MAX_BATCH_GET = 100
+MAX_BATCH_WRITE = 25
+
+# DynamoDB items are limited to 400 KB (attribute names and values)
+MAX_ITEM_SIZE = 400 * 1024
+
+
+class ValueTooLarge(Exception):
+    """Value can not be stored."""
 
 
 class DynamoDBCache(LambdaProxyCacheBase):
@@ -16,40 +31,264 @@ class DynamoDBCache(LambdaProxyCacheBase):
 
     - Table primary key has to be named `key`
     - ttl has to be enable and attribute set to ttl
+    - Values larger than `max_item_size` are split in chunk items (read back
+      with BatchGetItem), or spilled to an `overflow` cache layer (e.g. S3Cache)
+      with a pointer item
 
     """
 
-    def __init__(self, table_name: str, time: int = 432000, **kwargs: Dict):
+    def __init__(
+        self,
+        table_name: str,
+        time: int = 432000,
+        codec: Codec = None,
+        max_retries: int = 3,
+        max_item_size: int = MAX_ITEM_SIZE - 10 * 1024,
+        max_chunks: int = 64,
+        overflow: Optional[LambdaProxyCacheBase] = None,
+        config: Config = None,
+        prewarm: bool = False,
+        **kwargs: Dict,
+    ):
         """
         dynamodb backed cache.
 
         Parameters
         ----------
         table_name: string, DynamoDB Table
+        time: integer, default entries time to live in seconds
+        codec: Codec, entries serialization (default to BinaryCodec)
+        max_retries: integer, retries of the unprocessed keys of batch operations
+        max_item_size: integer, maximum size of the value stored in one item
+        max_chunks: integer, maximum number of chunk items for one value (larger
+            values are not stored)
+        overflow: LambdaProxyCacheBase, cache layer storing the large values
+            instead of chunk items
+        config: botocore.config.Config, merged on top of the default client
+            configuration (keep-alive, short timeouts, adaptive retries)
+        prewarm: bool, open a connection right away (e.g. in Lambda init phase)
         kwargs: passed directly to boto3.resource('dynamodb')
 
         """
-        session = boto3_session(**kwargs)
-        self.dynamodb = session.client("dynamodb")
+        self.dynamodb = get_client("dynamodb", config=config, **kwargs)
         self.table_name = table_name
         self.timeout = time
+        self.max_retries = max_retries
+        self.max_item_size = max_item_size
+        self.max_chunks = max_chunks
+        self.overflow = overflow
+        self.stats: Counter = Counter()
+        if codec:
+            self.codec = codec
+        if prewarm:
+            self.prewarm()
 
-    def set(self, key: str, value) -> bool:
-        """Set item in DynamoDB database."""
-        ttl = int(time.time() + self.timeout)
+    def prewarm(self) -> bool:
+        """Open a connection (TLS handshake) to DynamoDB, e.g. during Lambda init."""
         try:
-            self.dynamodb.put_item(
-                TableName=self.table_name,
-                Item={
-                    "key": {"S": key},
-                    "content": {"S": json.dumps(value, default=str)},
-                    "ttl": {"N": str(ttl)},
-                },
+            self.dynamodb.describe_table(TableName=self.table_name)
+            return True
+        except Exception:
+            return False
+
+    def _items(self, key: str, value, expires: int) -> Tuple[Dict, List[Dict]]:
+        """Create DynamoDB item and its chunk items."""
+        data = self.codec.dumps(value)
+        ttl = {"N": str(expires)}
+        if len(data) <= self.max_item_size:
+            return {"key": {"S": key}, "content": {"B": data}, "ttl": ttl}, []
+
+        if self.overflow is not None:
+            if not self.overflow.set(key, value, ttl=expires - int(time.time())):
+                raise ValueTooLarge(f"Could not spill {key}")
+            self.stats["spilled"] += 1
+            return {"key": {"S": key}, "ref": {"S": key}, "ttl": ttl}, []
+
+        size = self.max_item_size
+        count = -(-len(data) // size)
+        if count > self.max_chunks:
+            raise ValueTooLarge(f"{key} is too large ({len(data)} bytes)")
+
+        # chunk keys are versioned so concurrent writes do not mix their chunks
+        version = uuid.uuid4().hex[:12]
+        view = memoryview(data)
+        chunks = []
+        for index in range(count):
+            start = index * size
+            end = start + size
+            chunks.append(
+                {
+                    "key": {"S": f"{key}#{version}#{index}"},
+                    "content": {"B": bytes(view[start:end])},
+                    "ttl": ttl,
+                }
             )
+        self.stats["chunked"] += 1
+        head = {
+            "key": {"S": key},
+            "chunks": {"N": str(count)},
+            "version": {"S": version},
+            "ttl": ttl,
+        }
+        return head, chunks
+
+    def _decode(self, item: Dict):
+        """Decode DynamoDB item, return False if it is expired."""
+        # DynamoDB does not delete expired items right away
+        if int(item["ttl"]["N"]) < time.time():
+            return False
+
+        if "ref" in item:
+            return self.overflow.get(item["ref"]["S"]) if self.overflow else False
+
+        if "chunks" in item:
+            key = item["key"]["S"]
+            version = item["version"]["S"]
+            keys = [f"{key}#{version}#{i}" for i in range(int(item["chunks"]["N"]))]
+            chunks = self._batch_get(keys)
+            if len(chunks) != len(keys):
+                return False
+            data = b"".join(chunks[k]["content"]["B"] for k in keys)
+            return self.codec.loads(data)
+
+        content = item["content"]
+        # entries written by previous versions are JSON strings
+        if "S" in content:
+            return json.loads(content["S"])
+        return self.codec.loads(content["B"])
+
+    def _backoff(self, attempt: int) -> None:
+        """Wait before retrying unprocessed keys."""
+        time.sleep(min(0.05 * 2**attempt, 1))
+
+    def _batch_get(self, keys: Sequence[str]) -> Dict[str, Dict]:
+        """Get raw items (BatchGetItem), retrying unprocessed keys."""
+        keys = list(dict.fromkeys(keys))
+        items: Dict[str, Dict] = {}
+        for start in range(0, len(keys), MAX_BATCH_GET):
+            end = start + MAX_BATCH_GET
+            request = {
+                self.table_name: {
+                    "Keys": [{"key": {"S": key}} for key in keys[start:end]]
+                }
+            }
+            attempt = 0
+            while request:
+                try:
+                    response = self.dynamodb.batch_get_item(RequestItems=request)
+                except Exception:
+                    if self.raise_errors:
+                        raise
+                    break
+
+                for item in response.get("Responses", {}).get(self.table_name, []):
+                    items[item["key"]["S"]] = item
+
+                request = response.get("UnprocessedKeys")
+                if request:
+                    if attempt >= self.max_retries:
+                        break
+                    self._backoff(attempt)
+                    attempt += 1
+
+        return items
+
+    def _batch_write(self, items: List[Dict]) -> List[str]:
+        """Put items (BatchWriteItem), return the keys which were not written."""
+        failed: List[str] = []
+        for start in range(0, len(items), MAX_BATCH_WRITE):
+            end = start + MAX_BATCH_WRITE
+            request = {
+                self.table_name: [
+                    {"PutRequest": {"Item": item}} for item in items[start:end]
+                ]
+            }
+            attempt = 0
+            while request:
+                try:
+                    response = self.dynamodb.batch_write_item(RequestItems=request)
+                except Exception:
+                    if self.raise_errors:
+                        raise
+                    break
+
+                request = response.get("UnprocessedItems")
+                if request:
+                    if attempt >= self.max_retries:
+                        break
+                    self._backoff(attempt)
+                    attempt += 1
+
+            if request:
+                failed.extend(
+                    r["PutRequest"]["Item"]["key"]["S"]
+                    for r in request[self.table_name]
+                )
+
+        return failed
+
+    def _put(self, key: str, value, expires: int, **kwargs: Any) -> bool:
+        """Put item (and its chunk items)."""
+        try:
+            item, chunks = self._items(key, value, expires)
+            if chunks and self._batch_write(chunks):
+                self.stats["write_errors"] += 1
+                return False
+
+            self.dynamodb.put_item(TableName=self.table_name, Item=item, **kwargs)
             return True
 
+        except ValueTooLarge:
+            self.stats["skipped"] += 1
+            return False
+
+        except Exception as err:
+            error = getattr(err, "response", {}).get("Error", {})
+            # `add` condition failures are not errors
+            if error.get("Code") != "ConditionalCheckFailedException":
+                self.stats["write_errors"] += 1
+                if self.raise_errors:
+                    raise
+            return False
+
+    def set(self, key: str, value, ttl: int = None) -> bool:
+        """Set item in DynamoDB database."""
+        if ttl == 0:
+            # expired right away
+            return False
+
+        ttl = ttl if ttl is not None else self.timeout
+        return self._put(key, value, int(time.time() + ttl))
+
+    def add(self, key: str, value, ttl: int = None) -> bool:
+        """Set item in DynamoDB database if it does not exist (or is expired)."""
+        if ttl == 0:
+            # expired right away
+            return False
+
+        ttl = ttl if ttl is not None else self.timeout
+        now = int(time.time())
+        return self._put(
+            key,
+            value,
+            now + ttl,
+            # DynamoDB does not delete expired items right away
+            ConditionExpression="attribute_not_exists(#k) OR #t < :now",
+            ExpressionAttributeNames={"#k": "key", "#t": "ttl"},
+            ExpressionAttributeValues={":now": {"N": str(now)}},
+        )
+
+    def delete(self, key: str) -> bool:
+        """Delete item in DynamoDB database."""
+        try:
+            self.dynamodb.delete_item(
+                TableName=self.table_name, Key={"key": {"S": key}}
+            )
+            return True
         except Exception:
-            return None
+            if self.raise_errors:
+                raise
+            return False
 
     def get(self, key: str):
         """Get item in DynamoDB database."""
@@ -57,6 +296,57 @@ class DynamoDBCache(LambdaProxyCacheBase):
             response = self.dynamodb.get_item(
                 TableName=self.table_name, Key={"key": {"S": key}}
             )
-            return json.loads(response["Item"]["content"]["S"])
         except Exception:
+            if self.raise_errors:
+                raise
             return False
+
+        try:
+            return self._decode(response["Item"])
+        except Exception:
+            return False
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, Any]:
+        """Get items in DynamoDB database (BatchGetItem)."""
+        items: Dict[str, Any] = {}
+        for key, item in self._batch_get(keys).items():
+            try:
+                value = self._decode(item)
+            except Exception:
+                continue
+            if value:
+                items[key] = value
+        return items
+
+    def set_many(self, items: Dict[str, Any], ttl: int = None) -> List[str]:
+        """Set items in DynamoDB database (BatchWriteItem)."""
+        if ttl == 0:
+            # expired right away
+            return list(items)
+
+        expires = int(time.time() + (ttl if ttl is not None else self.timeout))
+        failed: List[str] = []
+        batch: List[Dict] = []
+        for key, value in items.items():
+            try:
+                item, chunks = self._items(key, value, expires)
+            except ValueTooLarge:
+                self.stats["skipped"] += 1
+                failed.append(key)
+                continue
+            except Exception:
+                self.stats["write_errors"] += 1
+                failed.append(key)
+                continue
+
+            if chunks:
+                # chunk items have to be written before the item pointing to them
+                if self._batch_write(chunks):
+                    self.stats["write_errors"] += 1
+                    failed.append(key)
+                    continue
+            batch.append(item)
+
+        errors = self._batch_write(batch)
+        self.stats["write_errors"] += len(errors)
+        return failed + errors
@@ -1,20 +1,100 @@
 """Lambda-proxy.cache memcache layer."""
 
-from typing import Dict
+from typing import Any, Dict, List, Optional, Sequence
+
+import json
+import time
+import uuid
+import bisect
+import hashlib
+from collections import Counter, defaultdict
 
 import bmemcached
 
 from lambda_proxy_cache.backends.base import LambdaProxyCacheBase
+from lambda_proxy_cache.codecs import Codec
+
+# Memcached considers expiration times over 30 days as unix timestamps
+MAX_RELATIVE_TTL = 60 * 60 * 24 * 30
+
+# Memcached default item size limit is 1 MB (key, value and item overhead)
+MAX_ITEM_SIZE = 1024 * 1024
+
+# Value stored in place of chunked values
+CHUNKED = b"LPC-chunks:"
+
+
+def _expiration(ttl: int) -> int:
+    """Return memcached expiration time."""
+    return int(time.time() + ttl) if ttl > MAX_RELATIVE_TTL else ttl
+
+
+class HashRing(object):
+    """
+    Ketama consistent hash ring.
+
+    Each server is placed on the ring at 160 points derived from md5 digests, so
+    adding or removing a server only moves the keys of its neighbouring points.
+
+    """
+
+    def __init__(self, servers: Sequence[str], points: int = 160) -> None:
+        """Place servers on the ring."""
+        ring = []
+        for server in servers:
+            for i in range(points // 4):
+                digest = hashlib.md5(f"{server}-{i}".encode()).digest()
+                for j in range(4):
+                    start = j * 4
+                    end = start + 4
+                    ring.append((int.from_bytes(digest[start:end], "little"), server))
+
+        ring.sort()
+        self._points = [point for point, _ in ring]
+        self._servers = [server for _, server in ring]
+        self.servers = list(dict.fromkeys(servers))
+
+    def _hash(self, key: str) -> int:
+        """Return key position on the ring."""
+        return int.from_bytes(hashlib.md5(key.encode()).digest()[:4], "little")
+
+    def iter_nodes(self, key: str):
+        """Yield the distinct servers for a key, in ring order."""
+        if not self._points:
+            return
+
+        index = bisect.bisect(self._points, self._hash(key))
+        seen = set()
+        for i in range(len(self._points)):
+            server = self._servers[(index + i) % len(self._points)]
+            if server not in seen:
+                seen.add(server)
+                yield server
+                if len(seen) == len(self.servers):
+                    return
 
 
 class MemcachedCache(LambdaProxyCacheBase):
-    """Memcached Cache."""
+    """
+    Memcached Cache.
+
+    - Keys are spread over the servers with a consistent hash ring
+    - Servers failing are marked dead for `dead_retry` seconds and their keys
+      go to the next server on the ring
+    - Values larger than `max_item_size` are split in chunk keys, stored on the
+      same server and read back with one multi-get
+
+    """
 
     def __init__(
         self,
         host: str = "localhost",
         port: int = 11211,
         time: int = 432000,
+        codec: Codec = None,
+        servers: Optional[Sequence[str]] = None,
+        dead_retry: int = 30,
+        max_item_size: int = MAX_ITEM_SIZE - 1024,
         **kwargs: Dict,
     ):
         """
@@ -24,23 +104,198 @@ class MemcachedCache(LambdaProxyCacheBase):
         ----------
         host: string, memcache host
         port: integer
+        time: integer, default entries time to live in seconds
+        codec: Codec, entries serialization (default to BinaryCodec)
+        servers: list, memcache servers (`host:port`), instead of host and port
+        dead_retry: integer, time in seconds a failing server is skipped
+        max_item_size: integer, maximum size of the value stored in one key
         kwargs: passed directly to bmemcached.Client connection
 
         """
-        # memcache
-        self.memcache = bmemcached.Client((f"{host}:{port}",), **kwargs)
+        servers = list(servers or [f"{host}:{port}"])
+        self.clients = {
+            server: bmemcached.Client((server,), **kwargs) for server in servers
+        }
+        self.ring = HashRing(servers)
         self.timeout = time
+        self.dead_retry = dead_retry
+        self.max_item_size = max_item_size
+        self.stats: Counter = Counter()
+        self._dead: Dict[str, float] = {}
+        if codec:
+            self.codec = codec
+
+    def _server(self, key: str) -> Optional[str]:
+        """Return the first live server for a key."""
+        now = time.time()
+        for server in self.ring.iter_nodes(key):
+            if self._dead.get(server, 0) <= now:
+                return server
+
+        if self.raise_errors:
+            raise ConnectionError("No live memcached server")
+        return None
+
+    def _check(self, server: str, error: bool = False) -> bool:
+        """Mark a server dead if the call failed or the client is disconnected."""
+        protocols = list(getattr(self.clients[server], "servers", []))
+        if error or (protocols and all(p.connection is None for p in protocols)):
+            self._dead[server] = time.time() + self.dead_retry
+            self.stats["server_failures"] += 1
+            return False
+        return True
+
+    def _call(self, server: str, method: str, *args: Any, **kwargs: Any) -> Any:
+        """Call a client method, marking the server dead on failure."""
+        try:
+            result = getattr(self.clients[server], method)(*args, **kwargs)
+        except Exception:
+            self._check(server, error=True)
+            raise
+
+        # bmemcached does not raise socket errors, it drops the connection
+        if not self._check(server):
+            raise ConnectionError(f"memcached server {server} is unreachable")
+        return result
 
-    def set(self, key: str, value) -> bool:
+    def _encode(self, server: str, key: str, value, expiration: int) -> bytes:
+        """Encode value, writing its chunks when it is too large."""
+        data = self.codec.dumps(value)
+        if len(data) <= self.max_item_size:
+            return data
+
+        # chunk keys are versioned so concurrent writes do not mix their chunks
+        version = uuid.uuid4().hex[:12]
+        view = memoryview(data)
+        size = self.max_item_size
+        chunks = {}
+        for index in range(-(-len(data) // size)):
+            start = index * size
+            end = start + size
+            chunks[f"{key}:{version}:{index}"] = bytes(view[start:end])
+
+        if self._call(server, "set_multi", chunks, time=expiration):
+            raise ValueError(f"Could not store {key} chunks")
+
+        self.stats["chunked"] += 1
+        header = {"version": version, "chunks": len(chunks)}
+        return CHUNKED + json.dumps(header).encode()
+
+    def _decode(self, server: str, key: str, value):
+        """Decode stored value."""
+        # entries written by previous versions are pickled by bmemcached
+        if not isinstance(value, bytes):
+            return value
+
+        if value.startswith(CHUNKED):
+            start = len(CHUNKED)
+            header = json.loads(value[start:])
+            keys = [f"{key}:{header['version']}:{i}" for i in range(header["chunks"])]
+            chunks = self._call(server, "get_multi", keys)
+            if len(chunks) != len(keys):
+                return None
+            value = b"".join(chunks[k] for k in keys)
+
+        return self.codec.loads(value)
+
+    def _store(self, method: str, key: str, value, ttl: int = None) -> bool:
+        """Set or add item."""
+        if ttl == 0:
+            # expired right away
+            return False
+
+        server = self._server(key)
+        if server is None:
+            return False
+
+        try:
+            expiration = _expiration(ttl if ttl is not None else self.timeout)
+            data = self._encode(server, key, value, expiration)
+            return bool(self._call(server, method, key, data, time=expiration))
+        except Exception:
+            if self.raise_errors:
+                raise
+            return False
+
+    def set(self, key: str, value, ttl: int = None) -> bool:
         """Set item in Memcached database."""
+        return self._store("set", key, value, ttl=ttl)
+
+    def add(self, key: str, value, ttl: int = None) -> bool:
+        """Set item in Memcached database if it does not exist."""
+        return self._store("add", key, value, ttl=ttl)
+
+    def delete(self, key: str) -> bool:
+        """Delete item in Memcached database."""
+        server = self._server(key)
+        if server is None:
+            return False
+
         try:
-            return self.memcache.set(key, value, time=self.timeout)
+            return bool(self._call(server, "delete", key))
         except Exception:
+            if self.raise_errors:
+                raise
             return False
 
     def get(self, key: str):
         """Get item in Memcached database."""
+        server = self._server(key)
+        if server is None:
+            return False
+
         try:
-            return self.memcache.get(key)
+            return self._decode(server, key, self._call(server, "get", key))
         except Exception:
+            if self.raise_errors:
+                raise
             return False
+
+    def _group(self, keys: Sequence[str]) -> Dict[str, List[str]]:
+        """Group keys by live server."""
+        groups: Dict[str, List[str]] = defaultdict(list)
+        for key in keys:
+            server = self._server(key)
+            if server is not None:
+                groups[server].append(key)
+        return groups
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, Any]:
+        """Get items in Memcached database (one multi-get per server)."""
+        items = {}
+        for server, server_keys in self._group(keys).items():
+            try:
+                values = self._call(server, "get_multi", server_keys)
+                for key, value in values.items():
+                    value = self._decode(server, key, value)
+                    if value:
+                        items[key] = value
+            except Exception:
+                if self.raise_errors:
+                    raise
+                continue
+        return items
+
+    def set_many(self, items: Dict[str, Any], ttl: int = None) -> List[str]:
+        """Set items in Memcached database (one multi-set per server)."""
+        if ttl == 0:
+            # expired right away
+            return list(items)
+
+        expiration = _expiration(ttl if ttl is not None else self.timeout)
+        groups = self._group(list(items))
+        grouped = {key for server_keys in groups.values() for key in server_keys}
+        # no live server
+        failed = [key for key in items if key not in grouped]
+        for server, server_keys in groups.items():
+            try:
+                mapping = {
+                    key: self._encode(server, key, items[key], expiration)
+                    for key in server_keys
+                }
+                failed.extend(self._call(server, "set_multi", mapping, time=expiration))
+            except Exception:
+                if self.raise_errors:
+                    raise
+                failed.extend(server_keys)
+        return failed
@@ -0,0 +1,270 @@
+"""Lambda-proxy.cache in-memory layer."""
+
+from typing import Any, Dict, List, Optional, Sequence
+
+import os
+import sys
+import time
+import threading
+from collections import Counter, OrderedDict
+
+from lambda_proxy_cache.backends.base import LambdaProxyCacheBase
+from lambda_proxy_cache.entry import mark_expiry, unmark_expiry
+
+
+def _sizeof(value: Any) -> int:
+    """Estimate object size in bytes."""
+    size = sys.getsizeof(value)
+    if isinstance(value, memoryview):
+        size += value.nbytes
+    elif isinstance(value, (list, tuple)):
+        size += sum(_sizeof(v) for v in value)
+    elif isinstance(value, dict):
+        size += sum(_sizeof(k) + _sizeof(v) for k, v in value.items())
+    return size
+
+
+class MemoryCache(LambdaProxyCacheBase):
+    """
+    In-process LRU cache.
+
+    Entries live in the Lambda container memory and are kept across warm
+    invocations. When a `backend` is given, the memory cache acts as a L1 cache
+    in front of it: misses are read from the backend and the result is kept in
+    memory, writes go to both. Entries written with a time to live carry their
+    expiry in the backend, so the copies kept in memory expire with them.
+
+    """
+
+    def __init__(
+        self,
+        backend: Optional[LambdaProxyCacheBase] = None,
+        max_size: Optional[int] = None,
+        memory_fraction: float = 0.1,
+        time: int = 300,
+    ):
+        """
+        Memory-backed cache.
+
+        Parameters
+        ----------
+        backend: LambdaProxyCacheBase, optional cache layer to wrap
+        max_size: integer, maximum size of the stored entries in bytes. Defaults
+            to `memory_fraction` of the Lambda memory limit
+            (AWS_LAMBDA_FUNCTION_MEMORY_SIZE), or 128 MB outside of Lambda.
+        memory_fraction: float, fraction of the Lambda memory to use
+        time: integer, entries time to live in seconds
+
+        """
+        if backend and not isinstance(backend, LambdaProxyCacheBase):
+            raise TypeError("backend must be an instance of LambdaProxyCacheBase")
+
+        if max_size is None:
+            memory_limit = int(os.environ.get("AWS_LAMBDA_FUNCTION_MEMORY_SIZE", 1280))
+            max_size = int(memory_limit * memory_fraction * 1024 * 1024)
+
+        self.backend = backend
+        self.max_size = max_size
+        self.timeout = time
+        self.size = 0
+        self.stats: Counter = Counter()
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Return the number of entries."""
+        return len(self._entries)
+
+    def _store(
+        self, key: str, value, ttl: float = None, only_new: bool = False
+    ) -> bool:
+        """Add item in memory, evicting the least recently used entries."""
+        if ttl == 0:
+            # expired right away
+            return False
+
+        size = _sizeof(key) + _sizeof(value)
+        if size > self.max_size:
+            return False
+
+        ttl = ttl if ttl is not None else self.timeout
+        now = time.time()
+        expires = now + ttl if ttl else None
+        with self._lock:
+            if only_new:
+                entry = self._entries.get(key)
+                if entry is not None and (entry[1] is None or entry[1] > now):
+                    return False
+
+            self._remove(key)
+            while self._entries and self.size + size > self.max_size:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self.size -= evicted_size
+                self.stats["evictions"] += 1
+
+            self._entries[key] = (value, expires, size)
+            self.size += size
+
+        return True
+
+    def _remove(self, key: str) -> None:
+        """Remove item from memory (lock must be held)."""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[2]
+
+    def set(self, key: str, value, ttl: int = None) -> bool:
+        """Set item in memory (and in the wrapped backend)."""
+        stored = self._store(key, value, ttl)
+        if self.backend:
+            return self.backend.set(key, mark_expiry(value, ttl), ttl=ttl)
+        return stored
+
+    def add(self, key: str, value, ttl: int = None) -> bool:
+        """Set item in memory (or in the wrapped backend) if it does not exist."""
+        if self.backend:
+            return self.backend.add(key, mark_expiry(value, ttl), ttl=ttl)
+
+        return self._store(key, value, ttl, only_new=True)
+
+    def delete(self, key: str) -> bool:
+        """Delete item in memory (and in the wrapped backend)."""
+        with self._lock:
+            deleted = key in self._entries
+            self._remove(key)
+
+        if self.backend:
+            return self.backend.delete(key)
+        return deleted
+
+    def _get(self, key: str):
+        """Get item from memory."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires, _ = entry
+                if expires is None or expires > time.time():
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return value
+
+                self._remove(key)
+                self.stats["expired"] += 1
+
+            self.stats["misses"] += 1
+            return None
+
+    def _promote(self, key: str, value) -> Any:
+        """Keep a value read from the wrapped backend in memory, until its expiry."""
+        if not value:
+            return None
+
+        value, until = unmark_expiry(value)
+        ttl = None
+        if until is not None:
+            remaining = until - time.time()
+            if remaining <= 0:
+                return None
+            ttl = min(self.timeout, remaining) if self.timeout else remaining
+
+        self.stats["backend_hits"] += 1
+        self._store(key, value, ttl)
+        return value
+
+    def get(self, key: str):
+        """Get item from memory (or from the wrapped backend)."""
+        value = self._get(key)
+        if value is not None:
+            return value
+
+        if self.backend:
+            return self._promote(key, self.backend.get(key))
+
+        return None
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, Any]:
+        """Get items from memory, and the missing ones from the wrapped backend."""
+        items = {}
+        missing = []
+        for key in keys:
+            value = self._get(key)
+            if value is not None:
+                items[key] = value
+            else:
+                missing.append(key)
+
+        if self.backend and missing:
+            for key, value in self.backend.get_many(missing).items():
+                value = self._promote(key, value)
+                if value:
+                    items[key] = value
+
+        return items
+
+    def set_many(self, items: Dict[str, Any], ttl: int = None) -> List[str]:
+        """Set items in memory (and in the wrapped backend)."""
+        failed = [
+            key for key, value in items.items() if not self._store(key, value, ttl)
+        ]
+        if self.backend:
+            return self.backend.set_many(
+                {key: mark_expiry(value, ttl) for key, value in items.items()}, ttl=ttl
+            )
+        return failed
+
+    async def aget(self, key: str):
+        """Get item from memory (or from the wrapped backend)."""
+        value = self._get(key)
+        if value is not None or not self.backend:
+            return value
+
+        return self._promote(key, await self.backend.aget(key))
+
+    async def aset(self, key: str, value, ttl: int = None) -> bool:
+        """Set item in memory (and in the wrapped backend)."""
+        stored = self._store(key, value, ttl)
+        if self.backend:
+            return await self.backend.aset(key, mark_expiry(value, ttl), ttl=ttl)
+        return stored
+
+    async def aget_many(self, keys: Sequence[str]) -> Dict[str, Any]:
+        """Get items from memory, and the missing ones from the wrapped backend."""
+        if not self.backend:
+            return self.get_many(keys)
+
+        items = {}
+        missing = []
+        for key in keys:
+            value = self._get(key)
+            if value is not None:
+                items[key] = value
+            else:
+                missing.append(key)
+
+        if missing:
+            for key, value in (await self.backend.aget_many(missing)).items():
+                value = self._promote(key, value)
+                if value:
+                    items[key] = value
+
+        return items
+
+    def set_deadline(self, deadline: Optional[float]) -> None:
+        """Set the current invocation deadline of the wrapped backend."""
+        if self.backend:
+            self.backend.set_deadline(deadline)
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def info(self) -> Dict:
+        """Return cache statistics."""
+        return dict(
+            self.stats,
+            entries=len(self._entries),
+            size=self.size,
+            max_size=self.max_size,
+        )
@@ -0,0 +1,185 @@
+"""Lambda-proxy.cache redis layer."""
+
+from typing import Any, Dict, List, Sequence, Tuple, cast
+
+import json
+import threading
+
+import redis
+
+from lambda_proxy_cache.backends.base import LambdaProxyCacheBase
+from lambda_proxy_cache.codecs import Codec
+
+_pools: Dict[Tuple[str, str], redis.ConnectionPool] = {}
+_lock = threading.Lock()
+
+
+def get_pool(url: str, **kwargs: Any) -> redis.ConnectionPool:
+    """
+    Return a connection pool, shared by the backends with the same options.
+
+    Pools are kept at module level so connections are reused across warm
+    invocations.
+
+    Parameters
+    ----------
+    url: string, redis URL (e.g. redis://host:6379/0 or rediss:// for TLS)
+    kwargs: passed directly to redis.ConnectionPool.from_url
+
+    """
+    key = (url, json.dumps(kwargs, sort_keys=True, default=str))
+    with _lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = redis.ConnectionPool.from_url(url, **kwargs)
+    return pool
+
+
+class RedisCache(LambdaProxyCacheBase):
+    """
+    Redis Cache.
+
+    - Entries time to live are set with the redis `EX` option
+    - `add` uses `SET NX`
+    - `get_many` uses `MGET` and `set_many` a (non transactional) pipeline
+
+    """
+
+    def __init__(
+        self,
+        host: str = "localhost",
+        port: int = 6379,
+        db: int = 0,
+        time: int = 432000,
+        codec: Codec = None,
+        url: str = None,
+        client: redis.Redis = None,
+        **kwargs: Any,
+    ):
+        """
+        Redis-backed cache.
+
+        Parameters
+        ----------
+        host: string, redis host
+        port: integer
+        db: integer, database number
+        time: integer, default entries time to live in seconds
+        codec: Codec, entries serialization (default to BinaryCodec)
+        url: string, redis URL (overrides host, port and db)
+        client: redis.Redis, client to use instead of creating one (e.g.
+            redis.RedisCluster)
+        kwargs: passed directly to redis.ConnectionPool (e.g. socket_timeout)
+
+        """
+        if client is None:
+            kwargs.setdefault("socket_connect_timeout", 1)
+            kwargs.setdefault("socket_timeout", 1)
+            kwargs.setdefault("socket_keepalive", True)
+            # values are bytes
+            kwargs["decode_responses"] = False
+            pool = get_pool(url or f"redis://{host}:{port}/{db}", **kwargs)
+            client = redis.Redis(connection_pool=pool)
+
+        self.client = client
+        self.timeout = time
+        if codec:
+            self.codec = codec
+
+    def set(self, key: str, value, ttl: int = None) -> bool:
+        """Set item in Redis database."""
+        if ttl == 0:
+            # expired right away
+            return False
+
+        ttl = ttl if ttl is not None else self.timeout
+        try:
+            return bool(self.client.set(key, self.codec.dumps(value), ex=ttl))
+        except Exception:
+            if self.raise_errors:
+                raise
+            return False
+
+    def add(self, key: str, value, ttl: int = None) -> bool:
+        """Set item in Redis database if it does not exist."""
+        if ttl == 0:
+            # expired right away
+            return False
+
+        ttl = ttl if ttl is not None else self.timeout
+        try:
+            return bool(self.client.set(key, self.codec.dumps(value), ex=ttl, nx=True))
+        except Exception:
+            if self.raise_errors:
+                raise
+            return False
+
+    def delete(self, key: str) -> bool:
+        """Delete item in Redis database."""
+        try:
+            return bool(self.client.delete(key))
+        except Exception:
+            if self.raise_errors:
+                raise
+            return False
+
+    def get(self, key: str):
+        """Get item in Redis database."""
+        try:
+            value = self.client.get(key)
+        except Exception:
+            if self.raise_errors:
+                raise
+            return None
+
+        try:
+            # `decode_responses=False`: values are bytes
+            return self.codec.loads(cast(bytes, value)) if value is not None else None
+        except Exception:
+            return None
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, Any]:
+        """Get items in Redis database (MGET)."""
+        keys = list(keys)
+        if not keys:
+            return {}
+
+        try:
+            values = self.client.mget(keys)
+        except Exception:
+            if self.raise_errors:
+                raise
+            return {}
+
+        items = {}
+        for key, value in zip(keys, values):
+            if value is None:
+                continue
+            try:
+                items[key] = self.codec.loads(cast(bytes, value))
+            except Exception:
+                continue
+        return items
+
+    def set_many(self, items: Dict[str, Any], ttl: int = None) -> List[str]:
+        """Set items in Redis database (pipeline)."""
+        if ttl == 0:
+            # expired right away
+            return list(items)
+
+        ttl = ttl if ttl is not None else self.timeout
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for key, value in items.items():
+                pipe.set(key, self.codec.dumps(value), ex=ttl)
+            results = pipe.execute(raise_on_error=False)
+        except Exception:
+            if self.raise_errors:
+                raise
+            return list(items)
+
+        return [
+            key
+            for key, result in zip(items, results)
+            if not result or isinstance(result, Exception)
+        ]
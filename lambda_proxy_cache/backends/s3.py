@@ -1,54 +1,169 @@
 """Lambda-proxy.cache s3 layer."""
 
-from typing import Dict
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
 
-import json
-from boto3.session import Session as boto3_session
+import time
+import hashlib
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 
+from botocore.config import Config
+
+from lambda_proxy_cache.backends.aws import get_client
 from lambda_proxy_cache.backends.base import LambdaProxyCacheBase
+from lambda_proxy_cache.codecs import Codec
 
 
 class S3Cache(LambdaProxyCacheBase):
     """
     AWS S3 Cache handler.
 
-    - Object expiration is handled by Bucket rules
+    - Entries expiry is stored in the object metadata and checked on read
+      (`get_object` returns the metadata, no HEAD request is needed)
+    - Keys can be spread over hash-derived prefixes (`prefix/<shard>/<key>`)
+    - Object deletion is handled by Bucket rules
     https://aws.amazon.com/fr/blogs/aws/amazon-s3-object-expiration/
 
     """
 
-    def __init__(self, bucket, prefix: str = "", **kwargs: Dict):
+    def __init__(
+        self,
+        bucket,
+        prefix: str = "",
+        time: int = None,
+        codec: Codec = None,
+        shards: int = 0,
+        max_workers: int = 16,
+        config: Config = None,
+        prewarm: bool = False,
+        **kwargs: Dict,
+    ):
         """
         S3-backed cache.
 
         Parameters
         ----------
         bucket: string, AWS S3 bucket
+        prefix: string, AWS S3 key prefix
+        time: integer, default entries time to live in seconds (no expiry if None)
+        codec: Codec, entries serialization (default to BinaryCodec)
+        shards: integer, number of hash-derived key prefixes (e.g. 16 or 256) to
+            spread the requests over S3 per-prefix request rate limits
+            (default to 0, no sharding)
+        max_workers: integer, number of threads used by get_many/set_many
+        config: botocore.config.Config, merged on top of the default client
+            configuration (keep-alive, short timeouts, adaptive retries)
+        prewarm: bool, open a connection right away (e.g. in Lambda init phase)
         kwargs: passed directly to boto3.session.Session connection
 
         """
-        session = boto3_session(**kwargs)
-        self.client = session.client("s3")
+        self.client = get_client("s3", config=config, **kwargs)
         self.bucket = bucket
         self.prefix = prefix
+        self.shards = shards
+        self._shard_width = len(f"{shards - 1:x}") if shards > 1 else 0
+        self.timeout = time
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        if codec:
+            self.codec = codec
+        if prewarm:
+            self.prewarm()
+
+    def prewarm(self) -> bool:
+        """Open a connection (TLS handshake) to AWS S3, e.g. during Lambda init."""
+        try:
+            self.client.head_bucket(Bucket=self.bucket)
+            return True
+        except Exception:
+            return False
 
-    def set(self, key: str, value) -> bool:
+    def _key(self, key: str) -> str:
+        """Return object key."""
+        if self._shard_width:
+            digest = hashlib.blake2b(key.encode(), digest_size=4).digest()
+            shard = int.from_bytes(digest, "big") % self.shards
+            key = f"{shard:0{self._shard_width}x}/{key}"
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def set(self, key: str, value, ttl: int = None) -> bool:
         """Set item in AWS S3."""
-        key = f"{self.prefix}/{key}" if self.prefix else key
+        if ttl == 0:
+            # expired right away
+            return False
+
+        key = self._key(key)
+        ttl = ttl if ttl is not None else self.timeout
+        metadata = {"expires": str(int(time.time() + ttl))} if ttl else {}
         try:
             return self.client.put_object(
                 Bucket=self.bucket,
                 Key=key,
-                Body=json.dumps(value, default=str).encode(),
+                Body=self.codec.dumps(value),
+                Metadata=metadata,
             )
         except Exception:
+            if self.raise_errors:
+                raise
             return False
 
     def get(self, key: str):
         """Get item in AWS S3."""
-        key = f"{self.prefix}/{key}" if self.prefix else key
+        key = self._key(key)
         try:
             response = self.client.get_object(Bucket=self.bucket, Key=key)
-            return json.loads(response["Body"].read().decode())
+        except Exception as err:
+            error = getattr(err, "response", {}).get("Error", {})
+            # missing objects are misses, not errors
+            if self.raise_errors and error.get("Code") not in ["NoSuchKey", "404"]:
+                raise
+            return None
+
+        try:
+            expires = response.get("Metadata", {}).get("expires")
+            if expires and int(expires) < time.time():
+                # release the connection, the body is not read
+                response["Body"].close()
+                return None
+            return self.codec.loads(response["Body"].read())
         except Exception:
             return None
+
+    def delete(self, key: str) -> bool:
+        """Delete item in AWS S3."""
+        key = self._key(key)
+        try:
+            self.client.delete_object(Bucket=self.bucket, Key=key)
+            return True
+        except Exception:
+            if self.raise_errors:
+                raise
+            return False
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Thread pool for bulk operations, kept across warm invocations."""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    def _map(self, method: Callable, items: Iterable) -> Iterator:
+        """Call a method on items in the thread pool, in the caller context."""
+        context = contextvars.copy_context()
+        return self.executor.map(lambda item: context.copy().run(method, item), items)
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, Any]:
+        """Get items in AWS S3 (parallel requests)."""
+        keys = list(dict.fromkeys(keys))
+        values = self._map(self.get, keys)
+        return {key: value for key, value in zip(keys, values) if value}
+
+    def set_many(self, items: Dict[str, Any], ttl: int = None) -> List[str]:
+        """Set items in AWS S3 (parallel requests)."""
+        stored = self._map(
+            lambda item: self.set(item[0], item[1], ttl=ttl), items.items()
+        )
+        return [key for key, ok in zip(items, stored) if not ok]
@@ -0,0 +1,218 @@
+"""Lambda-proxy.cache multi-tier layer."""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import math
+import time
+import asyncio
+from collections import Counter, defaultdict
+
+from lambda_proxy_cache.backends.base import LambdaProxyCacheBase
+from lambda_proxy_cache.entry import mark_expiry, unmark_expiry
+
+
+class Tier(object):
+    """Cache tier options."""
+
+    def __init__(
+        self, backend: LambdaProxyCacheBase, write: str = "through", ttl: int = None
+    ):
+        """
+        Initialize tier.
+
+        Parameters
+        ----------
+        backend: LambdaProxyCacheBase
+        write: string, write policy
+            - through: responses are written to this tier
+            - around: responses are only written to this tier when promoted
+              from a slower tier
+        ttl: integer, time to live in seconds for this tier
+            (default to the route or backend setting)
+
+        """
+        if not isinstance(backend, LambdaProxyCacheBase):
+            raise TypeError("backend must be an instance of LambdaProxyCacheBase")
+
+        if write not in ["through", "around"]:
+            raise ValueError(f"'{write}' is not a supported write policy")
+
+        self.backend = backend
+        self.write = write
+        self.ttl = ttl
+
+
+class TieredCache(LambdaProxyCacheBase):
+    """
+    Multi-tier cache.
+
+    Tiers are ordered from the fastest to the slowest (e.g. memory, memcached,
+    S3). Reads go through the tiers in order and hits are promoted to the faster
+    tiers.
+
+    Entries written with a time to live carry their expiry: promoted copies
+    expire with the entry (or earlier, with the faster tier `ttl`).
+
+    """
+
+    def __init__(
+        self, tiers: Sequence[Union[Tier, LambdaProxyCacheBase]], lock_tier: int = -1
+    ):
+        """
+        Tiered cache.
+
+        Parameters
+        ----------
+        tiers: list of Tier or LambdaProxyCacheBase (write-through tiers)
+        lock_tier: integer, index of the tier used for `add` (e.g. single-flight
+            leases). It should be a tier shared by all the Lambda containers.
+
+        """
+        if not tiers:
+            raise ValueError("TieredCache needs at least one tier")
+
+        self.tiers = [t if isinstance(t, Tier) else Tier(t) for t in tiers]
+        self.lock_tier = self.tiers[lock_tier]
+        self.stats: Counter = Counter()
+
+    def _promote_ttl(self, tier: Tier, until: Optional[float]) -> Optional[int]:
+        """Return the time to live of a promoted entry."""
+        if until is None:
+            return tier.ttl
+
+        remaining = max(int(math.ceil(until - time.time())), 1)
+        return min(tier.ttl, remaining) if tier.ttl else remaining
+
+    def _read(self, value: Any) -> Tuple[Any, Optional[float]]:
+        """Unmark a value read from a tier, None if it expired."""
+        if not value:
+            return None, None
+
+        value, until = unmark_expiry(value)
+        if until is not None and until <= time.time():
+            return None, None
+        return value, until
+
+    def set(self, key: str, value, ttl: int = None) -> bool:
+        """Set item in write-through tiers."""
+        if ttl == 0:
+            # expired right away
+            return False
+
+        value = mark_expiry(value, ttl)
+        stored = False
+        for tier in self.tiers:
+            if tier.write == "through":
+                stored = (
+                    bool(tier.backend.set(key, value, ttl=tier.ttl or ttl)) or stored
+                )
+        return stored
+
+    def get(self, key: str):
+        """Get item from the first tier which has it, and promote it."""
+        for index, tier in enumerate(self.tiers):
+            stored = tier.backend.get(key)
+            value, until = self._read(stored)
+            if value:
+                self.stats[f"tier{index}_hits"] += 1
+                for faster in self.tiers[:index]:
+                    faster.backend.set(
+                        key, stored, ttl=self._promote_ttl(faster, until)
+                    )
+                return value
+
+        self.stats["misses"] += 1
+        return None
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, Any]:
+        """Get items from the tiers (one batch per tier), and promote them."""
+        items: Dict[str, Any] = {}
+        missing = list(keys)
+        for index, tier in enumerate(self.tiers):
+            if not missing:
+                break
+
+            found = {}
+            expiries = {}
+            for key, stored in tier.backend.get_many(missing).items():
+                value, until = self._read(stored)
+                if value:
+                    found[key] = value
+                    expiries[key] = (stored, until)
+            if not found:
+                continue
+
+            self.stats[f"tier{index}_hits"] += len(found)
+            for faster in self.tiers[:index]:
+                # one batch per time to live
+                batches: Dict[Optional[int], Dict[str, Any]] = defaultdict(dict)
+                for key, (stored, until) in expiries.items():
+                    batches[self._promote_ttl(faster, until)][key] = stored
+                for ttl, batch in batches.items():
+                    faster.backend.set_many(batch, ttl=ttl)
+            items.update(found)
+            missing = [key for key in missing if key not in found]
+
+        self.stats["misses"] += len(missing)
+        return items
+
+    def set_many(self, items: Dict[str, Any], ttl: int = None) -> List[str]:
+        """Set items in write-through tiers."""
+        if ttl == 0:
+            # expired right away
+            return list(items)
+
+        items = {key: mark_expiry(value, ttl) for key, value in items.items()}
+        failed = set(items)
+        for tier in self.tiers:
+            if tier.write == "through":
+                failed &= set(tier.backend.set_many(items, ttl=tier.ttl or ttl))
+        return [key for key in items if key in failed]
+
+    async def aget(self, key: str):
+        """Get item from the first tier which has it, and promote it."""
+        for index, tier in enumerate(self.tiers):
+            stored = await tier.backend.aget(key)
+            value, until = self._read(stored)
+            if value:
+                self.stats[f"tier{index}_hits"] += 1
+                for faster in self.tiers[:index]:
+                    await faster.backend.aset(
+                        key, stored, ttl=self._promote_ttl(faster, until)
+                    )
+                return value
+
+        self.stats["misses"] += 1
+        return None
+
+    async def aset(self, key: str, value, ttl: int = None) -> bool:
+        """Set item in write-through tiers, concurrently."""
+        if ttl == 0:
+            # expired right away
+            return False
+
+        value = mark_expiry(value, ttl)
+        results = await asyncio.gather(
+            *[
+                tier.backend.aset(key, value, ttl=tier.ttl or ttl)
+                for tier in self.tiers
+                if tier.write == "through"
+            ]
+        )
+        return any(results)
+
+    def set_deadline(self, deadline: Optional[float]) -> None:
+        """Set the current invocation deadline of the tiers."""
+        for tier in self.tiers:
+            tier.backend.set_deadline(deadline)
+
+    def add(self, key: str, value, ttl: int = None) -> bool:
+        """Set item in the lock tier if it does not exist."""
+        return self.lock_tier.backend.add(key, value, ttl=self.lock_tier.ttl or ttl)
+
+    def delete(self, key: str) -> bool:
+        """Delete item in all tiers."""
+        deleted = False
+        for tier in self.tiers:
+            deleted = bool(tier.backend.delete(key)) or deleted
+        return deleted
@@ -0,0 +1,142 @@
+"""lambda-proxy-cache cache entries serialization."""
+
+from typing import Any, Dict, List, Tuple, Union
+
+import abc
+import json
+import struct
+
+from lambda_proxy_cache.entry import is_response
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+class Codec(abc.ABC):
+    """Abstract base class for cache entries codecs."""
+
+    @abc.abstractmethod
+    def encode(self, value: Any) -> List[Buffer]:
+        """
+        Encode value to a list of buffers.
+
+        Backends able to write several buffers (e.g. files) can avoid
+        concatenating them, and copying the body.
+
+        """
+
+    @abc.abstractmethod
+    def decode(self, data: Buffer, zero_copy: bool = False) -> Any:
+        """
+        Decode value.
+
+        Parameters
+        ----------
+        data: bytes or memoryview
+        zero_copy: bool, return bytes bodies as memoryview over `data`
+
+        """
+
+    def dumps(self, value: Any) -> bytes:
+        """Encode value to bytes."""
+        return b"".join(self.encode(value))
+
+    def loads(self, data: Buffer) -> Any:
+        """Decode value from bytes."""
+        return self.decode(data)
+
+
+class JSONCodec(Codec):
+    """Legacy JSON codec (bytes bodies are not supported)."""
+
+    def encode(self, value: Any) -> List[Buffer]:
+        """Encode value to JSON."""
+        return [json.dumps(value, default=str).encode()]
+
+    def decode(self, data: Buffer, zero_copy: bool = False) -> Any:
+        """Decode JSON value."""
+        return json.loads(bytes(data))
+
+
+class BinaryCodec(Codec):
+    """
+    Compact binary framed codec.
+
+    Endpoint responses `(status, content_type, body[, meta])` are encoded as::
+
+        magic (4 bytes) | body type (1 byte) | header length (4 bytes)
+        | header (JSON: status, content type, meta) | body
+
+    Bytes bodies are written and read as is. Because the header comes first,
+    `peek` reads the status, content type and metadata without decoding the
+    body. Other values are stored as JSON.
+
+    Values without the magic prefix are decoded as JSON, for entries written by
+    previous versions.
+
+    """
+
+    magic = b"LPC\x01"
+    frame = struct.Struct(">4scI")
+
+    def encode(self, value: Any) -> List[Buffer]:
+        """Encode value."""
+        if not is_response(value):
+            payload = json.dumps(value, default=str).encode()
+            return [self.frame.pack(self.magic, b"v", len(payload)), payload]
+
+        body = value[2]
+        if isinstance(body, (bytes, bytearray, memoryview)):
+            kind = b"b"
+        elif isinstance(body, str):
+            kind, body = b"s", body.encode("utf-8", "surrogatepass")
+        else:
+            kind, body = b"j", json.dumps(body, default=str).encode()
+
+        header: Dict[str, Any] = {"status": value[0], "content_type": value[1]}
+        if len(value) == 4:
+            header["meta"] = value[3]
+
+        payload = json.dumps(header, separators=(",", ":"), default=str).encode()
+        return [self.frame.pack(self.magic, kind, len(payload)), payload, body]
+
+    def _header(self, data: Buffer) -> Tuple[bytes, Any, int]:
+        """Read frame header."""
+        magic, kind, size = self.frame.unpack_from(data)
+        if magic != self.magic:
+            raise ValueError("Invalid frame")
+        start = self.frame.size
+        offset = start + size
+        header = json.loads(bytes(data[start:offset]))
+        return kind, header, offset
+
+    def peek(self, data: Buffer) -> Dict:
+        """Read status, content type and metadata without decoding the body."""
+        kind, header, _ = self._header(data)
+        if kind == b"v":
+            raise ValueError("Not an endpoint response")
+        return header
+
+    def decode(self, data: Buffer, zero_copy: bool = False) -> Any:
+        """Decode value."""
+        if bytes(data[:4]) != self.magic:
+            return json.loads(bytes(data))
+
+        kind, header, offset = self._header(data)
+        if kind == b"v":
+            return header
+
+        view = memoryview(data)[offset:]
+        body: Any = view
+        if kind == b"s":
+            body = str(view, "utf-8", "surrogatepass")
+        elif kind == b"j":
+            body = json.loads(bytes(view))
+        elif not zero_copy:
+            body = bytes(view)
+
+        if "meta" in header:
+            return (header["status"], header["content_type"], body, header["meta"])
+        return (header["status"], header["content_type"], body)
+
+
+default_codec = BinaryCodec()
@@ -0,0 +1,27 @@
+"""lambda-proxy-cache payload compression."""
+
+from typing import Union
+
+import zlib
+
+# Same settings as lambda_proxy.proxy.API.response, so stored payloads can be
+# returned as is.
+_wbits = {
+    "gzip": zlib.MAX_WBITS | 16,
+    "zlib": zlib.MAX_WBITS,
+    "deflate": -zlib.MAX_WBITS,
+}
+
+
+def compress(body: Union[str, bytes], encoding: str, level: int = 9) -> bytes:
+    """Compress payload."""
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+
+    compressor = zlib.compressobj(level, zlib.DEFLATED, _wbits[encoding])
+    return compressor.compress(body) + compressor.flush()
+
+
+def decompress(data: bytes, encoding: str) -> bytes:
+    """Decompress payload."""
+    return zlib.decompress(data, _wbits[encoding])
@@ -0,0 +1,85 @@
+"""lambda-proxy-cache cache entries."""
+
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import math
+import time
+import random
+
+
+def is_response(value: Any) -> bool:
+    """Check if value is an endpoint response `(status, content_type, body[, meta])`."""
+    if not isinstance(value, (list, tuple)) or len(value) not in [3, 4]:
+        return False
+    if not isinstance(value[0], (str, int)) or not isinstance(value[1], str):
+        return False
+    return len(value) == 3 or isinstance(value[3], dict)
+
+
+def pack(response: Sequence, **meta: Any) -> Tuple:
+    """
+    Add metadata (e.g. creation time, soft expiry) to an endpoint response.
+
+    Entries are stored as `(status, content_type, body, meta)`.
+
+    """
+    return tuple(response[:3]) + (meta,)
+
+
+def unpack(value: Sequence) -> Tuple[Tuple, Dict]:
+    """Split a cached value in endpoint response and metadata."""
+    if len(value) > 3 and isinstance(value[3], dict):
+        return tuple(value[:3]), value[3]
+    return tuple(value), {}
+
+
+# Entry expiry (unix time), stored in the entry metadata (or in dict values)
+EXPIRY = "lpc-until"
+
+
+def mark_expiry(value: Any, ttl: Optional[int]) -> Any:
+    """Record the entry expiry, so copies in faster layers do not outlive it."""
+    if not ttl:
+        return value
+
+    until = time.time() + ttl
+    if is_response(value):
+        response, meta = unpack(value)
+        return pack(response, **meta, **{EXPIRY: until})
+    if isinstance(value, dict):
+        return {**value, EXPIRY: until}
+    return value
+
+
+def unmark_expiry(value: Any) -> Tuple[Any, Optional[float]]:
+    """Return the value as it was set, and its expiry."""
+    if is_response(value):
+        response, meta = unpack(value)
+        if EXPIRY in meta:
+            meta = dict(meta)
+            until = meta.pop(EXPIRY)
+            return (pack(response, **meta) if meta else response), until
+    elif isinstance(value, dict) and EXPIRY in value:
+        value = dict(value)
+        until = value.pop(EXPIRY)
+        return value, until
+    return value, None
+
+
+def should_recompute(meta: Dict, beta: float, now: float) -> bool:
+    """
+    Probabilistic early expiration (XFetch).
+
+    Return True, with a probability growing as the entry expiry gets closer, when
+    a still valid entry should be recomputed. `meta["delta"]` is the time it
+    took to compute the entry, so slow entries are refreshed earlier.
+
+    Vattani et al., Optimal Probabilistic Cache Stampede Prevention, VLDB 2015.
+
+    """
+    delta = meta.get("delta")
+    if not beta or not delta or "expires" not in meta:
+        return False
+
+    # 1 - random() is in (0, 1], log(...) <= 0
+    return now - delta * beta * math.log(1.0 - random.random()) >= meta["expires"]
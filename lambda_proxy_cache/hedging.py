@@ -0,0 +1,168 @@
+"""lambda-proxy-cache hedged reads."""
+
+from typing import Any, Awaitable, Callable, Optional
+
+import math
+import time
+import asyncio
+import threading
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+
+class Hedge(object):
+    """
+    Hedge slow cache reads.
+
+    The primary read is given `delay` seconds (by default, the `percentile` of
+    the recent primary reads latency). If it is not done by then, a second
+    call is launched (a duplicate read, or the endpoint computation with
+    `compute=True`) and the first accepted result is used. The losing call is
+    not cancelled: a computed response is still stored in the cache layer.
+
+    """
+
+    def __init__(
+        self,
+        delay: Optional[float] = None,
+        percentile: float = 95.0,
+        window: int = 200,
+        min_samples: int = 20,
+        initial_delay: float = 0.05,
+        min_delay: float = 0.005,
+        compute: bool = False,
+        max_workers: int = 8,
+    ):
+        """
+        Initialize hedging.
+
+        Parameters
+        ----------
+        delay: float, fixed hedging delay in seconds (default to adaptive)
+        percentile: float, primary reads latency percentile used as delay
+        window: integer, number of recent primary reads latencies kept
+        min_samples: integer, latencies needed before using the percentile
+        initial_delay: float, delay in seconds until `min_samples` is reached
+        min_delay: float, lower bound of the adaptive delay in seconds
+        compute: bool, hedge with the endpoint computation instead of a
+            duplicate read
+        max_workers: integer, number of threads running the reads
+
+        """
+        self.fixed_delay = delay
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.compute = compute
+        self.max_workers = max_workers
+        self.stats: Counter = Counter()
+        self._latencies: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def delay(self) -> float:
+        """Current hedging delay in seconds."""
+        if self.fixed_delay is not None:
+            return self.fixed_delay
+
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < self.min_samples:
+            return self.initial_delay
+
+        index = max(math.ceil(len(samples) * self.percentile / 100) - 1, 0)
+        return max(samples[index], self.min_delay)
+
+    def record(self, duration: float) -> None:
+        """Record a primary read latency."""
+        with self._lock:
+            self._latencies.append(duration)
+
+    def _pick(self, value: Any, hedged: bool, accept: Callable) -> bool:
+        """Check a result, counting the hedges won."""
+        if not accept(value):
+            return False
+        if hedged:
+            self.stats["won"] += 1
+        return True
+
+    def run(self, primary: Callable, hedge: Callable, accept: Callable = None) -> Any:
+        """
+        Return `primary()` result, or `hedge()` result if it comes first.
+
+        Parameters
+        ----------
+        primary: callable, primary read
+        hedge: callable, called when the primary read is slower than `delay`
+        accept: callable, check a result once the hedge is launched (e.g. a
+            primary read miss waits for the hedge computation)
+
+        """
+        accept = accept or (lambda value: True)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+
+        self.stats["reads"] += 1
+        start = time.time()
+        first = self._executor.submit(primary)
+        first.add_done_callback(lambda f: self.record(time.time() - start))
+        try:
+            return first.result(timeout=self.delay)
+        except FutureTimeoutError:
+            pass
+
+        self.stats["fired"] += 1
+        second = self._executor.submit(hedge)
+        pending = {first, second}
+        result = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    value = future.result()
+                except Exception:
+                    self.stats["errors"] += 1
+                    continue
+                if self._pick(value, future is second, accept):
+                    return value
+                result = result or value
+
+        return result
+
+    async def arun(
+        self,
+        primary: Callable[[], Awaitable],
+        hedge: Callable[[], Awaitable],
+        accept: Callable = None,
+    ) -> Any:
+        """Return `await primary()` result, or `await hedge()` if it comes first."""
+        accept = accept or (lambda value: True)
+
+        self.stats["reads"] += 1
+        start = time.time()
+        first = asyncio.ensure_future(primary())
+        first.add_done_callback(lambda f: self.record(time.time() - start))
+        done, _ = await asyncio.wait({first}, timeout=self.delay)
+        if done:
+            return first.result()
+
+        self.stats["fired"] += 1
+        second = asyncio.ensure_future(hedge())
+        pending = {first, second}
+        result = None
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if task.exception() is not None:
+                    self.stats["errors"] += 1
+                    continue
+                if self._pick(task.result(), task is second, accept):
+                    return task.result()
+                result = result or task.result()
+
+        return result
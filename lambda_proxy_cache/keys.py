@@ -0,0 +1,296 @@
+"""Lambda-proxy-cache cache key builder."""
+
+from typing import Any, Callable, Dict, Optional, Sequence, Set, Tuple, Union
+
+import inspect
+import hashlib
+import binascii
+
+# Types with a `repr` that is stable across runs and processes.
+_stable_types = {str, int, float, bool, bytes, type(None)}
+
+_urlsafe = bytes.maketrans(b"+/", b"-_")
+
+
+def _stable(value: Any) -> Any:
+    """Convert a value to a structure with a stable `repr`."""
+    if type(value) in _stable_types:
+        return value
+    if isinstance(value, (list, tuple)):
+        return tuple(_stable(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((str(k), _stable(v)) for k, v in value.items()))
+    return f"<{type(value).__name__}:{value}>"
+
+
+def _to_bool(value: Any) -> bool:
+    """Convert query string value to boolean."""
+    if isinstance(value, str):
+        if value.lower() in ["true", "1", "yes", "on"]:
+            return True
+        if value.lower() in ["false", "0", "no", "off"]:
+            return False
+        raise ValueError(f"Invalid boolean value: {value}")
+    return bool(value)
+
+
+_coercers: Dict[Any, Callable] = {int: int, float: float, bool: _to_bool, str: str}
+
+
+def _get_coercer(annotation: Any) -> Optional[Callable]:
+    """Return a conversion function for a parameter annotation."""
+    if getattr(annotation, "__origin__", None) is Union:
+        args = [arg for arg in annotation.__args__ if arg is not type(None)]
+        if len(args) == 1:
+            annotation = args[0]
+
+    try:
+        return _coercers.get(annotation)
+    except TypeError:  # unhashable annotation
+        return None
+
+
+class Canonicalizer(object):
+    """
+    Endpoint arguments canonicalization.
+
+    The endpoint signature is inspected once. Missing arguments are filled with
+    their default value and string values (e.g. query parameters) are converted
+    to the annotated type (int, float or bool) so that e.g. `/tiles/1/2/3` and
+    `/tiles/1/2/3?scale=1` share the same cache key when `scale` defaults to 1.
+
+    """
+
+    def __init__(self, endpoint: Callable) -> None:
+        """Inspect endpoint signature."""
+        self.defaults: Dict[str, Any] = {}
+        self.coercers: Dict[str, Callable] = {}
+        self._coercers: Tuple[Tuple[str, Callable], ...] = ()
+
+        try:
+            signature = inspect.signature(endpoint)
+        except (TypeError, ValueError):
+            return
+
+        for name, param in signature.parameters.items():
+            if param.kind not in [param.POSITIONAL_OR_KEYWORD, param.KEYWORD_ONLY]:
+                continue
+
+            coercer = _get_coercer(param.annotation)
+            if coercer is not None and coercer is not str:
+                self.coercers[name] = coercer
+
+            if param.default is not param.empty:
+                self.defaults[name] = self._coerce(name, param.default)
+
+        self._coercers = tuple(self.coercers.items())
+
+    def _coerce(self, name: str, value: Any) -> Any:
+        """Convert a value to the parameter annotated type."""
+        coercer = self.coercers.get(name)
+        if coercer is None or value is None:
+            return value
+        try:
+            return coercer(value)
+        except (TypeError, ValueError):
+            return value
+
+    def apply(self, kwargs: Dict) -> Dict:
+        """Return bound arguments."""
+        if not self.defaults and not self.coercers:
+            return kwargs
+
+        args = {**self.defaults, **kwargs}
+        # only strings (query parameters) are converted, defaults already are
+        for name, coercer in self._coercers:
+            value = args.get(name)
+            if value.__class__ is str:
+                try:
+                    args[name] = coercer(value)
+                except (TypeError, ValueError):
+                    pass
+
+        return args
+
+
+def _split(value: Any) -> Sequence:
+    """Split comma separated values."""
+    return value.split(",") if isinstance(value, str) else [value]
+
+
+def _join(values: Sequence, original: Any) -> Any:
+    """Reverse `_split`."""
+    if isinstance(original, str):
+        return ",".join(str(v) for v in values)
+    return values[0]
+
+
+class KeySpec(object):
+    """
+    Cache key specification.
+
+    Describe how request arguments are normalized before being hashed, so
+    equivalent requests share the same cache entry. The endpoint still receives
+    the original arguments.
+
+    """
+
+    def __init__(
+        self,
+        include: Optional[Sequence[str]] = None,
+        exclude: Sequence[str] = (),
+        lowercase: Union[bool, Sequence[str]] = (),
+        sort: Sequence[str] = (),
+        precision: Optional[Dict[str, int]] = None,
+        grid: Optional[Dict[str, float]] = None,
+    ) -> None:
+        """
+        Initialize key specification.
+
+        Parameters
+        ----------
+        include: list, only use those query parameters in the key
+            (path arguments are always used)
+        exclude: list, query parameters to ignore (e.g. cache busting `_` or `ts`)
+        lowercase: bool or list, lowercase all or named parameter values
+        sort: list, sort values of comma separated parameters (e.g. bands)
+        precision: dict, round numeric parameters to a number of decimals
+            (e.g. {"lon": 3}). Comma separated values (e.g. bbox) are rounded
+            individually.
+        grid: dict, snap numeric parameters to a grid step (e.g. {"bbox": 0.01})
+
+        """
+        self.include = set(include) if include is not None else None
+        self.exclude = set(exclude)
+        self.lowercase_all = lowercase is True
+        self.lowercase: Set[str] = (
+            set() if isinstance(lowercase, bool) else set(lowercase)
+        )
+        self.sort = set(sort)
+        self.precision = precision or {}
+        self.grid = grid or {}
+
+    def _normalize(self, name: str, value: Any) -> Any:
+        """Normalize one argument value."""
+        if self.lowercase_all or name in self.lowercase:
+            value = value.lower() if isinstance(value, str) else value
+
+        if name in self.precision or name in self.grid:
+            try:
+                values = [float(v) for v in _split(value)]
+            except (TypeError, ValueError):
+                return value
+
+            step = self.grid.get(name)
+            if step:
+                values = [round(v / step) * step for v in values]
+            # rounding also removes floating point noise from the grid snapping
+            values = [round(v, self.precision.get(name, 12)) for v in values]
+            value = _join(values, value)
+
+        if name in self.sort and isinstance(value, str):
+            value = ",".join(sorted(value.split(",")))
+
+        return value
+
+    def _is_used(self, name: str) -> bool:
+        """Check if a query parameter is part of the key."""
+        if name in self.exclude:
+            return False
+        return self.include is None or name in self.include
+
+    def apply(self, kwargs: Dict, keep: Sequence[str] = ()) -> Dict:
+        """Return normalized arguments."""
+        return {
+            name: self._normalize(name, value)
+            for name, value in kwargs.items()
+            if name in keep or self._is_used(name)
+        }
+
+
+class KeyBuilder(object):
+    """
+    Precompiled cache key builder.
+
+    The route identifier is fed once to a seed digest when the route is
+    registered. On each request, the sorted arguments `repr` is fed to a copy of
+    the seed digest, without building an intermediate JSON string.
+
+    Keys only depend on the route identifier, argument names, values and types,
+    so they are stable across runs and processes.
+
+    """
+
+    def __init__(
+        self,
+        route_id: str,
+        digest: Union[str, Callable] = "blake2b",
+        digest_size: int = 16,
+        encoding: str = "base64url",
+        spec: Optional[KeySpec] = None,
+        path_args: Sequence[str] = (),
+        endpoint: Optional[Callable] = None,
+    ) -> None:
+        """
+        Initialize key builder.
+
+        Parameters
+        ----------
+        route_id: string, unique route identifier (e.g. path-name-version)
+        digest: string or callable, hashlib algorithm name or hash factory
+            (e.g. xxhash.xxh3_128) returning an object with update/digest methods
+        digest_size: integer, digest size in bytes (blake2 only)
+        encoding: string, key encoding (base64url, hex or binary; cache layers
+            only accept text keys)
+        spec: KeySpec, arguments normalization
+        path_args: list, path argument names (never excluded by the spec)
+        endpoint: callable, route endpoint used to canonicalize arguments
+
+        """
+        if encoding not in ["base64url", "hex", "binary"]:
+            raise ValueError(f"'{encoding}' is not a supported key encoding")
+
+        if callable(digest):
+            seed = digest()
+        elif digest in ["blake2b", "blake2s"]:
+            seed = getattr(hashlib, digest)(digest_size=digest_size)
+        else:
+            seed = hashlib.new(digest)
+
+        seed.update(repr(route_id).encode("utf-8", "surrogatepass"))
+        self._seed = seed
+        self.route_id = route_id
+        self.encoding = encoding
+        self.spec = spec
+        self.path_args = tuple(path_args)
+        self.canonicalizer = Canonicalizer(endpoint) if endpoint else None
+
+    def _material(self, kwargs: Dict) -> bytes:
+        """Serialize arguments."""
+        items = sorted(kwargs.items())
+        if not _stable_types.issuperset(map(type, kwargs.values())):
+            items = [(name, _stable(value)) for name, value in items]
+        return repr(items).encode("utf-8", "surrogatepass")
+
+    def build(self, kwargs: Dict) -> Union[str, bytes]:
+        """Create a cache key from the request arguments."""
+        if self.canonicalizer is not None:
+            kwargs = self.canonicalizer.apply(kwargs)
+
+        if self.spec is not None:
+            kwargs = self.spec.apply(kwargs, keep=self.path_args)
+
+        hasher = self._seed.copy()
+        hasher.update(self._material(kwargs))
+        digest = hasher.digest()
+
+        if self.encoding == "binary":
+            return digest
+        if self.encoding == "hex":
+            return digest.hex()
+        return (
+            binascii.b2a_base64(digest, newline=False)
+            .translate(_urlsafe)
+            .rstrip(b"=")
+            .decode()
+        )
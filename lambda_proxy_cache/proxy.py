@@ -1,14 +1,28 @@
 """Translate request from AWS api-gateway."""
 
-from typing import Any, Callable, Dict
+from typing import Any, Callable, Dict, Optional, Tuple, Union
 
+import re
 import json
+import math
+import time
 import base64
 import hashlib
 import warnings
+import functools
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait
 
 from lambda_proxy import proxy
 from lambda_proxy_cache.backends.base import LambdaProxyCacheBase
+from lambda_proxy_cache.compression import compress, decompress
+from lambda_proxy_cache.entry import pack, should_recompute, unpack
+from lambda_proxy_cache.hedging import Hedge
+from lambda_proxy_cache.keys import KeyBuilder, KeySpec
+from lambda_proxy_cache.singleflight import SingleFlight
+from lambda_proxy_cache.utils import get_remaining_time
+from lambda_proxy_cache.writebehind import WriteBehind
 
 
 def get_hash(**kwargs: Any) -> str:
@@ -18,13 +32,57 @@ def get_hash(**kwargs: Any) -> str:
     ).hexdigest()
 
 
+max_age_expr = re.compile(r"(?:^|,)\s*(s-maxage|max-age)\s*=\s*(\d+)")
+
+
+def _get_max_age(cache_control: Optional[str]) -> Optional[int]:
+    """Get shared caches max-age (s-maxage or max-age) from Cache-Control."""
+    if not cache_control:
+        return None
+
+    directives = dict(max_age_expr.findall(cache_control.lower()))
+    max_age = directives.get("s-maxage", directives.get("max-age"))
+    return int(max_age) if max_age else None
+
+
 class RouteEntry(proxy.RouteEntry):
     """API Route."""
 
     def __init__(self, *args, **kwargs) -> None:
         """Initialize route object."""
         self.no_cache = kwargs.pop("no_cache", False)
+        self.cache_key = kwargs.pop("cache_key", None)
+        self.negative_cache = kwargs.pop("negative_cache", None) or {}
+        self.cache_ttl = kwargs.pop("cache_ttl", None)
+        self.stale_while_revalidate = kwargs.pop("stale_while_revalidate", 0)
+        self.stale_if_error = kwargs.pop("stale_if_error", 0)
+        self.early_recompute = kwargs.pop("early_recompute", 0)
+        cache_compression = kwargs.pop("cache_compression", None)
+        self.cache_rendered = kwargs.pop("cache_rendered", False)
+        self.prefetch = kwargs.pop("prefetch", None)
         super(RouteEntry, self).__init__(*args, **kwargs)
+        # Entries of routes with compressed responses are stored compressed
+        self.cache_compression = (
+            self.compression if cache_compression is None else cache_compression
+        )
+        if self.cache_compression not in ["", False, "gzip", "zlib", "deflate"]:
+            raise ValueError(
+                f"'{self.cache_compression}' is not a supported compression"
+            )
+        if self.cache_ttl is None:
+            self.cache_ttl = self.ttl or _get_max_age(self.cache_control)
+
+        if (self.stale_while_revalidate or self.stale_if_error) and not self.cache_ttl:
+            raise ValueError("'cache_ttl' is required to serve stale responses")
+
+    def negative_ttl(self, status: str, error: Exception = None) -> Optional[int]:
+        """Return time to live for non-OK responses (None if not cached)."""
+        if error is not None:
+            for kind, ttl in self.negative_cache.items():
+                if isinstance(kind, type) and isinstance(error, kind):
+                    return ttl
+
+        return self.negative_cache.get(status)
 
 
 class API(proxy.API):
@@ -33,10 +91,34 @@ class API(proxy.API):
     def __init__(self, *args, **kwargs) -> None:
         """Initialize API object."""
         cache_layer: LambdaProxyCacheBase = kwargs.pop("cache_layer", None)
+        self.cache_key_digest = kwargs.pop("cache_key_digest", "blake2b")
+        self.cache_key_encoding = kwargs.pop("cache_key_encoding", "base64url")
+        single_flight = kwargs.pop("single_flight", None)
+        self.revalidate_budget = kwargs.pop("revalidate_budget", 1.0)
+        write_behind = kwargs.pop("write_behind", None)
+        self.prefetch_concurrency = kwargs.pop("prefetch_concurrency", 4)
+        self.prefetch_budget = kwargs.pop("prefetch_budget", 1.0)
+        hedge = kwargs.pop("hedge", None)
         super(API, self).__init__(*args, **kwargs)
         if cache_layer and not isinstance(cache_layer, LambdaProxyCacheBase):
             raise TypeError("cache_layer must be an instance of LambdaProxyCacheBase")
+        # backends (and derived keys, e.g. rendered responses) need text keys
+        if self.cache_key_encoding not in ["base64url", "hex"]:
+            raise ValueError(
+                f"'{self.cache_key_encoding}' is not a supported cache key encoding"
+            )
         self.cache_layer = cache_layer
+        self.single_flight: Optional[SingleFlight] = (
+            SingleFlight() if single_flight is True else single_flight or None
+        )
+        self.write_behind: Optional[WriteBehind] = (
+            WriteBehind() if write_behind is True else write_behind or None
+        )
+        self.hedge: Optional[Hedge] = Hedge() if hedge is True else hedge or None
+        self.stats: Counter = Counter()
+        self._revalidating: set = set()
+        self._lock = threading.Lock()
+        self._prefetch_executor: Optional[ThreadPoolExecutor] = None
 
     def _add_route(self, path: str, endpoint: Callable, **kwargs) -> None:
         methods = kwargs.pop("methods", ["GET"])
@@ -49,6 +131,15 @@ class API(proxy.API):
         description = kwargs.pop("description", None)
         tag = kwargs.pop("tag", None)
         no_cache = kwargs.pop("no_cache", None)
+        cache_key_spec = kwargs.pop("cache_key_spec", None)
+        negative_cache = kwargs.pop("negative_cache", None)
+        cache_ttl = kwargs.pop("cache_ttl", None)
+        stale_while_revalidate = kwargs.pop("stale_while_revalidate", 0)
+        stale_if_error = kwargs.pop("stale_if_error", 0)
+        early_recompute = kwargs.pop("early_recompute", 0)
+        cache_compression = kwargs.pop("cache_compression", None)
+        cache_rendered = kwargs.pop("cache_rendered", False)
+        prefetch = kwargs.pop("prefetch", None)
 
         if ttl:
             warnings.warn(
@@ -70,6 +161,20 @@ class API(proxy.API):
                     "URL paths must be unique.".format(path)
                 )
 
+        if isinstance(cache_key_spec, dict):
+            cache_key_spec = KeySpec(**cache_key_spec)
+
+        cache_key = KeyBuilder(
+            f"{path}-{self.name}-{self.version}",
+            digest=self.cache_key_digest,
+            encoding=self.cache_key_encoding,
+            spec=cache_key_spec,
+            path_args=[
+                proxy.param_pattern.match(arg.group()).groupdict()["name"]
+                for arg in proxy.params_expr.finditer(path)
+            ],
+            endpoint=endpoint,
+        )
         route = RouteEntry(
             endpoint,
             path,
@@ -83,15 +188,414 @@ class API(proxy.API):
             description,
             tag,
             no_cache=no_cache,
+            cache_key=cache_key,
+            negative_cache=negative_cache,
+            cache_ttl=cache_ttl,
+            stale_while_revalidate=stale_while_revalidate,
+            stale_if_error=stale_if_error,
+            early_recompute=early_recompute,
+            cache_compression=cache_compression,
+            cache_rendered=cache_rendered,
+            prefetch=prefetch,
         )
         self.routes.append(route)
 
-    def __call__(self, event: Dict, context: Dict):
-        """Initialize route and handlers."""
+    def _get_response(
+        self, route_entry: RouteEntry, function_kwargs: Dict, request_hash: str
+    ) -> Tuple:
+        """Run the endpoint and store its response in the cache layer."""
+        error = None
+        start = time.time()
+        try:
+            response = route_entry.endpoint(**function_kwargs)
+        except Exception as err:
+            self.log.error(str(err))
+            error = err
+            response = (
+                "ERROR",
+                "application/json",
+                json.dumps({"errorMessage": str(err)}),
+            )
+
+        self._cache_response(
+            route_entry, request_hash, response, time.time() - start, error
+        )
+        return response
+
+    def _cache_response(
+        self,
+        route_entry: RouteEntry,
+        request_hash: str,
+        response: Tuple,
+        duration: float,
+        error: Exception = None,
+    ) -> None:
+        """Store endpoint response (or cacheable error) in the cache layer."""
+        if self.cache_layer and not route_entry.no_cache:
+            if response[0] == "OK":
+                # `cache_ttl=0` (e.g. `Cache-Control: max-age=0`): not stored
+                if route_entry.cache_ttl != 0:
+                    self._store(route_entry, request_hash, response, duration)
+            else:
+                negative_ttl = route_entry.negative_ttl(response[0], error)
+                if negative_ttl:
+                    self._set(request_hash, response, ttl=negative_ttl)
+
+    def _store(
+        self,
+        route_entry: RouteEntry,
+        request_hash: str,
+        response: Tuple,
+        duration: float,
+    ) -> None:
+        """Store endpoint response, with its metadata when needed."""
+        value, ttl = self._entry(route_entry, response, duration)
+        self._set(request_hash, value, ttl=ttl)
+
+    def _entry(
+        self, route_entry: RouteEntry, response: Tuple, duration: float
+    ) -> Tuple[Tuple, Optional[int]]:
+        """Create cache entry and its time to live from an endpoint response."""
+        meta: Dict[str, Any] = {}
+
+        ttl = route_entry.cache_ttl
+        stale = max(route_entry.stale_while_revalidate, route_entry.stale_if_error)
+        lifetime = ttl or getattr(self.cache_layer, "timeout", None)
+        if lifetime and (stale or route_entry.early_recompute):
+            # the entry is kept `stale` seconds after its soft expiry
+            now = time.time()
+            meta.update(created=now, expires=now + lifetime, delta=duration)
+            ttl = ttl + stale if ttl else None
+
+        encoding = route_entry.cache_compression
+        if encoding and isinstance(response[2], (str, bytes)):
+            meta.update(encoding=encoding, text=isinstance(response[2], str))
+            response = (response[0], response[1], compress(response[2], encoding))
+
+        return (pack(response, **meta) if meta else response), ttl
+
+    def _set(self, key: str, value: Any, ttl: int = None) -> None:
+        """Set item in the cache layer, or queue it in write-behind mode."""
+        if self.write_behind:
+            self.write_behind.put(self.cache_layer, key, value, ttl=ttl)
+        else:
+            self.cache_layer.set(key, value, ttl=ttl)
+
+    def _set_deadline(self) -> None:
+        """Pass the invocation deadline to the cache layer."""
+        if self.cache_layer:
+            remaining = get_remaining_time(self.context)
+            self.cache_layer.set_deadline(
+                time.time() + remaining if remaining is not None else None
+            )
+
+    def _flush(self) -> None:
+        """Wait for the queued writes before the Lambda container is frozen."""
+        if self.write_behind:
+            self.write_behind.flush(get_remaining_time(self.context))
+
+    def _encoding_bucket(self, route_entry: RouteEntry) -> str:
+        """Return the response encoding variant for the request."""
+        accepted_compression = self.event["headers"].get("accept-encoding", "")
+        compression = route_entry.compression
+        if compression and compression in accepted_compression:
+            return compression
+        return "identity"
+
+    def _render(self, route_entry: RouteEntry, value: Tuple) -> Dict:
+        """Create API Gateway response from endpoint or cached response."""
+        (status, content_type, body), meta = unpack(value)
+        accepted_compression = self.event["headers"].get("accept-encoding", "")
+        compression = route_entry.compression
+
+        encoding = meta.get("encoding")
+        if encoding:
+            if encoding == compression and encoding in accepted_compression:
+                # stored payload is already compressed as the response should be
+                response = self.response(
+                    status,
+                    content_type,
+                    body,
+                    cors=route_entry.cors,
+                    accepted_methods=route_entry.methods,
+                    b64encode=route_entry.b64encode,
+                    ttl=route_entry.ttl,
+                    cache_control=route_entry.cache_control,
+                )
+                response["headers"]["Content-Encoding"] = encoding
+                return response
+
+            body = decompress(body, encoding)
+            if meta.get("text"):
+                body = body.decode("utf-8")
+
+        return self.response(
+            status,
+            content_type,
+            body,
+            cors=route_entry.cors,
+            accepted_methods=route_entry.methods,
+            accepted_compression=accepted_compression,
+            compression=compression,
+            b64encode=route_entry.b64encode,
+            ttl=route_entry.ttl,
+            cache_control=route_entry.cache_control,
+        )
+
+    def _fetch(
+        self,
+        route_entry: RouteEntry,
+        function_kwargs: Dict,
+        request_hash: str,
+        seen: Any = None,
+    ) -> Tuple:
+        """
+        Run the endpoint, coalescing concurrent calls when configured.
+
+        `seen` is the cached value being replaced (e.g. an expired entry kept for
+        stale-if-error), which is not a result of the concurrent call.
+
+        """
+        if self.cache_layer and self.single_flight and not route_entry.no_cache:
+            return self.single_flight.do(
+                self.cache_layer,
+                request_hash,
+                lambda: self._get_response(route_entry, function_kwargs, request_hash),
+                timeout=get_remaining_time(self.context),
+                seen=seen,
+            )
+
+        return self._get_response(route_entry, function_kwargs, request_hash)
+
+    def _revalidate(
+        self, route_entry: RouteEntry, function_kwargs: Dict, request_hash: str
+    ) -> None:
+        """Refresh a stale entry in a background thread."""
+        remaining = get_remaining_time(self.context)
+        if remaining is not None and remaining < self.revalidate_budget:
+            self.stats["revalidations_skipped"] += 1
+            return
+
+        with self._lock:
+            if request_hash in self._revalidating:
+                return
+            self._revalidating.add(request_hash)
+
+        def _run():
+            try:
+                self._fetch(route_entry, function_kwargs, request_hash)
+            finally:
+                with self._lock:
+                    self._revalidating.discard(request_hash)
+
+        self.stats["revalidations"] += 1
+        # In Lambda, the thread is frozen with the container after the response is
+        # returned and resumes on the next warm invocation.
+        threading.Thread(target=_run, daemon=True).start()
+
+    def _compute(self, route_entry: RouteEntry, function_kwargs: Dict) -> Tuple:
+        """Run the endpoint for a prefetched request."""
+        start = time.time()
+        response = route_entry.endpoint(**function_kwargs)
+        return response, time.time() - start
+
+    def _prefetch(
+        self, route_entry: RouteEntry, function_kwargs: Dict, request_hash: str
+    ) -> None:
+        """Prefetch the related requests in a background thread."""
+        if not route_entry.prefetch or not self.cache_layer or route_entry.no_cache:
+            return
+
+        if route_entry.cache_ttl == 0:
+            return
+
+        remaining = get_remaining_time(self.context)
+        if remaining is not None and remaining < self.prefetch_budget:
+            self.stats["prefetch_skipped"] += 1
+            return
+
+        # In Lambda, the thread is frozen with the container after the response is
+        # returned and resumes on the next warm invocation.
+        threading.Thread(
+            target=self._prefetch_related,
+            args=(route_entry, function_kwargs, request_hash),
+            daemon=True,
+        ).start()
+
+    def _prefetch_related(
+        self, route_entry: RouteEntry, function_kwargs: Dict, request_hash: str
+    ) -> None:
+        """
+        Compute and store the related requests missing from the cache layer.
+
+        The endpoint is called for at most `prefetch_concurrency` requests at a
+        time. Responses ready within `prefetch_budget` seconds are stored with one
+        batch write, late ones are stored when they are done.
+
+        """
+        missing = self._missing_related(route_entry, function_kwargs, request_hash)
+        if not missing:
+            return
+
+        with self._lock:
+            if self._prefetch_executor is None:
+                self._prefetch_executor = ThreadPoolExecutor(
+                    max_workers=self.prefetch_concurrency
+                )
+
+        futures = {
+            self._prefetch_executor.submit(self._compute, route_entry, kwargs): key
+            for key, kwargs in missing.items()
+        }
+        done, not_done = wait(futures, timeout=self.prefetch_budget)
+
+        items: Dict[str, Any] = {}
+        ttl = None
+        for future in done:
+            try:
+                response, duration = future.result()
+            except Exception:
+                self.stats["prefetch_errors"] += 1
+                continue
+            if response[0] == "OK":
+                items[futures[future]], ttl = self._entry(
+                    route_entry, response, duration
+                )
+
+        if items:
+            self.stats["prefetch_computed"] += len(items)
+            self.cache_layer.set_many(items, ttl=ttl)
+
+        for future in not_done:
+            self.stats["prefetch_timeouts"] += 1
+            if not future.cancel():
+                future.add_done_callback(
+                    functools.partial(
+                        self._store_prefetched, route_entry, futures[future]
+                    )
+                )
+
+    def _related(
+        self, route_entry: RouteEntry, function_kwargs: Dict, request_hash: str
+    ) -> Dict[str, Dict]:
+        """Return the related requests arguments by cache key."""
+        try:
+            related = {
+                route_entry.cache_key.build(kwargs): kwargs
+                for kwargs in route_entry.prefetch(**function_kwargs)
+            }
+        except Exception as err:
+            self.log.error(f"prefetch: {err}")
+            self.stats["prefetch_errors"] += 1
+            return {}
+
+        related.pop(request_hash, None)
+        self.stats["prefetch_requests"] += len(related)
+        return related
+
+    def _missing_related(
+        self, route_entry: RouteEntry, function_kwargs: Dict, request_hash: str
+    ) -> Dict[str, Dict]:
+        """Return the related requests arguments missing from the cache layer."""
+        related = self._related(route_entry, function_kwargs, request_hash)
+        if not related:
+            return {}
+
+        cached = self.cache_layer.get_many(list(related))
+        self.stats["prefetch_hits"] += len(cached)
+        return {key: kwargs for key, kwargs in related.items() if key not in cached}
+
+    def _store_prefetched(self, route_entry: RouteEntry, key: str, future) -> None:
+        """Store a prefetched response computed after the time budget."""
+        try:
+            response, duration = future.result()
+        except Exception:
+            return
+        if response[0] == "OK":
+            self._store(route_entry, key, response, duration)
+
+    def _read(self, key: str, compute: Callable = None) -> Any:
+        """Get item from the cache layer, hedging slow reads when configured."""
+        if not self.hedge:
+            return self.cache_layer.get(key)
+
+        def read():
+            return self.cache_layer.get(key)
+
+        if self.hedge.compute and compute:
+            # a miss waits for the computed response instead of computing it again
+            return self.hedge.run(read, compute, accept=bool)
+        return self.hedge.run(read, read)
+
+    def _lookup(
+        self, route_entry: RouteEntry, function_kwargs: Dict, request_hash: str
+    ) -> Tuple[Optional[Tuple], Optional[Tuple]]:
+        """
+        Get response from the cache layer.
+
+        Returns the cached value to use (None if the endpoint has to be called)
+        and a cached value to return if the endpoint fails.
+
+        """
+        if not self.cache_layer or route_entry.no_cache:
+            return None, None
+
+        cached = self._read(
+            request_hash,
+            lambda: self._fetch(route_entry, function_kwargs, request_hash),
+        )
+        response, fallback, revalidate = self._check(route_entry, cached)
+        if revalidate:
+            self._revalidate(route_entry, function_kwargs, request_hash)
+        return response, fallback
+
+    def _check(
+        self, route_entry: RouteEntry, cached: Any
+    ) -> Tuple[Optional[Tuple], Optional[Tuple], bool]:
+        """
+        Check a cached value freshness.
+
+        Returns the cached value to use, a cached value to return if the endpoint
+        fails, and whether the entry has to be refreshed in the background.
+
+        """
+        if not cached:
+            return None, None, False
+
+        _, meta = unpack(cached)
+
+        now = time.time()
+        if meta.get("expires", now) < now:
+            age = now - meta["expires"]
+            if age <= route_entry.stale_while_revalidate:
+                self.stats["stale_hits"] += 1
+                return cached, None, True
+
+            if age <= route_entry.stale_if_error:
+                return None, cached, False
+            return None, None, False
+
+        if should_recompute(meta, route_entry.early_recompute, now):
+            self.stats["early_recomputes"] += 1
+            return None, cached, False
+
+        return cached, None, False
+
+    def _parse_request(
+        self, event: Dict, context: Dict
+    ) -> Union[Dict, Tuple[RouteEntry, Dict, str]]:
+        """
+        Match the request with a route.
+
+        Returns the route, the endpoint arguments and the cache key, or an error
+        response.
+
+        """
         self.log.debug(json.dumps(event, default=str))
 
         self.event = event
         self.context = context
+        self._set_deadline()
 
         # HACK: For an unknown reason some keys can have lower or upper case.
         # To make sure the app works well we cast all the keys to lowercase.
@@ -143,44 +647,67 @@ class API(proxy.API):
                 body = base64.b64decode(body).decode()
             function_kwargs.update(dict(body=body))
 
-        req = function_kwargs.copy()
-        req.update(
-            dict(app_route_id=f"{self.request_path.path}-{self.name}-{self.version}")
+        return (
+            route_entry,
+            function_kwargs,
+            route_entry.cache_key.build(function_kwargs),
         )
-        request_hash = get_hash(**req)
 
-        response = (
-            self.cache_layer.get(request_hash)
-            if self.cache_layer and not route_entry.no_cache
-            else None
-        )
+    def _rendered_key(
+        self, route_entry: RouteEntry, request_hash: str
+    ) -> Optional[str]:
+        """Return the rendered response cache key (None if not cached)."""
+        if route_entry.cache_rendered and self.cache_layer and not route_entry.no_cache:
+            return f"{request_hash}.{self._encoding_bucket(route_entry)}"
+        return None
+
+    def _store_rendered(
+        self, route_entry: RouteEntry, key: str, response: Tuple, message: Dict
+    ) -> None:
+        """Store a rendered response, unless it is an error or a stale entry."""
+        if response[0] != "OK" or route_entry.cache_ttl == 0:
+            return
+
+        ttl = route_entry.cache_ttl
+        _, meta = unpack(response)
+        if "expires" in meta:
+            # stale entries (stale-while-revalidate, stale-if-error) are not
+            # stored, fresh ones are stored until their expiry
+            remaining = meta["expires"] - time.time()
+            if remaining <= 0:
+                return
+            ttl = min(ttl or math.ceil(remaining), math.ceil(remaining))
+
+        self._set(key, message, ttl=ttl)
+
+    def __call__(self, event: Dict, context: Dict):
+        """Initialize route and handlers."""
+        request = self._parse_request(event, context)
+        if isinstance(request, dict):
+            return request
+
+        route_entry, function_kwargs, request_hash = request
+
+        rendered_key = self._rendered_key(route_entry, request_hash)
+        if rendered_key:
+            rendered = self._read(rendered_key)
+            if isinstance(rendered, dict):
+                self.stats["rendered_hits"] += 1
+                return rendered
+
+        response, fallback = self._lookup(route_entry, function_kwargs, request_hash)
         if not response:
-            try:
-                response = route_entry.endpoint(**function_kwargs)
-                if (
-                    self.cache_layer
-                    and response[0] == "OK"
-                    and not route_entry.no_cache
-                ):
-                    self.cache_layer.set(request_hash, response)
-
-            except Exception as err:
-                self.log.error(str(err))
-                response = (
-                    "ERROR",
-                    "application/json",
-                    json.dumps({"errorMessage": str(err)}),
-                )
+            response = self._fetch(
+                route_entry, function_kwargs, request_hash, seen=fallback
+            )
+            if fallback is not None and response[0] == "ERROR":
+                self.stats["stale_if_error"] += 1
+                response = fallback
 
-        return self.response(
-            response[0],
-            response[1],
-            response[2],
-            cors=route_entry.cors,
-            accepted_methods=route_entry.methods,
-            accepted_compression=self.event["headers"].get("accept-encoding", ""),
-            compression=route_entry.compression,
-            b64encode=route_entry.b64encode,
-            ttl=route_entry.ttl,
-            cache_control=route_entry.cache_control,
-        )
+        message = self._render(route_entry, response)
+        if rendered_key:
+            self._store_rendered(route_entry, rendered_key, response, message)
+
+        self._prefetch(route_entry, function_kwargs, request_hash)
+        self._flush()
+        return message
@@ -0,0 +1,166 @@
+"""lambda-proxy-cache request coalescing."""
+
+from typing import Any, Callable, Dict, Optional
+
+import time
+import uuid
+import threading
+from collections import Counter
+
+from lambda_proxy_cache.backends.base import LambdaProxyCacheBase
+from lambda_proxy_cache.entry import unpack
+
+
+def _is_newer(value: Any, seen: Any) -> bool:
+    """Check if a polled value replaces the entry already seen by the caller."""
+    if seen is None:
+        return True
+
+    if isinstance(value, (list, tuple)) and isinstance(seen, (list, tuple)):
+        _, meta = unpack(value)
+        _, seen_meta = unpack(seen)
+        if "created" in seen_meta:
+            return meta.get("created", 0) > seen_meta["created"]
+
+    return value != seen
+
+
+class _Call(object):
+    """In-flight call."""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[Exception] = None
+
+
+class SingleFlight(object):
+    """
+    Coalesce concurrent cache misses on the same key.
+
+    Inside one process, threads asking for a key which is already being computed
+    wait for the result of the first call.
+
+    Across Lambda containers, the first miss takes a short lease in the cache
+    layer (`LambdaProxyCacheBase.add`, e.g. memcached `add` or DynamoDB
+    conditional put). The other invocations poll the cache for the result
+    instead of recomputing it, and compute it themselves if it does not show up
+    in time. When the lease cannot be taken and no lease is stored (e.g. the
+    cache layer is unreachable), the result is computed right away.
+
+    """
+
+    def __init__(
+        self,
+        lease_ttl: int = 10,
+        wait: float = 5.0,
+        poll_interval: float = 0.05,
+        distributed: bool = True,
+    ):
+        """
+        Initialize single-flight.
+
+        Parameters
+        ----------
+        lease_ttl: integer, lease time to live in seconds
+        wait: float, maximum time to wait for another invocation result
+        poll_interval: float, cache polling interval in seconds
+        distributed: bool, take leases in the cache layer
+
+        """
+        self.lease_ttl = lease_ttl
+        self.wait = wait
+        self.poll_interval = poll_interval
+        self.distributed = distributed
+        self.stats: Counter = Counter()
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(
+        self,
+        cache: LambdaProxyCacheBase,
+        key: str,
+        compute: Callable,
+        timeout: Optional[float] = None,
+        seen: Any = None,
+    ) -> Any:
+        """
+        Return `compute()` result, computing it only once for concurrent calls.
+
+        Parameters
+        ----------
+        cache: LambdaProxyCacheBase, cache layer where `compute` stores its result
+        key: string, cache key
+        compute: callable, compute and store the result in the cache
+        timeout: float, maximum waiting time (e.g. invocation remaining time)
+        seen: cached value being replaced (e.g. an expired entry still stored),
+            ignored when polling for the lease holder result
+
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            self.stats["coalesced"] += 1
+            call.done.wait(timeout)
+            if call.error is not None:
+                raise call.error
+            if call.result is not None:
+                return call.result
+            return compute()
+
+        try:
+            call.result = self._do_distributed(cache, key, compute, timeout, seen)
+            return call.result
+        except Exception as err:
+            call.error = err
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def _do_distributed(
+        self,
+        cache: LambdaProxyCacheBase,
+        key: str,
+        compute: Callable,
+        timeout: Optional[float] = None,
+        seen: Any = None,
+    ) -> Any:
+        """Take a lease in the cache layer or wait for the lease holder."""
+        if not self.distributed:
+            return compute()
+
+        lease_key = f"{key}.lease"
+        if cache.add(lease_key, uuid.uuid4().hex, ttl=self.lease_ttl):
+            self.stats["leases"] += 1
+            try:
+                return compute()
+            finally:
+                cache.delete(lease_key)
+
+        # cache layers also refuse writes when they fail (e.g. connection
+        # refused, open circuit breaker): only wait for an actual lease holder
+        if not cache.get(lease_key):
+            value = cache.get(key)
+            if value and _is_newer(value, seen):
+                self.stats["waited"] += 1
+                return value
+            self.stats["lease_errors"] += 1
+            return compute()
+
+        wait = self.wait if timeout is None else min(self.wait, timeout)
+        deadline = time.monotonic() + wait
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            value = cache.get(key)
+            if value and _is_newer(value, seen):
+                self.stats["waited"] += 1
+                return value
+
+        self.stats["wait_timeouts"] += 1
+        return compute()
@@ -0,0 +1,16 @@
+"""lambda-proxy-cache utility functions."""
+
+from typing import Any, Optional
+
+
+def get_remaining_time(context: Any) -> Optional[float]:
+    """
+    Return the invocation remaining time in seconds.
+
+    Returns None when the context is not a Lambda context (e.g. in tests).
+
+    """
+    try:
+        return context.get_remaining_time_in_millis() / 1000
+    except (AttributeError, TypeError):
+        return None
@@ -0,0 +1,131 @@
+"""lambda-proxy-cache background (write-behind) cache population."""
+
+from typing import Optional
+
+import time
+import threading
+from collections import Counter, deque
+
+from lambda_proxy_cache.backends.base import LambdaProxyCacheBase
+
+
+class WriteBehind(object):
+    """
+    Write cache entries from a background thread.
+
+    Writes are added to a bounded in-process queue and written to the cache
+    layer by a daemon thread, so the response does not wait for the backend
+    (e.g. S3 `put_object`). Writes are dropped when the queue is full.
+
+    In Lambda, the container is frozen after the handler returns: writes which
+    are not done by then are resumed on the next warm invocation, or lost if the
+    container is recycled. By default `flush` does not wait for them, a
+    `flush_timeout` bounds the time spent waiting for the queued writes (within
+    the invocation remaining time).
+
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1000,
+        flush_timeout: Optional[float] = 0,
+        margin: float = 0.1,
+    ):
+        """
+        Initialize write-behind queue.
+
+        Parameters
+        ----------
+        max_size: integer, maximum number of queued writes
+        flush_timeout: float, maximum time to wait for queued writes at the end
+            of an invocation (default to 0, never wait; None to wait until the
+            invocation deadline)
+        margin: float, time in seconds kept before the invocation deadline
+
+        """
+        self.max_size = max_size
+        self.flush_timeout = flush_timeout
+        self.margin = margin
+        self.stats: Counter = Counter()
+        self.flush_time = 0.0
+        self._items: deque = deque()
+        self._pending = 0
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def put(
+        self, cache: LambdaProxyCacheBase, key: str, value, ttl: int = None
+    ) -> bool:
+        """Queue a write, return False if it was dropped."""
+        with self._cond:
+            if len(self._items) >= self.max_size:
+                self.stats["dropped"] += 1
+                return False
+
+            self._items.append((cache, key, value, ttl))
+            self._pending += 1
+            self.stats["queued"] += 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+        return True
+
+    def _run(self) -> None:
+        """Write queued entries."""
+        while True:
+            with self._cond:
+                while not self._items:
+                    self._cond.wait()
+                cache, key, value, ttl = self._items.popleft()
+
+            try:
+                if cache.set(key, value, ttl=ttl):
+                    self.stats["written"] += 1
+                else:
+                    self.stats["failed"] += 1
+            except Exception:
+                self.stats["failed"] += 1
+            finally:
+                with self._cond:
+                    self._pending -= 1
+                    self._cond.notify_all()
+
+    def flush(self, remaining_time: Optional[float] = None) -> bool:
+        """
+        Wait for the queued writes.
+
+        Parameters
+        ----------
+        remaining_time: float, invocation remaining time in seconds
+
+        Returns
+        -------
+        True if all the queued writes are done.
+
+        """
+        timeout = self.flush_timeout
+        if remaining_time is not None:
+            budget = max(remaining_time - self.margin, 0)
+            timeout = budget if timeout is None else min(timeout, budget)
+
+        start = time.time()
+        deadline = start + timeout if timeout is not None else None
+        with self._cond:
+            if not self._pending:
+                return True
+
+            while self._pending:
+                wait = deadline - time.time() if deadline is not None else None
+                if wait is not None and wait <= 0:
+                    break
+                self._cond.wait(wait)
+
+            done = not self._pending
+
+        self.stats["flushes"] += 1
+        self.flush_time += time.time() - start
+        if not done:
+            self.stats["flush_timeouts"] += 1
+        return done
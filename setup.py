@@ -10,6 +10,7 @@ inst_reqs = ["lambda-proxy~=5.2"]
 extra_reqs = {
     "aws": ["boto3"],
     "memcache": ["python-binary-memcached"],
+    "redis": ["redis"],
     "test": ["pytest", "pytest-cov", "mock"],
     "dev": ["pytest", "pytest-cov", "mock", "pre-commit"],
 }
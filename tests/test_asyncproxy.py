@@ -0,0 +1,289 @@
+"""Test lambda-proxy-cache asyncio API."""
+
+import time
+import asyncio
+
+from mock import Mock, patch
+
+from lambda_proxy_cache.asyncproxy import AsyncAPI
+from lambda_proxy_cache.backends.base import LambdaProxyCacheBase
+from lambda_proxy_cache.backends.memory import MemoryCache
+from lambda_proxy_cache.backends.tiered import TieredCache
+from lambda_proxy_cache.hedging import Hedge
+
+
+def _event(path: str) -> dict:
+    return {
+        "path": path,
+        "httpMethod": "GET",
+        "headers": {},
+        "queryStringParameters": {},
+    }
+
+
+def _drain(app: AsyncAPI) -> None:
+    """Run the API event loop until its background tasks are done."""
+
+    async def drain():
+        while app._tasks or app._writes:
+            await asyncio.wait(app._tasks | app._writes)
+
+    app.loop.run_until_complete(drain())
+
+
+class SlowCache(LambdaProxyCacheBase):
+    """Cache layer with slow writes."""
+
+    def __init__(self):
+        """Initialize cache."""
+        self.written = []
+
+    def get(self, key):
+        """Get item."""
+        return None
+
+    def set(self, key, value, ttl=None):
+        """Set item."""
+        time.sleep(0.2)
+        self.written.append(key)
+        return True
+
+    def add(self, key, value, ttl=None):
+        """Add item."""
+        return self.set(key, value, ttl=ttl)
+
+    def delete(self, key):
+        """Delete item."""
+        return True
+
+
+def test_AsyncAPI():
+    """Should await async endpoints and cache their responses."""
+    cache = MemoryCache()
+    app = AsyncAPI(name="test", cache_layer=cache)
+    calls = []
+
+    async def endpoint(id):
+        calls.append(id)
+        await asyncio.sleep(0)
+        return ("OK", "text/plain", f"heyyyy {id}")
+
+    app._add_route("/test/<int:id>", endpoint, methods=["GET"])
+    funct = Mock(__name__="Mock", return_value=("OK", "text/plain", "sync"))
+    app._add_route("/sync/<int:id>", funct, methods=["GET"])
+
+    res = app(_event("/test/1"), {})
+    assert res["statusCode"] == 200
+    assert res["body"] == "heyyyy 1"
+    assert app(_event("/test/1"), {})["body"] == "heyyyy 1"
+    assert calls == [1]
+    assert len(cache) == 1
+
+    # blocking endpoints run in the executor
+    assert app(_event("/sync/1"), {})["body"] == "sync"
+    funct.assert_called_once_with(id=1)
+
+    res = app(_event("/nope"), {})
+    assert res["statusCode"] == 400
+
+    for h in app.log.handlers:
+        app.log.removeHandler(h)
+
+
+def test_AsyncAPI_error():
+    """Should return endpoint errors and fallback to stale entries."""
+    cache = MemoryCache()
+    app = AsyncAPI(name="test", cache_layer=cache)
+
+    async def endpoint(id):
+        raise Exception("nope")
+
+    app._add_route(
+        "/test/<int:id>", endpoint, methods=["GET"], cache_ttl=1, stale_if_error=60
+    )
+
+    res = app(_event("/test/1"), {})
+    assert res["statusCode"] == 500
+    assert not len(cache)
+
+    key = app.routes[-1].cache_key.build({"id": 1})
+    now = time.time()
+    meta = dict(created=now - 10, expires=now - 5, delta=0.1)
+    cache.set(key, ("OK", "text/plain", "old", meta))
+    assert app(_event("/test/1"), {})["body"] == "old"
+    assert app.stats["stale_if_error"] == 1
+
+    for h in app.log.handlers:
+        app.log.removeHandler(h)
+
+
+def test_AsyncAPI_coalescing():
+    """Should run the endpoint once for concurrent requests on the same key."""
+    app = AsyncAPI(name="test", cache_layer=MemoryCache())
+    calls = []
+
+    async def endpoint(id):
+        calls.append(id)
+        await asyncio.sleep(0.05)
+        return ("OK", "text/plain", "heyyyy")
+
+    app._add_route("/test/<int:id>", endpoint, methods=["GET"])
+
+    async def run():
+        return await asyncio.gather(
+            *[app.dispatch(_event("/test/1"), {}) for _ in range(3)]
+        )
+
+    responses = asyncio.new_event_loop().run_until_complete(run())
+    assert [r["body"] for r in responses] == ["heyyyy"] * 3
+    assert calls == [1]
+    assert app.stats["coalesced"] == 2
+
+    for h in app.log.handlers:
+        app.log.removeHandler(h)
+
+
+def test_AsyncAPI_writes():
+    """Should write entries concurrently and wait for them before returning."""
+    cache = SlowCache()
+
+    app = AsyncAPI(name="test", cache_layer=cache)
+    funct = Mock(__name__="Mock", return_value=("OK", "text/plain", "heyyyy"))
+    app._add_route("/test/<int:id>", funct, methods=["GET"], cache_rendered=True)
+
+    app(_event("/test/1"), {})
+    # endpoint response and rendered response
+    assert len(cache.written) == 2
+    assert not app._writes
+
+    # writes not done before the deadline resume on the next invocation
+    context = Mock(get_remaining_time_in_millis=Mock(return_value=150))
+    start = time.time()
+    app(_event("/test/2"), context)
+    assert time.time() - start < 0.2
+    assert app.stats["flush_timeouts"] == 1
+    assert app._writes
+
+    app(_event("/test/3"), {})
+    assert not app._writes
+    assert len(cache.written) == 6
+
+    for h in app.log.handlers:
+        app.log.removeHandler(h)
+
+
+def test_AsyncAPI_prefetch():
+    """Should prefetch related requests concurrently."""
+    cache = TieredCache([MemoryCache(), MemoryCache()])
+
+    def neighbours(z, x, y):
+        return [dict(z=z, x=x + dx, y=y) for dx in [-1, 0, 1]]
+
+    app = AsyncAPI(name="test", cache_layer=cache, prefetch_budget=0.5)
+    calls = []
+
+    async def endpoint(z, x, y):
+        calls.append(x)
+        return ("OK", "text/plain", "heyyyy")
+
+    app._add_route(
+        "/tiles/<int:z>/<int:x>/<int:y>", endpoint, methods=["GET"], prefetch=neighbours
+    )
+
+    app(_event("/tiles/1/2/3"), {})
+    _drain(app)
+    assert sorted(calls) == [1, 2, 3]
+    assert app.stats["prefetch_computed"] == 2
+    assert len(cache.tiers[1].backend) == 3
+
+    app(_event("/tiles/1/3/3"), {})
+    _drain(app)
+    assert sorted(calls) == [1, 2, 3, 4]
+    assert app.stats["prefetch_hits"] == 1
+
+    # the response does not wait for slow related requests
+    async def slow(z, x, y):
+        if x != 10:
+            await asyncio.sleep(2)
+        return ("OK", "text/plain", "slow")
+
+    app = AsyncAPI(name="test", cache_layer=MemoryCache(), prefetch_budget=0.2)
+    app._add_route(
+        "/slow/<int:z>/<int:x>/<int:y>", slow, methods=["GET"], prefetch=neighbours
+    )
+    start = time.time()
+    assert app(_event("/slow/1/10/3"), {})["body"] == "slow"
+    assert time.time() - start < 0.3
+    _drain(app)
+    assert app.stats["prefetch_timeouts"] == 2
+    assert len(app.cache_layer) == 3
+
+    for h in app.log.handlers:
+        app.log.removeHandler(h)
+
+
+def test_AsyncAPI_hedge():
+    """Should hedge slow cache reads with the endpoint computation."""
+    cache = MemoryCache()
+    app = AsyncAPI(
+        name="test", cache_layer=cache, hedge=Hedge(delay=0.05, compute=True)
+    )
+    calls = []
+
+    async def endpoint(id):
+        calls.append(id)
+        return ("OK", "text/plain", "heyyyy")
+
+    app._add_route("/test/<int:id>", endpoint, methods=["GET"])
+
+    async def slow(key):
+        await asyncio.sleep(0.3)
+        return None
+
+    with patch.object(cache, "aget", side_effect=slow):
+        start = time.time()
+        assert app(_event("/test/1"), {})["body"] == "heyyyy"
+        assert time.time() - start < 0.2
+    assert calls == [1]
+    assert app.hedge.stats["won"] == 1
+    # the slow read is done in the next invocations
+    app.loop.run_until_complete(asyncio.sleep(0.3))
+
+    for h in app.log.handlers:
+        app.log.removeHandler(h)
+
+
+def test_AsyncAPI_revalidate():
+    """Should not wait for background revalidations."""
+    cache = MemoryCache()
+    app = AsyncAPI(name="test", cache_layer=cache)
+
+    async def endpoint(id):
+        await asyncio.sleep(1.5)
+        return ("OK", "text/plain", "new")
+
+    app._add_route(
+        "/test/<int:id>",
+        endpoint,
+        methods=["GET"],
+        cache_ttl=1,
+        stale_while_revalidate=60,
+    )
+
+    key = app.routes[-1].cache_key.build({"id": 1})
+    now = time.time()
+    meta = dict(created=now - 10, expires=now - 5, delta=0.1)
+    cache.set(key, ("OK", "text/plain", "old", meta))
+
+    start = time.time()
+    assert app(_event("/test/1"), {})["body"] == "old"
+    assert time.time() - start < 0.2
+    assert app.stats["revalidations"] == 1
+    assert app._tasks
+
+    # the revalidation resumes on the next invocations
+    _drain(app)
+    assert cache.get(key)[2] == "new"
+
+    for h in app.log.handlers:
+        app.log.removeHandler(h)
@@ -0,0 +1,362 @@
+"""Test lambda-proxy-cache AWS and memcached backends."""
+
+import io
+import json
+import time
+
+import pytest
+from botocore.config import Config
+from mock import patch
+
+from lambda_proxy_cache.backends import aws
+from lambda_proxy_cache.backends.base import LambdaProxyCacheBase, raising_errors
+from lambda_proxy_cache.backends.dynamodb import DynamoDBCache
+from lambda_proxy_cache.backends.memcache import MemcachedCache
+from lambda_proxy_cache.backends.memory import MemoryCache
+from lambda_proxy_cache.backends.s3 import S3Cache
+
+
+@pytest.fixture(autouse=True)
+def clients():
+    """Clear shared AWS clients."""
+    aws.clear_clients()
+    yield
+    aws.clear_clients()
+
+
+@patch("lambda_proxy_cache.backends.memcache.bmemcached.Client")
+def test_MemcachedCache_ttl(client):
+    """Should pass ttl to memcached."""
+    cache = MemcachedCache(time=60)
+    cache.set("key", ("OK", "text/plain", "heyyyy"))
+    assert client.return_value.set.call_args[1]["time"] == 60
+
+    cache.set("key", ("OK", "text/plain", "heyyyy"), ttl=10)
+    assert client.return_value.set.call_args[1]["time"] == 10
+
+    # expired right away, instead of stored with the default time to live
+    client.return_value.set.reset_mock()
+    assert not cache.set("key", ("OK", "text/plain", "heyyyy"), ttl=0)
+    assert cache.set_many({"key": ("OK", "text/plain", "heyyyy")}, ttl=0) == ["key"]
+    client.return_value.set.assert_not_called()
+
+    # more than 30 days: unix timestamp
+    cache.set("key", ("OK", "text/plain", "heyyyy"), ttl=31 * 86400)
+    assert client.return_value.set.call_args[1]["time"] > time.time()
+
+
+@patch("lambda_proxy_cache.backends.aws.boto3_session")
+def test_DynamoDBCache_ttl(session):
+    """Should store ttl and reject expired items."""
+    client = session.return_value.client.return_value
+    cache = DynamoDBCache("table", time=60)
+    assert cache.set("key", ("OK", "text/plain", "heyyyy"), ttl=10)
+    item = client.put_item.call_args[1]["Item"]
+    assert int(time.time()) + 9 <= int(item["ttl"]["N"]) <= int(time.time()) + 10
+
+    client.get_item.return_value = {"Item": item}
+    assert cache.get("key") == ("OK", "text/plain", "heyyyy")
+
+    item["ttl"]["N"] = str(int(time.time()) - 1)
+    assert not cache.get("key")
+
+
+@patch("lambda_proxy_cache.backends.aws.boto3_session")
+def test_S3Cache_ttl(session):
+    """Should store expiry in object metadata and check it on read."""
+    client = session.return_value.client.return_value
+    cache = S3Cache("bucket", prefix="cache")
+    assert cache.set("key", ("OK", "text/plain", "heyyyy"))
+    kwargs = client.put_object.call_args[1]
+    assert kwargs["Key"] == "cache/key"
+    assert kwargs["Metadata"] == {}
+
+    cache.set("key", ("OK", "text/plain", "heyyyy"), ttl=10)
+    metadata = client.put_object.call_args[1]["Metadata"]
+    assert int(metadata["expires"]) <= time.time() + 10
+
+    body = client.put_object.call_args[1]["Body"]
+    client.get_object.return_value = {"Body": io.BytesIO(body), "Metadata": metadata}
+    assert cache.get("key") == ("OK", "text/plain", "heyyyy")
+
+    metadata = {"expires": str(int(time.time()) - 1)}
+    stream = io.BytesIO(body)
+    client.get_object.return_value = {"Body": stream, "Metadata": metadata}
+    assert not cache.get("key")
+    assert stream.closed
+
+
+@patch("lambda_proxy_cache.backends.aws.boto3_session")
+def test_DynamoDBCache_binary(session):
+    """Should store entries as binary attribute and read legacy entries."""
+    client = session.return_value.client.return_value
+    cache = DynamoDBCache("table")
+    assert cache.set("key", ("OK", "image/png", b"\x89PNG"))
+    item = client.put_item.call_args[1]["Item"]
+    assert isinstance(item["content"]["B"], bytes)
+    client.get_item.return_value = {"Item": item}
+    assert cache.get("key") == ("OK", "image/png", b"\x89PNG")
+
+    item = {
+        "key": {"S": "key"},
+        "content": {"S": json.dumps(["OK", "text/plain", "heyyyy"])},
+        "ttl": {"N": str(int(time.time()) + 10)},
+    }
+    client.get_item.return_value = {"Item": item}
+    assert cache.get("key") == ["OK", "text/plain", "heyyyy"]
+
+
+@patch("lambda_proxy_cache.backends.memcache.bmemcached.Client")
+def test_MemcachedCache_codec(client):
+    """Should store encoded entries and read legacy (pickled) entries."""
+    cache = MemcachedCache()
+    cache.set("key", ("OK", "image/png", b"\x89PNG"))
+    data = client.return_value.set.call_args[0][1]
+    assert isinstance(data, bytes)
+
+    client.return_value.get.return_value = data
+    assert cache.get("key") == ("OK", "image/png", b"\x89PNG")
+
+    client.return_value.get.return_value = ("OK", "text/plain", "heyyyy")
+    assert cache.get("key") == ("OK", "text/plain", "heyyyy")
+
+
+@patch("lambda_proxy_cache.backends.memcache.bmemcached.Client")
+def test_MemcachedCache_many(client):
+    """Should use multi-get and multi-set."""
+    cache = MemcachedCache(time=60)
+    client.return_value.set_multi.return_value = ["b"]
+    assert cache.set_many({"a": ("OK", "text/plain", "a"), "b": "b"}) == ["b"]
+    mapping = client.return_value.set_multi.call_args[0][0]
+    assert client.return_value.set_multi.call_args[1]["time"] == 60
+
+    client.return_value.get_multi.return_value = {"a": mapping["a"]}
+    assert cache.get_many(["a", "b"]) == {"a": ("OK", "text/plain", "a")}
+    client.return_value.get_multi.assert_called_once_with(["a", "b"])
+    client.return_value.get.assert_not_called()
+
+
+@patch("lambda_proxy_cache.backends.dynamodb.time.sleep")
+@patch("lambda_proxy_cache.backends.aws.boto3_session")
+def test_DynamoDBCache_many(session, sleep):
+    """Should use batch operations and retry unprocessed keys."""
+    client = session.return_value.client.return_value
+    cache = DynamoDBCache("table", max_retries=1)
+
+    items = {f"key{i}": ("OK", "text/plain", str(i)) for i in range(30)}
+    unprocessed = {"table": [{"PutRequest": {"Item": {"key": {"S": "key29"}}}}]}
+    client.batch_write_item.side_effect = [
+        {},
+        {"UnprocessedItems": unprocessed},
+        {"UnprocessedItems": unprocessed},
+    ]
+    # 2 batches, the last unprocessed item is retried once
+    assert cache.set_many(items) == ["key29"]
+    assert client.batch_write_item.call_count == 3
+    stored = [
+        r["PutRequest"]["Item"]
+        for call in client.batch_write_item.call_args_list[:2]
+        for r in call[1]["RequestItems"]["table"]
+    ]
+    assert len(stored) == 30
+
+    unprocessed = {"table": {"Keys": [{"key": {"S": "key1"}}]}}
+    client.batch_get_item.side_effect = [
+        {"Responses": {"table": stored[:1]}, "UnprocessedKeys": unprocessed},
+        {"Responses": {"table": stored[1:2]}},
+    ]
+    assert cache.get_many(["key0", "key1", "key1", "nope"]) == {
+        "key0": ("OK", "text/plain", "0"),
+        "key1": ("OK", "text/plain", "1"),
+    }
+    request = client.batch_get_item.call_args_list[0][1]["RequestItems"]
+    assert len(request["table"]["Keys"]) == 3
+    assert client.batch_get_item.call_args_list[1][1]["RequestItems"] == unprocessed
+    sleep.assert_called()
+
+
+@patch("lambda_proxy_cache.backends.aws.boto3_session")
+def test_S3Cache_shards(session):
+    """Should spread keys over hash-derived prefixes."""
+    client = session.return_value.client.return_value
+    cache = S3Cache("bucket", prefix="cache", shards=256)
+    keys = set()
+    for i in range(100):
+        cache.set(f"key{i}", ("OK", "text/plain", "heyyyy"), ttl=10)
+        keys.add(client.put_object.call_args[1]["Key"])
+
+    prefixes = {key.split("/")[1] for key in keys}
+    assert all(len(prefix) == 2 for prefix in prefixes)
+    assert len(prefixes) > 50
+    # stable
+    assert cache._key("key0") == S3Cache("bucket", prefix="cache", shards=256)._key(
+        "key0"
+    )
+
+    body = client.put_object.call_args[1]["Body"]
+    metadata = {"expires": str(int(time.time()) - 1)}
+    client.get_object.return_value = {"Body": io.BytesIO(body), "Metadata": metadata}
+    assert not cache.get("key99")
+    assert client.get_object.call_args[1]["Key"] == cache._key("key99")
+    client.head_object.assert_not_called()
+
+    assert S3Cache("bucket", shards=16)._key("key0").count("/") == 1
+    assert S3Cache("bucket")._key("key0") == "key0"
+
+
+@patch("lambda_proxy_cache.backends.aws.boto3_session")
+def test_S3Cache_many(session):
+    """Should read and write items in parallel."""
+    client = session.return_value.client.return_value
+    cache = S3Cache("bucket", max_workers=4)
+    assert (
+        cache.set_many({f"key{i}": ("OK", "text/plain", "a") for i in range(8)}) == []
+    )
+    assert client.put_object.call_count == 8
+    body = client.put_object.call_args[1]["Body"]
+
+    def get_object(Bucket, Key):
+        if Key == "nope":
+            raise Exception("NoSuchKey")
+        return {"Body": io.BytesIO(body), "Metadata": {}}
+
+    client.get_object.side_effect = get_object
+    assert cache.get_many(["key0", "key1", "nope"]) == {
+        "key0": ("OK", "text/plain", "a"),
+        "key1": ("OK", "text/plain", "a"),
+    }
+    assert cache.executor is cache.executor
+
+    # errors are raised from the thread pool in a raising context
+    error = Exception("SlowDown")
+    error.response = {"Error": {"Code": "SlowDown"}}
+    client.get_object.side_effect = error
+    assert cache.get_many(["key0"]) == {}
+    with pytest.raises(Exception):
+        with raising_errors():
+            cache.get_many(["key0"])
+
+    # missing objects are misses
+    error.response = {"Error": {"Code": "NoSuchKey"}}
+    with raising_errors():
+        assert cache.get_many(["key0"]) == {}
+
+
+@patch("lambda_proxy_cache.backends.aws.boto3_session")
+def test_aws_clients(session):
+    """Should share tuned clients between backends with the same configuration."""
+    s3 = S3Cache("bucket")
+    assert S3Cache("another-bucket").client is s3.client
+    assert session.call_count == 1
+    config = session.return_value.client.call_args[1]["config"]
+    assert config.tcp_keepalive
+    assert config.retries["mode"] == "adaptive"
+
+    S3Cache("bucket", region_name="eu-west-1")
+    assert session.call_count == 2
+    assert session.call_args[1] == {"region_name": "eu-west-1"}
+
+    DynamoDBCache("table", config=Config(read_timeout=10))
+    assert session.return_value.client.call_args[0] == ("dynamodb",)
+    config = session.return_value.client.call_args[1]["config"]
+    assert config.read_timeout == 10
+    assert config.tcp_keepalive
+
+
+@patch("lambda_proxy_cache.backends.aws.boto3_session")
+def test_aws_prewarm(session):
+    """Should open a connection on init and ignore errors."""
+    client = session.return_value.client.return_value
+    S3Cache("bucket", prewarm=True)
+    client.head_bucket.assert_called_once_with(Bucket="bucket")
+
+    client.describe_table.side_effect = Exception("AccessDenied")
+    cache = DynamoDBCache("table", prewarm=True)
+    client.describe_table.assert_called_once_with(TableName="table")
+    assert not cache.prewarm()
+
+
+def test_base_many():
+    """Should get and set items one by one by default."""
+
+    class Cache(LambdaProxyCacheBase):
+        def __init__(self):
+            self.items = {}
+
+        def set(self, key, value, ttl=None):
+            if key == "nope":
+                return False
+            self.items[key] = value
+            return True
+
+        def get(self, key):
+            return self.items.get(key)
+
+    cache = Cache()
+    assert cache.set_many({"a": "a", "nope": "b"}) == ["nope"]
+    assert cache.get_many(["a", "nope"]) == {"a": "a"}
+
+
+class FakeDynamoDB(object):
+    """In-memory DynamoDB client."""
+
+    def __init__(self):
+        """Initialize table."""
+        self.items = {}
+
+    def put_item(self, TableName, Item, **kwargs):
+        """Put item."""
+        self.items[Item["key"]["S"]] = Item
+
+    def get_item(self, TableName, Key):
+        """Get item."""
+        return {"Item": self.items[Key["key"]["S"]]}
+
+    def batch_write_item(self, RequestItems):
+        """Put items."""
+        for table, requests in RequestItems.items():
+            for request in requests:
+                self.put_item(table, request["PutRequest"]["Item"])
+        return {}
+
+    def batch_get_item(self, RequestItems):
+        """Get items."""
+        responses = {}
+        for table, request in RequestItems.items():
+            keys = [k["key"]["S"] for k in request["Keys"]]
+            responses[table] = [self.items[k] for k in keys if k in self.items]
+        return {"Responses": responses}
+
+
+@patch("lambda_proxy_cache.backends.aws.boto3_session")
+def test_DynamoDBCache_large(session):
+    """Should store large values in chunk items or in the overflow layer."""
+    client = session.return_value.client.return_value = FakeDynamoDB()
+    cache = DynamoDBCache("table", max_item_size=1000, max_chunks=4)
+
+    value = ("OK", "application/octet-stream", bytes(range(256)) * 12)
+    assert cache.set("key", value)
+    # 4 chunks + 1 item
+    assert len(client.items) == 5
+    assert client.items["key"]["chunks"] == {"N": "4"}
+    assert cache.get("key") == value
+    assert cache.get_many(["key"]) == {"key": value}
+    assert cache.stats["chunked"] == 1
+
+    # missing chunk
+    del client.items[sorted(client.items)[1]]
+    assert not cache.get("key")
+
+    assert not cache.set("big", ("OK", "text/plain", "a" * 5000))
+    assert cache.set_many({"big": ("OK", "text/plain", "a" * 5000), "a": "a"}) == [
+        "big"
+    ]
+    assert cache.stats["skipped"] == 2
+
+    overflow = MemoryCache()
+    cache = DynamoDBCache("table", max_item_size=1000, overflow=overflow)
+    assert cache.set("large", value, ttl=60)
+    assert client.items["large"]["ref"] == {"S": "large"}
+    assert overflow.get("large") == value
+    assert cache.get("large") == value
+    assert cache.stats["spilled"] == 1
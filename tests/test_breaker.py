@@ -0,0 +1,110 @@
+"""Test lambda-proxy-cache circuit breaker."""
+
+import time
+
+import pytest
+from mock import Mock
+
+from lambda_proxy_cache.backends.base import LambdaProxyCacheBase
+from lambda_proxy_cache.backends.breaker import CircuitBreakerCache
+from lambda_proxy_cache.backends.memcache import MemcachedCache
+from lambda_proxy_cache.backends.memory import MemoryCache
+from lambda_proxy_cache.backends.tiered import TieredCache
+
+
+def test_CircuitBreakerCache():
+    """Should open after failures, skip the backend and probe it."""
+    backend = Mock(LambdaProxyCacheBase)
+    backend.get.side_effect = Exception("Connection refused")
+    cache = CircuitBreakerCache(backend, failure_threshold=2, reset_timeout=0.2)
+
+    assert cache.get("key") is None
+    assert cache.state == "closed"
+    assert cache.get("key") is None
+    assert cache.state == "open"
+    assert cache.stats["opened"] == 1
+
+    # skipped while open
+    assert cache.get("key") is None
+    assert not cache.set("key", "value")
+    assert cache.set_many({"a": "a"}) == ["a"]
+    assert backend.get.call_count == 2
+    backend.set.assert_not_called()
+    assert cache.stats["skipped"] == 3
+
+    # failed probe
+    time.sleep(0.2)
+    assert cache.get("key") is None
+    assert cache.state == "open"
+    assert backend.get.call_count == 3
+
+    # successful probe
+    time.sleep(0.2)
+    backend.get.side_effect = None
+    backend.get.return_value = "value"
+    assert cache.get("key") == "value"
+    assert cache.state == "closed"
+    assert cache.stats["probes"] == 2
+
+
+def test_CircuitBreakerCache_slow():
+    """Should cap calls with a deadline and count slow calls as failures."""
+    backend = Mock(LambdaProxyCacheBase)
+    backend.get.side_effect = lambda key: time.sleep(0.3) or "value"
+    cache = CircuitBreakerCache(
+        backend, failure_threshold=2, slow_call=0.05, call_timeout=0.1
+    )
+
+    start = time.time()
+    assert cache.get("key") is None
+    assert time.time() - start < 0.25
+    assert cache.stats["timeouts"] == 1
+
+    backend.get.side_effect = lambda key: time.sleep(0.06) or "value"
+    assert cache.get("key") == "value"
+    assert cache.stats["slow_calls"] == 1
+    assert cache.state == "open"
+
+    # invocation deadline
+    cache = CircuitBreakerCache(backend, call_timeout=1.0, margin=0.1)
+    cache.set_deadline(time.time() + 0.15)
+    backend.set_deadline.assert_called()
+    assert cache._call_timeout() <= 0.05
+    cache.set_deadline(time.time())
+    assert cache.get("key") is None
+    assert cache.stats["skipped"] == 1
+    assert cache.state == "closed"
+
+    with pytest.raises(TypeError):
+        CircuitBreakerCache(Mock())
+
+
+def test_CircuitBreakerCache_backend():
+    """Should count the wrapped cache layer errors as failures."""
+    # nothing listens on port 1: calls fail fast and silently
+    backend = MemcachedCache(servers=["127.0.0.1:1"])
+    cache = CircuitBreakerCache(backend, failure_threshold=3, reset_timeout=60)
+
+    assert cache.get("key") is None
+    assert not cache.set("key", "value")
+    assert cache.state == "closed"
+    assert cache.get_many(["a", "b"]) == {}
+    assert cache.state == "open"
+    assert cache.stats["errors"] == 3
+    assert not cache.stats["timeouts"]
+
+    # the backend still fails silently when used directly
+    assert not backend.raise_errors
+    assert not backend.get("key")
+    assert not backend.set("key", "value")
+
+    # nested cache layers
+    for layer in [
+        TieredCache([MemoryCache(), MemcachedCache(servers=["127.0.0.1:1"])]),
+        MemoryCache(backend=MemcachedCache(servers=["127.0.0.1:1"])),
+    ]:
+        cache = CircuitBreakerCache(layer, failure_threshold=3, reset_timeout=60)
+        for _ in range(3):
+            assert cache.get("key") is None
+        assert cache.state == "open"
+        assert cache.stats["errors"] == 3
@@ -0,0 +1,66 @@
+"""Test lambda-proxy-cache codecs."""
+
+import json
+
+import pytest
+
+from lambda_proxy_cache.codecs import BinaryCodec, JSONCodec
+
+
+def test_BinaryCodec():
+    """Should encode and decode values."""
+    codec = BinaryCodec()
+    body = bytes(range(256)) * 10
+    data = codec.dumps(("OK", "image/png", body))
+    # raw body, no base64/str conversion
+    assert len(data) < len(body) + 64
+    assert data.endswith(body)
+    assert codec.loads(data) == ("OK", "image/png", body)
+
+    value = codec.decode(memoryview(data), zero_copy=True)
+    assert isinstance(value[2], memoryview)
+    assert bytes(value[2]) == body
+
+    value = ("OK", "text/plain", "héhé", {"created": 1, "expires": 2})
+    assert codec.loads(codec.dumps(value)) == value
+
+    value = ("OK", "application/json", {"a": 1})
+    assert codec.loads(codec.dumps(value)) == value
+
+    assert codec.loads(codec.dumps("token")) == "token"
+    assert codec.loads(codec.dumps(["a", 1])) == ["a", 1]
+    assert codec.loads(codec.dumps(None)) is None
+
+    # body is not copied when encoding
+    buffers = codec.encode(("OK", "image/png", body))
+    assert buffers[-1] is body
+
+
+def test_BinaryCodec_peek():
+    """Should read the header only."""
+    codec = BinaryCodec()
+    data = codec.dumps(("OK", "image/png", b"\x89PNG", {"expires": 1}))
+    assert codec.peek(data) == {
+        "status": "OK",
+        "content_type": "image/png",
+        "meta": {"expires": 1},
+    }
+    with pytest.raises(ValueError):
+        codec.peek(codec.dumps("token"))
+
+
+def test_BinaryCodec_legacy():
+    """Should read JSON entries."""
+    codec = BinaryCodec()
+    data = json.dumps(["OK", "text/plain", "heyyyy"]).encode()
+    assert codec.loads(data) == ["OK", "text/plain", "heyyyy"]
+
+
+def test_JSONCodec():
+    """Should encode and decode values."""
+    codec = JSONCodec()
+    assert codec.loads(codec.dumps(("OK", "text/plain", "heyyyy"))) == [
+        "OK",
+        "text/plain",
+        "heyyyy",
+    ]
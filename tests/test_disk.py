@@ -0,0 +1,106 @@
+"""Test lambda-proxy-cache disk backend."""
+
+import time
+
+from mock import patch
+
+from lambda_proxy_cache.backends.disk import DiskCache
+
+
+def test_DiskCache(tmpdir):
+    """Should set and get items."""
+    cache = DiskCache(str(tmpdir))
+    assert not cache.get("key")
+
+    assert cache.set("key", ("OK", "image/png", b"\x89PNG"))
+    value = cache.get("key")
+    assert isinstance(value[2], memoryview)
+    assert value[0] == "OK"
+    assert value[1] == "image/png"
+    assert bytes(value[2]) == b"\x89PNG"
+
+    assert cache.set("key", ("OK", "text/plain", "héhé"))
+    assert cache.get("key") == ("OK", "text/plain", "héhé")
+    # the previously mapped entry is still valid
+    assert bytes(value[2]) == b"\x89PNG"
+
+    assert cache.set("other", ["value", 1])
+    assert cache.get("other") == ["value", 1]
+    assert len(cache) == 2
+    assert cache.stats["hits"] == 3
+
+    cache = DiskCache(str(tmpdir), zero_copy=False)
+    assert len(cache) == 2
+    cache.set("key", ("OK", "image/png", b"\x89PNG"))
+    assert cache.get("key") == ("OK", "image/png", b"\x89PNG")
+
+    cache.clear()
+    assert not len(cache)
+    assert not cache.get("key")
+    assert not len(DiskCache(str(tmpdir)))
+
+
+def test_DiskCache_maxSize(tmpdir):
+    """Should evict least recently used entries."""
+    cache = DiskCache(str(tmpdir), max_size=1000)
+    value = ("OK", "image/png", b"0" * 300)
+    cache.set("a", value)
+    cache.set("b", value)
+    assert cache.get("a")
+    cache.set("c", value)
+    assert cache.stats["evictions"] == 1
+    assert cache.get("a")
+    assert not cache.get("b")
+    assert cache.size <= 1000
+    assert len(tmpdir.listdir()) == 3  # a, c and index
+
+    assert not cache.set("d", ("OK", "image/png", b"0" * 2000))
+
+
+def test_DiskCache_ttl(tmpdir):
+    """Should not return expired entries."""
+    cache = DiskCache(str(tmpdir), time=10)
+    with patch("lambda_proxy_cache.backends.disk.time.time", return_value=0):
+        cache.set("key", ("OK", "text/plain", "heyyyy"))
+        cache.set("other", ("OK", "text/plain", "heyyyy"), ttl=20)
+    with patch("lambda_proxy_cache.backends.disk.time.time", return_value=11):
+        assert not cache.get("key")
+        assert cache.get("other")
+    assert cache.stats["expired"] == 1
+
+
+def test_DiskCache_journal(tmpdir):
+    """Should append index changes and compact the journal."""
+    cache = DiskCache(str(tmpdir))
+    value = ("OK", "text/plain", "heyyyy")
+    for i in range(3000):
+        cache.set(f"key{i % 100}", value)
+    cache.delete("key1")
+    cache.set("key2", value, ttl=10)
+    # the index is not rewritten on each write
+    assert cache.stats["compactions"] < 5
+    with open(tmpdir.join("index.log")) as f:
+        assert len(f.readlines()) <= 1024
+
+    # partially written record
+    with open(tmpdir.join("index.log"), "a") as f:
+        f.write('["set", "key1", 1')
+
+    reopened = DiskCache(str(tmpdir))
+    assert len(reopened) == 99
+    assert reopened.size == cache.size
+    assert not reopened.get("key1")
+    assert reopened.get("key2") == value
+    assert reopened._index["key2"] == cache._index["key2"]
+
+
+def test_DiskCache_writeTime(tmpdir):
+    """Should write entries in constant time."""
+    cache = DiskCache(str(tmpdir))
+    value = ("OK", "text/plain", "heyyyy")
+    start = time.time()
+    for i in range(5000):
+        cache.set(f"key{i}", value)
+    # a full index rewrite on each write takes minutes
+    assert time.time() - start < 10
+    assert len(DiskCache(str(tmpdir))) == 5000
@@ -0,0 +1,50 @@
+"""Test lambda-proxy-cache cache entries."""
+
+from mock import patch
+
+from lambda_proxy_cache.entry import is_response, pack, should_recompute, unpack
+
+
+def test_pack():
+    """Should add and read metadata."""
+    value = pack(("OK", "text/plain", "heyyyy"), created=0, expires=10)
+    assert value == ("OK", "text/plain", "heyyyy", {"created": 0, "expires": 10})
+    assert unpack(value) == (
+        ("OK", "text/plain", "heyyyy"),
+        {"created": 0, "expires": 10},
+    )
+    # JSON backends return lists
+    assert unpack(list(value))[1] == {"created": 0, "expires": 10}
+    assert unpack(["OK", "text/plain", "heyyyy"]) == (
+        ("OK", "text/plain", "heyyyy"),
+        {},
+    )
+
+
+def test_is_response():
+    """Should check endpoint responses."""
+    assert is_response(("OK", "text/plain", "heyyyy"))
+    assert is_response(["OK", "text/plain", "heyyyy", {"created": 0}])
+    assert is_response((200, "text/plain", b"heyyyy"))
+    assert not is_response(("OK", "text/plain", "heyyyy", "nope"))
+    assert not is_response((1, 2, 3, 4))
+    assert not is_response({"statusCode": 200})
+
+
+def test_should_recompute():
+    """Should recompute more often close to expiry."""
+    meta = {"created": 0, "expires": 100, "delta": 2}
+    assert not should_recompute({"expires": 100}, 1, 99)
+    assert not should_recompute(meta, 0, 99)
+
+    with patch("lambda_proxy_cache.entry.random.random", return_value=0.5):
+        # -2 * log(0.5) ~= 1.39
+        assert not should_recompute(meta, 1, 98)
+        assert should_recompute(meta, 1, 99)
+        # higher beta, earlier recomputation
+        assert should_recompute(meta, 2, 98)
+
+    hits = sum(should_recompute(meta, 1, 99.9) for _ in range(1000))
+    assert hits > 900
+    hits = sum(should_recompute(meta, 1, 90) for _ in range(1000))
+    assert hits < 100
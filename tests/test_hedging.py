@@ -0,0 +1,102 @@
+"""Test lambda-proxy-cache hedged reads."""
+
+import time
+import asyncio
+
+from lambda_proxy_cache.hedging import Hedge
+
+
+def test_Hedge_fast():
+    """Should not hedge reads faster than the delay."""
+    hedge = Hedge(delay=0.1)
+    assert hedge.run(lambda: "primary", lambda: "hedge") == "primary"
+    assert hedge.stats["reads"] == 1
+    assert not hedge.stats["fired"]
+
+
+def test_Hedge_slow():
+    """Should use the hedge result when it comes first."""
+    hedge = Hedge(delay=0.05)
+
+    def slow():
+        time.sleep(0.3)
+        return "primary"
+
+    start = time.time()
+    assert hedge.run(slow, lambda: "hedge") == "hedge"
+    assert time.time() - start < 0.2
+    assert hedge.stats["fired"] == 1
+    assert hedge.stats["won"] == 1
+
+    # the primary read comes first
+    def hedged():
+        time.sleep(0.5)
+        return "hedge"
+
+    def primary():
+        time.sleep(0.1)
+        return "primary"
+
+    assert hedge.run(primary, hedged) == "primary"
+    assert hedge.stats["fired"] == 2
+    assert hedge.stats["won"] == 1
+
+
+def test_Hedge_accept():
+    """Should wait for the hedge when the primary result is not accepted."""
+    hedge = Hedge(delay=0.01)
+
+    def miss():
+        time.sleep(0.05)
+        return None
+
+    def compute():
+        time.sleep(0.1)
+        return "computed"
+
+    assert hedge.run(miss, compute, accept=bool) == "computed"
+    assert hedge.stats["won"] == 1
+
+    def error():
+        raise Exception("nope")
+
+    assert hedge.run(miss, error, accept=bool) is None
+    assert hedge.stats["errors"] == 1
+
+
+def test_Hedge_adaptive():
+    """Should use the primary reads latency percentile as delay."""
+    hedge = Hedge(
+        percentile=90, window=10, min_samples=10, initial_delay=0.2, min_delay=0.01
+    )
+    assert hedge.delay == 0.2
+
+    for duration in range(1, 11):
+        hedge.record(duration / 100)
+    assert hedge.delay == 0.09
+
+    # only the recent latencies are kept
+    for _ in range(20):
+        hedge.record(0)
+    assert hedge.delay == 0.01
+
+
+def test_Hedge_async():
+    """Should hedge async reads."""
+    hedge = Hedge(delay=0.05)
+
+    async def slow():
+        await asyncio.sleep(0.3)
+        return "primary"
+
+    async def fast():
+        return "hedge"
+
+    async def run():
+        assert await hedge.arun(fast, slow) == "hedge"
+        assert not hedge.stats["fired"]
+        assert await hedge.arun(slow, fast) == "hedge"
+        assert hedge.stats["fired"] == 1
+        assert hedge.stats["won"] == 1
+
+    asyncio.new_event_loop().run_until_complete(run())
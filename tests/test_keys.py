@@ -0,0 +1,149 @@
+"""Test lambda-proxy-cache key builder."""
+
+from typing import Optional
+
+import pytest
+
+from lambda_proxy_cache.keys import Canonicalizer, KeyBuilder, KeySpec
+
+
+def test_KeyBuilder_stable():
+    """Keys should not depend on argument order or on the process."""
+    builder = KeyBuilder("/tiles/<int:z>-app-0.0.1")
+    key = builder.build({"z": 1, "scale": "2", "ext": "png"})
+    assert key == builder.build({"ext": "png", "scale": "2", "z": 1})
+    assert key == KeyBuilder("/tiles/<int:z>-app-0.0.1").build(
+        {"scale": "2", "ext": "png", "z": 1}
+    )
+    # fixed value: keys must stay stable across runs and python versions
+    assert key == "ONz01EsEtsOWtt4KbCfvig"
+
+
+def test_KeyBuilder_distinct():
+    """Different routes, names, values or types should give different keys."""
+    builder = KeyBuilder("/tiles/<int:z>-app-0.0.1")
+    key = builder.build({"z": 1})
+    assert key != builder.build({"z": "1"})
+    assert key != builder.build({"z": 2})
+    assert key != builder.build({"y": 1})
+    assert key != KeyBuilder("/other/<int:z>-app-0.0.1").build({"z": 1})
+    assert builder.build({"a": "bc"}) != builder.build({"ab": "c"})
+
+
+def test_KeyBuilder_options():
+    """Should support other digests and encodings."""
+    import hashlib
+
+    assert len(KeyBuilder("route", encoding="hex").build({})) == 32
+    assert len(KeyBuilder("route", encoding="binary").build({})) == 16
+    assert len(KeyBuilder("route", digest="sha224", encoding="hex").build({})) == 56
+    key = KeyBuilder("route", digest=hashlib.md5, encoding="binary").build({"a": 1})
+    assert len(key) == 16
+
+    with pytest.raises(ValueError):
+        KeyBuilder("route", encoding="base32")
+
+
+def test_KeySpec():
+    """Should normalize arguments."""
+    spec = KeySpec(
+        exclude=["_", "ts"],
+        lowercase=["format"],
+        sort=["bands"],
+        precision={"lon": 2},
+        grid={"bbox": 0.5},
+    )
+    kwargs = {
+        "z": 1,
+        "_": "123456",
+        "format": "PNG",
+        "bands": "3,1,2",
+        "lon": "10.12345",
+        "bbox": "0.1,0.3,10.26,20.7",
+        "other": "Yo",
+    }
+    assert spec.apply(kwargs) == {
+        "z": 1,
+        "format": "png",
+        "bands": "1,2,3",
+        "lon": "10.12",
+        "bbox": "0.0,0.5,10.5,20.5",
+        "other": "Yo",
+    }
+    # non numeric values are left as is
+    assert spec.apply({"lon": "nope"}) == {"lon": "nope"}
+
+    spec = KeySpec(include=["format"], lowercase=True)
+    assert spec.apply({"z": 1, "format": "PNG", "ts": "1"}) == {"format": "png"}
+    assert spec.apply({"z": 1, "format": "PNG"}, keep=["z"]) == {
+        "z": 1,
+        "format": "png",
+    }
+
+
+def test_KeyBuilder_spec():
+    """Equivalent requests should share keys."""
+    spec = KeySpec(include=["lon"], precision={"lon": 1})
+    builder = KeyBuilder("/tiles/<int:z>-app-0.0.1", spec=spec, path_args=["z"])
+    key = builder.build({"z": 1, "lon": "10.01", "_": "1"})
+    assert key == builder.build({"z": 1, "lon": "10.04", "_": "2"})
+    assert not key == builder.build({"z": 2, "lon": "10.04", "_": "2"})
+
+
+def test_Canonicalizer():
+    """Should fill defaults and convert values to annotated types."""
+
+    def endpoint(
+        z: int, x: int, y: int, scale: int = 1, ext: str = None, hd: bool = False, **kw
+    ):
+        pass
+
+    canon = Canonicalizer(endpoint)
+    assert canon.apply({"z": 1, "x": 2, "y": 3}) == {
+        "z": 1,
+        "x": 2,
+        "y": 3,
+        "scale": 1,
+        "ext": None,
+        "hd": False,
+    }
+    assert canon.apply({"z": 1, "x": 2, "y": 3, "scale": "1", "hd": "false"}) == {
+        "z": 1,
+        "x": 2,
+        "y": 3,
+        "scale": 1,
+        "ext": None,
+        "hd": False,
+    }
+    # invalid values are left as is
+    assert canon.apply({"z": "a", "x": 2, "y": 3, "other": "1"})["z"] == "a"
+    assert canon.apply({"z": "a", "x": 2, "y": 3, "other": "1"})["other"] == "1"
+
+    def endpoint(scale: Optional[float] = None):
+        pass
+
+    assert Canonicalizer(endpoint).apply({"scale": "2"}) == {"scale": 2.0}
+
+    # defaults are converted once, values of other types are left as is
+    def endpoint(scale: float = 1, x: int = 0):
+        pass
+
+    canon = Canonicalizer(endpoint)
+    assert canon.defaults == {"scale": 1.0, "x": 0}
+    assert canon.apply({"scale": "1"}) == canon.apply({})
+    assert canon.apply({"x": 1.5}) == {"scale": 1.0, "x": 1.5}
+
+    # not inspectable
+    assert Canonicalizer(dict).apply({"a": "1"}) == {"a": "1"}
+
+
+def test_KeyBuilder_endpoint():
+    """Default-valued requests should share keys."""
+
+    def endpoint(z: int, scale: int = 1):
+        pass
+
+    builder = KeyBuilder("/tiles/<int:z>-app-0.0.1", endpoint=endpoint)
+    key = builder.build({"z": 1})
+    assert key == builder.build({"z": 1, "scale": "1"})
+    assert not key == builder.build({"z": 1, "scale": "2"})
@@ -0,0 +1,124 @@
+"""Test lambda-proxy-cache memcached backend."""
+
+from mock import Mock, patch
+
+from lambda_proxy_cache.backends.memcache import HashRing, MemcachedCache
+
+
+class FakeMemcached(object):
+    """In-process memcached client stand-in."""
+
+    def __init__(self, servers, **kwargs):
+        """Initialize server."""
+        self.data = {}
+        self.servers = [Mock(connection=Mock())]
+        self.down = False
+
+    def _check(self):
+        if self.down:
+            raise OSError("Connection refused")
+
+    def set(self, key, value, time=0):
+        """SET."""
+        self._check()
+        self.data[key] = value
+        return True
+
+    def add(self, key, value, time=0):
+        """ADD."""
+        self._check()
+        if key in self.data:
+            return False
+        return self.set(key, value, time=time)
+
+    def get(self, key):
+        """GET."""
+        self._check()
+        return self.data.get(key)
+
+    def delete(self, key):
+        """DELETE."""
+        self._check()
+        return self.data.pop(key, None) is not None
+
+    def get_multi(self, keys):
+        """Multi-get."""
+        self._check()
+        return {key: self.data[key] for key in keys if key in self.data}
+
+    def set_multi(self, mappings, time=0):
+        """Multi-set."""
+        self._check()
+        self.data.update(mappings)
+        return []
+
+
+def test_HashRing():
+    """Should spread keys and only move a few of them when adding a server."""
+    servers = ["10.0.0.1:11211", "10.0.0.2:11211", "10.0.0.3:11211"]
+    ring = HashRing(servers)
+    keys = [f"key{i}" for i in range(3000)]
+    nodes = {key: next(ring.iter_nodes(key)) for key in keys}
+    counts = [list(nodes.values()).count(server) for server in servers]
+    assert min(counts) > 600
+
+    ring = HashRing(servers + ["10.0.0.4:11211"])
+    moved = [key for key in keys if next(ring.iter_nodes(key)) != nodes[key]]
+    assert len(moved) < 0.35 * len(keys)
+    assert all(next(ring.iter_nodes(key)) == "10.0.0.4:11211" for key in moved)
+
+    assert len(list(ring.iter_nodes("key"))) == 4
+    assert list(HashRing([]).iter_nodes("key")) == []
+
+
+@patch("lambda_proxy_cache.backends.memcache.bmemcached.Client", FakeMemcached)
+def test_MemcachedCache_servers():
+    """Should spread keys over the servers and skip dead servers."""
+    servers = ["10.0.0.1:11211", "10.0.0.2:11211", "10.0.0.3:11211"]
+    cache = MemcachedCache(servers=servers, dead_retry=30)
+    items = {f"key{i}": ("OK", "text/plain", str(i)) for i in range(30)}
+    assert cache.set_many(items) == []
+    assert all(client.data for client in cache.clients.values())
+    assert cache.get_many(list(items)) == items
+
+    server = next(cache.ring.iter_nodes("key0"))
+    cache.clients[server].down = True
+    assert not cache.get("key0")
+    assert cache.stats["server_failures"] == 1
+
+    # key0 goes to the next server while the server is dead
+    assert cache.set("key0", items["key0"])
+    assert cache.get("key0") == items["key0"]
+    other = cache._server("key0")
+    assert other != server
+
+    # disconnected client
+    cache.clients[other].servers[0].connection = None
+    cache.get("key0")
+    assert cache.stats["server_failures"] == 2
+
+    cache._dead.clear()
+    cache.clients[server].down = False
+    assert cache.get("key0") == items["key0"]
+
+
+@patch("lambda_proxy_cache.backends.memcache.bmemcached.Client", FakeMemcached)
+def test_MemcachedCache_chunks():
+    """Should split large values in chunks."""
+    cache = MemcachedCache(servers=["a:11211", "b:11211"], max_item_size=100)
+    value = ("OK", "application/octet-stream", bytes(range(256)))
+    assert cache.set("key", value)
+    assert cache.stats["chunked"] == 1
+
+    client = cache.clients[cache._server("key")]
+    assert client.data["key"].startswith(b"LPC-chunks:")
+    assert len(client.data) == 5
+    assert cache.get("key") == value
+    assert cache.get_many(["key", "nope"]) == {"key": value}
+
+    assert cache.add("lease", "uuid")
+    assert not cache.add("lease", "uuid")
+
+    chunk = [key for key in client.data if key.startswith("key:")][0]
+    del client.data[chunk]
+    assert not cache.get("key")
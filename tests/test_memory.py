@@ -0,0 +1,157 @@
+"""Test lambda-proxy-cache memory backend."""
+
+import time
+import asyncio
+
+import pytest
+from mock import Mock, patch
+
+from lambda_proxy_cache.backends.base import LambdaProxyCacheBase
+from lambda_proxy_cache.backends.memory import MemoryCache
+from lambda_proxy_cache.entry import EXPIRY
+
+
+def test_MemoryCache():
+    """Should set and get items."""
+    cache = MemoryCache(max_size=10000)
+    # empty cache layers are still truthy
+    assert cache
+    assert not cache.get("key")
+    assert cache.set("key", ("OK", "text/plain", "heyyyy"))
+    assert cache.get("key") == ("OK", "text/plain", "heyyyy")
+    assert len(cache) == 1
+    assert cache.stats["hits"] == 1
+    assert cache.stats["misses"] == 1
+    assert cache.info()["entries"] == 1
+
+    cache.clear()
+    assert not len(cache)
+    assert not cache.size
+
+
+def test_MemoryCache_maxSize():
+    """Should evict least recently used entries."""
+    cache = MemoryCache(max_size=1500)
+    value = ("OK", "image/png", b"0" * 300)
+    cache.set("a", value)
+    cache.set("b", value)
+    assert cache.get("a")
+    cache.set("c", value)
+    assert cache.stats["evictions"] == 1
+    assert cache.get("a")
+    assert not cache.get("b")
+    assert cache.size <= 1500
+
+    # too big
+    assert not cache.set("d", ("OK", "image/png", b"0" * 2000))
+    assert not cache.get("d")
+
+
+def test_MemoryCache_memoryFraction(monkeypatch):
+    """Should use a fraction of the Lambda memory."""
+    monkeypatch.setenv("AWS_LAMBDA_FUNCTION_MEMORY_SIZE", "1024")
+    cache = MemoryCache(memory_fraction=0.5)
+    assert cache.max_size == 512 * 1024 * 1024
+
+
+def test_MemoryCache_ttl():
+    """Should not return expired entries."""
+    cache = MemoryCache(time=10)
+    with patch("lambda_proxy_cache.backends.memory.time.time", return_value=0):
+        cache.set("key", ("OK", "text/plain", "heyyyy"))
+    with patch("lambda_proxy_cache.backends.memory.time.time", return_value=5):
+        assert cache.get("key")
+    with patch("lambda_proxy_cache.backends.memory.time.time", return_value=11):
+        assert not cache.get("key")
+    assert cache.stats["expired"] == 1
+    assert not len(cache)
+
+    # expired right away, instead of stored with the default time to live
+    assert not cache.set("key", ("OK", "text/plain", "heyyyy"), ttl=0)
+    assert not cache.get("key")
+
+
+def test_MemoryCache_backend():
+    """Should wrap another backend."""
+    backend = Mock(LambdaProxyCacheBase)
+    backend.get.return_value = ("OK", "text/plain", "heyyyy")
+    backend.set.return_value = True
+
+    cache = MemoryCache(backend)
+    assert cache.get("key") == ("OK", "text/plain", "heyyyy")
+    assert cache.get("key") == ("OK", "text/plain", "heyyyy")
+    backend.get.assert_called_once()
+    assert cache.stats["backend_hits"] == 1
+
+    assert cache.set("other", ("OK", "text/plain", "yo"))
+    backend.set.assert_called_once()
+    assert cache.get("other")
+
+    with pytest.raises(TypeError):
+        MemoryCache(Mock())
+
+
+def test_MemoryCache_many():
+    """Should read missing items from the wrapped backend in one batch."""
+    backend = Mock(LambdaProxyCacheBase)
+    backend.get_many.return_value = {"b": ("OK", "text/plain", "b")}
+    backend.set_many.return_value = []
+
+    cache = MemoryCache(backend)
+    assert cache.set_many({"a": ("OK", "text/plain", "a")}, ttl=10) == []
+    items = backend.set_many.call_args[0][0]
+    assert items["a"][:3] == ("OK", "text/plain", "a")
+    assert backend.set_many.call_args[1] == {"ttl": 10}
+
+    assert cache.get_many(["a", "b", "c"]) == {
+        "a": ("OK", "text/plain", "a"),
+        "b": ("OK", "text/plain", "b"),
+    }
+    backend.get_many.assert_called_once_with(["b", "c"])
+    assert cache.get("b")
+    assert cache.stats["backend_hits"] == 1
+
+
+def test_MemoryCache_backendTTL():
+    """Should not keep backend entries in memory longer than their time to live."""
+    backend = MemoryCache()
+    writer = MemoryCache(backend)
+    reader = MemoryCache(backend, time=300)
+
+    # e.g. a negative cache entry written by another container
+    assert writer.set("key", ("NOK", "text/plain", "nope"), ttl=1)
+    assert writer.set("page", {"statusCode": 404}, ttl=2)
+    assert reader.get("key") == ("NOK", "text/plain", "nope")
+    assert reader._entries["key"][1] == pytest.approx(time.time() + 1, abs=0.5)
+    assert reader.get_many(["page"]) == {"page": {"statusCode": 404}}
+    assert reader._entries["page"][1] == pytest.approx(time.time() + 2, abs=0.5)
+
+    # expired entries (e.g. not yet evicted by the backend) are misses
+    reader.clear()
+    assert writer.set("old", ("OK", "text/plain", "old"), ttl=60)
+    value = backend._get("old")
+    backend._store("old", value[:3] + ({EXPIRY: time.time() - 1},))
+    assert reader.get("old") is None
+    assert reader.get_many(["old"]) == {}
+
+    # entries without time to live are kept with the memory settings
+    assert writer.set("forever", ("OK", "text/plain", "heyyyy"))
+    assert reader.get("forever") == ("OK", "text/plain", "heyyyy")
+    assert reader._entries["forever"][1] == pytest.approx(time.time() + 300, abs=5)
+
+
+def test_MemoryCache_async():
+    """Should implement the async cache layer methods."""
+    cache = MemoryCache()
+
+    async def run():
+        assert await cache.aset("a", 1)
+        assert await cache.aadd("b", 2)
+        assert not await cache.aadd("b", 3)
+        assert await cache.aget("a") == 1
+        assert await cache.aset_many({"c": 3}) == []
+        assert await cache.aget_many(["a", "b", "c", "d"]) == {"a": 1, "b": 2, "c": 3}
+        assert await cache.adelete("a")
+        assert await cache.aget("a") is None
+
+    asyncio.new_event_loop().run_until_complete(run())
@@ -3,15 +3,22 @@
 from typing import Dict, Tuple
 
 import os
+import time
 import json
 import zlib
 import base64
+import threading
 
 import pytest
-from mock import Mock
+from mock import Mock, patch
 
 from lambda_proxy_cache import proxy
 from lambda_proxy_cache.backends.base import LambdaProxyCacheBase
+from lambda_proxy_cache.backends.breaker import CircuitBreakerCache
+from lambda_proxy_cache.backends.disk import DiskCache
+from lambda_proxy_cache.backends.memory import MemoryCache
+from lambda_proxy_cache.hedging import Hedge
+from lambda_proxy_cache.singleflight import SingleFlight
 
 json_api = os.path.join(os.path.dirname(__file__), "fixtures", "openapi.json")
 with open(json_api, "r") as f:
@@ -25,6 +32,14 @@ with open(json_apigw, "r") as f:
 funct = Mock(__name__="Mock")
 
 
+def _wait_for(condition, timeout: float = 2.0) -> None:
+    """Wait for background work."""
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+
 def test_RouteEntry_default():
     """Should work as expected."""
     route = proxy.RouteEntry(funct, "/endpoint/test/<id>")
@@ -1355,3 +1370,748 @@ def test_proxy_API_RouteNoCache():
 
     for h in app.log.handlers:
         app.log.removeHandler(h)
+
+
+def test_proxy_API_cacheKey():
+    """Test cache key creation."""
+    cache = Mock(LambdaProxyCacheBase)
+    cache.get.return_value = None
+
+    app = proxy.API(name="test", cache_layer=cache, cache_key_encoding="hex")
+    funct = Mock(__name__="Mock", return_value=("OK", "text/plain", "heyyyy"))
+    app._add_route("/test/<string:user>/<name>", funct, methods=["GET"], cors=True)
+
+    event = {
+        "path": "/test/remote/pixel",
+        "httpMethod": "GET",
+        "headers": {},
+        "queryStringParameters": {"a": "1", "b": "2"},
+    }
+    app(event, {})
+    key = cache.get.call_args[0][0]
+    assert len(key) == 32
+    assert cache.set.call_args[0][0] == key
+
+    event["queryStringParameters"] = {"b": "2", "a": "1"}
+    app(event, {})
+    assert cache.get.call_args[0][0] == key
+
+    event["queryStringParameters"] = {"b": "2", "a": "2"}
+    app(event, {})
+    assert not cache.get.call_args[0][0] == key
+
+    for h in app.log.handlers:
+        app.log.removeHandler(h)
+
+    # cache layers only accept text keys
+    with pytest.raises(ValueError):
+        proxy.API(name="test", cache_key_encoding="binary")
+
+
+def test_proxy_API_cacheKeyDisk(tmpdir):
+    """Test cache keys with a disk cache layer."""
+    cache = DiskCache(directory=str(tmpdir))
+    app = proxy.API(name="test", cache_layer=cache, cache_key_encoding="hex")
+    funct = Mock(__name__="Mock", return_value=("OK", "text/plain", "heyyyy"))
+    app._add_route("/test/<int:id>", funct, methods=["GET"], cache_rendered=True)
+
+    event = {
+        "path": "/test/1",
+        "httpMethod": "GET",
+        "headers": {},
+        "queryStringParameters": {},
+    }
+    assert app(event, {})["body"] == "heyyyy"
+    assert app(event, {})["body"] == "heyyyy"
+    funct.assert_called_once()
+    # endpoint and rendered responses
+    assert len(cache) == 2
+
+    for h in app.log.handlers:
+        app.log.removeHandler(h)
+
+
+def test_proxy_API_cacheKeySpec():
+    """Test cache key specification."""
+    cache = Mock(LambdaProxyCacheBase)
+    cache.get.return_value = None
+
+    app = proxy.API(name="test", cache_layer=cache)
+    funct = Mock(__name__="Mock", return_value=("OK", "text/plain", "heyyyy"))
+    app._add_route(
+        "/test/<string:user>/<name>",
+        funct,
+        methods=["GET"],
+        cache_key_spec={"exclude": ["ts"], "precision": {"lon": 2}},
+    )
+
+    event = {
+        "path": "/test/remote/pixel",
+        "httpMethod": "GET",
+        "headers": {},
+        "queryStringParameters": {"lon": "10.001", "ts": "1"},
+    }
+    app(event, {})
+    key = cache.get.call_args[0][0]
+    funct.assert_called_with(user="remote", name="pixel", lon="10.001", ts="1")
+
+    event["queryStringParameters"] = {"lon": "10.002", "ts": "2"}
+    app(event, {})
+    assert cache.get.call_args[0][0] == key
+    funct.assert_called_with(user="remote", name="pixel", lon="10.002", ts="2")
+
+    event["path"] = "/test/remote/pixe"
+    app(event, {})
+    assert not cache.get.call_args[0][0] == key
+
+    with pytest.raises(TypeError):
+        app._add_route("/yo", funct, cache_key_spec={"nope": True})
+
+    for h in app.log.handlers:
+        app.log.removeHandler(h)
+
+
+def test_proxy_API_negativeCache():
+    """Test negative caching."""
+    cache = Mock(LambdaProxyCacheBase)
+    cache.get.return_value = None
+
+    app = proxy.API(name="test", cache_layer=cache)
+    funct = Mock(__name__="Mock", return_value=("EMPTY", "text/plain", ""))
+    app._add_route(
+        "/test/<int:id>",
+        funct,
+        methods=["GET"],
+        negative_cache={"EMPTY": 60, FileNotFoundError: 300},
+    )
+
+    event = {
+        "path": "/test/1",
+        "httpMethod": "GET",
+        "headers": {},
+        "queryStringParameters": {},
+    }
+    res = app(event, {})
+    assert res["statusCode"] == 204
+    cache.set.assert_called_once()
+    assert cache.set.call_args[0][1] == ("EMPTY", "text/plain", "")
+    assert cache.set.call_args[1]["ttl"] == 60
+
+    cache.reset_mock()
+    funct.side_effect = FileNotFoundError("missing file")
+    res = app(event, {})
+    assert res["statusCode"] == 500
+    assert cache.set.call_args[0][1][0] == "ERROR"
+    assert cache.set.call_args[1]["ttl"] == 300
+
+    # Other errors are not cached
+    cache.reset_mock()
+    funct.side_effect = ValueError("nope")
+    res = app(event, {})
+    assert res["statusCode"] == 500
+    cache.set.assert_not_called()
+
+    # Cached negative response are returned without running the endpoint
+    cache.reset_mock()
+    funct.reset_mock()
+    cache.get.return_value = ("EMPTY", "text/plain", "")
+    res = app(event, {})
+    assert res["statusCode"] == 204
+    funct.assert_not_called()
+
+    for h in app.log.handlers:
+        app.log.removeHandler(h)
+
+
+def test_proxy_API_singleFlight():
+    """Test proxy with request coalescing."""
+    cache = Mock(LambdaProxyCacheBase)
+    cache.get.return_value = None
+    cache.add.return_value = True
+
+    app = proxy.API(name="test", cache_layer=cache, single_flight=True)
+    funct = Mock(__name__="Mock", return_value=("OK", "text/plain", "heyyyy"))
+    app._add_route("/test/<string:user>/<name>", funct, methods=["GET"])
+
+    event = {
+        "path": "/test/remote/pixel",
+        "httpMethod": "GET",
+        "headers": {},
+        "queryStringParameters": {},
+    }
+    res = app(event, {})
+    assert res["body"] == "heyyyy"
+    key = cache.get.call_args[0][0]
+    cache.add.assert_called_once()
+    assert cache.add.call_args[0][0] == f"{key}.lease"
+    cache.set.assert_called_once()
+    cache.delete.assert_called_once_with(f"{key}.lease")
+
+    for h in app.log.handlers:
+        app.log.removeHandler(h)
+
+
+def test_proxy_API_staleWhileRevalidate():
+    """Test stale-while-revalidate and stale-if-error."""
+    cache = Mock(LambdaProxyCacheBase)
+    cache.get.return_value = None
+
+    app = proxy.API(name="test", cache_layer=cache)
+    funct = Mock(__name__="Mock", return_value=("OK", "text/plain", "heyyyy"))
+    app._add_route(
+        "/test/<int:id>",
+        funct,
+        methods=["GET"],
+        cache_ttl=60,
+        stale_while_revalidate=30,
+        stale_if_error=600,
+    )
+
+    event = {
+        "path": "/test/1",
+        "httpMethod": "GET",
+        "headers": {},
+        "queryStringParameters": {},
+    }
+    res = app(event, {})
+    assert res["body"] == "heyyyy"
+    value = cache.set.call_args[0][1]
+    assert value[:3] == ("OK", "text/plain", "heyyyy")
+    assert value[3]["expires"] - value[3]["created"] == 60
+    assert cache.set.call_args[1]["ttl"] == 660
+
+    # Fresh
+    funct.reset_mock()
+    cache.get.return_value = value
+    res = app(event, {})
+    assert res["body"] == "heyyyy"
+    funct.assert_not_called()
+
+    # Stale: returned right away and refreshed in background
+    cache.reset_mock()
+    funct.return_value = ("OK", "text/plain", "yoooo")
+    stale = ("OK", "text/plain", "heyyyy", {"created": 0, "expires": time.time() - 10})
+    cache.get.return_value = stale
+    res = app(event, {})
+    assert res["body"] == "heyyyy"
+    for thread in threading.enumerate():
+        if thread is not threading.current_thread():
+            thread.join(1)
+    funct.assert_called_once()
+    assert cache.set.call_args[0][1][:3] == ("OK", "text/plain", "yoooo")
+    assert app.stats["stale_hits"] == 1
+    assert app.stats["revalidations"] == 1
+
+    # Not enough time left to refresh
+    funct.reset_mock()
+    res = app(event, Mock(get_remaining_time_in_millis=Mock(return_value=100)))
+    assert res["body"] == "heyyyy"
+    funct.assert_not_called()
+    assert app.stats["revalidations_skipped"] == 1
+
+    # Too old for stale-while-revalidate, the endpoint fails: stale-if-error
+    funct.side_effect = ValueError("nope")
+    stale = ("OK", "text/plain", "heyyyy", {"created": 0, "expires": time.time() - 60})
+    cache.get.return_value = stale
+    res = app(event, {})
+    assert res["body"] == "heyyyy"
+    funct.assert_called_once()
+    assert app.stats["stale_if_error"] == 1
+
+    # Too old for stale-if-error
+    stale = ("OK", "text/plain", "heyyyy", {"created": 0, "expires": time.time() - 700})
+    cache.get.return_value = stale
+    res = app(event, {})
+    assert res["statusCode"] == 500
+
+    with pytest.raises(ValueError):
+        app._add_route("/yo", funct, stale_if_error=60)
+
+    for h in app.log.handlers:
+        app.log.removeHandler(h)
+
+
+def test_proxy_API_earlyRecompute():
+    """Test probabilistic early recomputation."""
+    cache = Mock(LambdaProxyCacheBase, timeout=3600)
+    cache.get.return_value = None
+
+    app = proxy.API(name="test", cache_layer=cache)
+    funct = Mock(__name__="Mock", return_value=("OK", "text/plain", "heyyyy"))
+    app._add_route("/test/<int:id>", funct, methods=["GET"], early_recompute=1.0)
+
+    event = {
+        "path": "/test/1",
+        "httpMethod": "GET",
+        "headers": {},
+        "queryStringParameters": {},
+    }
+    res = app(event, {})
+    assert res["body"] == "heyyyy"
+    value = cache.set.call_args[0][1]
+    # default to the backend timeout
+    assert value[3]["expires"] - value[3]["created"] == 3600
+    assert value[3]["delta"] >= 0
+    assert not cache.set.call_args[1]["ttl"]
+
+    funct.reset_mock()
+    funct.return_value = ("OK", "text/plain", "yoooo")
+    now = time.time()
+    cache.get.return_value = (
+        "OK",
+        "text/plain",
+        "heyyyy",
+        {"expires": now + 1000, "delta": 1},
+    )
+    res = app(event, {})
+    assert res["body"] == "heyyyy"
+    funct.assert_not_called()
+
+    cache.get.return_value = (
+        "OK",
+        "text/plain",
+        "heyyyy",
+        {"expires": now + 0.1, "delta": 10},
+    )
+    with patch("lambda_proxy_cache.entry.random.random", return_value=0.5):
+        res = app(event, {})
+    assert res["body"] == "yoooo"
+    funct.assert_called_once()
+    assert app.stats["early_recomputes"] == 1
+
+    # the cached value is still valid if the endpoint fails
+    funct.side_effect = ValueError("nope")
+    with patch("lambda_proxy_cache.entry.random.random", return_value=0.5):
+        res = app(event, {})
+    assert res["body"] == "heyyyy"
+
+    for h in app.log.handlers:
+        app.log.removeHandler(h)
+
+
+def test_proxy_API_cacheTTL():
+    """Test per-route ttl."""
+    cache = Mock(LambdaProxyCacheBase)
+    cache.get.return_value = None
+
+    app = proxy.API(name="test", cache_layer=cache)
+    funct = Mock(__name__="Mock", return_value=("OK", "text/plain", "heyyyy"))
+    app._add_route("/maxage/<int:id>", funct, cache_control="public,max-age=3600")
+    app._add_route("/smaxage/<int:id>", funct, cache_control="max-age=60, s-maxage=600")
+    app._add_route(
+        "/explicit/<int:id>", funct, cache_control="max-age=3600", cache_ttl=10
+    )
+    app._add_route("/nottl/<int:id>", funct, cache_control="no-cache")
+
+    for path, ttl in [
+        ("/maxage/1", 3600),
+        ("/smaxage/1", 600),
+        ("/explicit/1", 10),
+        ("/nottl/1", None),
+    ]:
+        event = {
+            "path": path,
+            "httpMethod": "GET",
+            "headers": {},
+            "queryStringParameters": {},
+        }
+        app(event, {})
+        assert cache.set.call_args[1]["ttl"] == ttl
+
+    # max-age=0: not stored (instead of stored with the cache layer default)
+    cache.set.reset_mock()
+    app._add_route(
+        "/zero/<int:id>", funct, cache_control="max-age=0", cache_rendered=True
+    )
+    event = {
+        "path": "/zero/1",
+        "httpMethod": "GET",
+        "headers": {},
+        "queryStringParameters": {},
+    }
+    assert app(event, {})["body"] == "heyyyy"
+    cache.set.assert_not_called()
+
+    for h in app.log.handlers:
+        app.log.removeHandler(h)
+
+
+def test_proxy_API_cacheCompression():
+    """Test compressed cache entries."""
+    cache = Mock(LambdaProxyCacheBase)
+    cache.get.return_value = None
+
+    app = proxy.API(name="test", cache_layer=cache)
+    funct = Mock(__name__="Mock", return_value=("OK", "text/plain", "heyyyy" * 100))
+    app._add_route(
+        "/test/<int:id>",
+        funct,
+        methods=["GET"],
+        payload_compression_method="gzip",
+        binary_b64encode=True,
+    )
+    app._add_route("/raw/<int:id>", funct, methods=["GET"], cache_compression="zlib")
+
+    event = {
+        "path": "/test/1",
+        "httpMethod": "GET",
+        "headers": {"Accept-Encoding": "gzip, deflate"},
+        "queryStringParameters": {},
+    }
+    computed = app(event, {})
+    assert computed["headers"]["Content-Encoding"] == "gzip"
+    value = cache.set.call_args[0][1]
+    assert value[3] == {"encoding": "gzip", "text": True}
+    assert zlib.decompress(value[2], zlib.MAX_WBITS | 16) == b"heyyyy" * 100
+
+    # stored payload is returned as is
+    cache.get.return_value = value
+    with patch("lambda_proxy_cache.proxy.decompress") as decompress:
+        assert app(event, {}) == computed
+        decompress.assert_not_called()
+
+    # client does not accept gzip
+    event["headers"] = {}
+    res = app(event, {})
+    assert res["body"] == "heyyyy" * 100
+    assert "Content-Encoding" not in res["headers"]
+
+    # storage only compression
+    cache.get.return_value = None
+    event["path"] = "/raw/1"
+    app(event, {})
+    value = cache.set.call_args[0][1]
+    assert value[3] == {"encoding": "zlib", "text": True}
+    cache.get.return_value = value
+    res = app(event, {})
+    assert res["body"] == "heyyyy" * 100
+
+    with pytest.raises(ValueError):
+        app._add_route("/yo", funct, cache_compression="br")
+
+    for h in app.log.handlers:
+        app.log.removeHandler(h)
+
+
+def test_proxy_API_cacheRendered():
+    """Test rendered responses caching."""
+    cache = MemoryCache()
+
+    app = proxy.API(name="test", cache_layer=cache)
+    funct = Mock(__name__="Mock", return_value=("OK", "text/plain", "heyyyy" * 100))
+    app._add_route(
+        "/test/<int:id>",
+        funct,
+        methods=["GET"],
+        cors=True,
+        payload_compression_method="gzip",
+        binary_b64encode=True,
+        cache_rendered=True,
+    )
+
+    event = {
+        "path": "/test/1",
+        "httpMethod": "GET",
+        "headers": {"Accept-Encoding": "gzip"},
+        "queryStringParameters": {},
+    }
+    gzip_response = app(event, {})
+    assert gzip_response["headers"]["Content-Encoding"] == "gzip"
+    funct.assert_called_once()
+
+    event["headers"] = {}
+    identity_response = app(event, {})
+    assert "Content-Encoding" not in identity_response["headers"]
+    # rendered from the shared endpoint response entry
+    funct.assert_called_once()
+    assert len(cache) == 3
+
+    with patch.object(app, "_render") as render:
+        assert app(event, {}) == identity_response
+        event["headers"] = {"Accept-Encoding": "gzip, br"}
+        assert app(event, {}) == gzip_response
+        render.assert_not_called()
+    assert app.stats["rendered_hits"] == 2
+
+    for h in app.log.handlers:
+        app.log.removeHandler(h)
+
+
+def test_proxy_API_cacheRenderedStale():
+    """Should not store stale rendered responses."""
+    cache = MemoryCache()
+
+    app = proxy.API(name="test", cache_layer=cache)
+    funct = Mock(__name__="Mock", return_value=("OK", "text/plain", "v2"))
+    app._add_route(
+        "/test/<int:id>",
+        funct,
+        methods=["GET"],
+        cache_ttl=1,
+        stale_while_revalidate=30,
+        stale_if_error=60,
+        cache_rendered=True,
+    )
+
+    event = {
+        "path": "/test/1",
+        "httpMethod": "GET",
+        "headers": {},
+        "queryStringParameters": {},
+    }
+    key = app.routes[-1].cache_key.build({"id": 1})
+    rendered_key = f"{key}.identity"
+    now = time.time()
+    meta = dict(created=now - 10, expires=now - 5, delta=0.1)
+    cache.set(key, ("OK", "text/plain", "v1", meta))
+
+    # stale-while-revalidate hit
+    assert app(event, {})["body"] == "v1"
+    _wait_for(lambda: cache.get(key)[2] == "v2")
+    assert cache.get(rendered_key) is None
+
+    # revalidated entry
+    assert app(event, {})["body"] == "v2"
+    assert cache.get(rendered_key)["body"] == "v2"
+    assert app(event, {})["body"] == "v2"
+    assert app.stats["rendered_hits"] == 1
+
+    # stale-if-error fallback
+    cache.clear()
+    meta = dict(created=now - 100, expires=now - 40, delta=0.1)
+    cache.set(key, ("OK", "text/plain", "v1", meta))
+    funct.side_effect = Exception("nope")
+    assert app(event, {})["body"] == "v1"
+    assert app.stats["stale_if_error"] == 1
+    assert cache.get(rendered_key) is None
+
+    for h in app.log.handlers:
+        app.log.removeHandler(h)
+
+
+def test_proxy_API_writeBehind():
+    """Test write-behind cache population."""
+    cache = Mock(LambdaProxyCacheBase)
+    cache.get.return_value = None
+    written = threading.Event()
+    cache.set.side_effect = lambda *args, **kwargs: written.wait(1)
+
+    app = proxy.API(name="test", cache_layer=cache, write_behind=True)
+    funct = Mock(__name__="Mock", return_value=("OK", "text/plain", "heyyyy"))
+    app._add_route("/test/<int:id>", funct, methods=["GET"], cache_ttl=60)
+
+    event = {
+        "path": "/test/1",
+        "httpMethod": "GET",
+        "headers": {},
+        "queryStringParameters": {},
+    }
+    # the response does not wait for the write
+    start = time.time()
+    res = app(event, {})
+    assert res["body"] == "heyyyy"
+    assert time.time() - start < 0.2
+    assert app.write_behind.stats["flush_timeouts"] == 1
+    _wait_for(lambda: cache.set.called)
+    assert cache.set.call_args[1]["ttl"] == 60
+
+    written.set()
+    app.write_behind.flush_timeout = None
+    assert app.write_behind.flush()
+    assert app.write_behind.stats["written"] == 1
+
+    # bounded wait, within the invocation deadline
+    written.clear()
+    app.write_behind.flush_timeout = 5
+    context = Mock(get_remaining_time_in_millis=Mock(return_value=300))
+    start = time.time()
+    assert app(event, context)["body"] == "heyyyy"
+    assert 0.15 < time.time() - start < 0.5
+    assert app.write_behind.stats["flush_timeouts"] == 2
+    written.set()
+
+    for h in app.log.handlers:
+        app.log.removeHandler(h)
+
+
+def test_proxy_API_prefetch():
+    """Test related requests prefetching."""
+    cache = MemoryCache()
+
+    def neighbours(z, x, y, **kwargs):
+        return [dict(z=z, x=x + dx, y=y, **kwargs) for dx in [-1, 0, 1]]
+
+    app = proxy.API(name="test", cache_layer=cache, prefetch_budget=0.5)
+    funct = Mock(__name__="Mock", return_value=("OK", "text/plain", "heyyyy"))
+    app._add_route(
+        "/tiles/<int:z>/<int:x>/<int:y>", funct, methods=["GET"], prefetch=neighbours
+    )
+
+    event = {
+        "path": "/tiles/1/2/3",
+        "httpMethod": "GET",
+        "headers": {},
+        "queryStringParameters": {"scale": "2"},
+    }
+    with patch.object(cache, "set_many", wraps=cache.set_many) as set_many:
+        app(event, {})
+        _wait_for(lambda: set_many.called)
+        set_many.assert_called_once()
+    assert funct.call_count == 3
+    funct.assert_any_call(z=1, x=3, y=3, scale="2")
+    assert len(cache) == 3
+    assert app.stats["prefetch_computed"] == 2
+
+    # prefetched neighbour is a hit and its own neighbours are cached or computed
+    event["path"] = "/tiles/1/3/3"
+    app(event, {})
+    _wait_for(lambda: app.stats["prefetch_computed"] == 3)
+    assert funct.call_count == 4
+    assert app.stats["prefetch_hits"] == 1
+
+    # the response does not wait for the prefetched responses
+    def slow(z, x, y, **kwargs):
+        if x != 10:
+            time.sleep(0.3)
+        return ("OK", "text/plain", "heyyyy")
+
+    funct.side_effect = slow
+    app.prefetch_budget = 0.1
+    event["path"] = "/tiles/1/10/3"
+    start = time.time()
+    app(event, {})
+    assert time.time() - start < 0.1
+    assert len(cache) == 5
+
+    # late responses are stored when they are done
+    _wait_for(lambda: app.stats["prefetch_timeouts"] == 2)
+    _wait_for(lambda: len(cache) == 7)
+
+    # skipped when the invocation is about to time out
+    event["path"] = "/tiles/1/20/3"
+    context = Mock(get_remaining_time_in_millis=Mock(return_value=50))
+    app(event, context)
+    assert app.stats["prefetch_skipped"] == 1
+
+    for h in app.log.handlers:
+        app.log.removeHandler(h)
+
+
+def test_proxy_API_circuitBreaker():
+    """Test invocation deadline with a circuit breaker."""
+    cache = CircuitBreakerCache(MemoryCache(time=60))
+    app = proxy.API(name="test", cache_layer=cache)
+    funct = Mock(__name__="Mock", return_value=("OK", "text/plain", "heyyyy"))
+    app._add_route("/test/<int:id>", funct, methods=["GET"])
+
+    event = {
+        "path": "/test/1",
+        "httpMethod": "GET",
+        "headers": {},
+        "queryStringParameters": {},
+    }
+    context = Mock(get_remaining_time_in_millis=Mock(return_value=3000))
+    with patch.object(cache, "set_deadline", wraps=cache.set_deadline) as deadline:
+        assert app(event, context)["body"] == "heyyyy"
+        assert deadline.call_args[0][0] == pytest.approx(time.time() + 3, abs=0.5)
+    assert app(event, context)["body"] == "heyyyy"
+    funct.assert_called_once()
+    # entries ttl comes from the wrapped backend
+    assert cache.timeout == 60
+
+    for h in app.log.handlers:
+        app.log.removeHandler(h)
+
+
+def test_proxy_API_hedge():
+    """Test hedged cache reads."""
+    cache = MemoryCache()
+    app = proxy.API(name="test", cache_layer=cache, hedge=Hedge(delay=0.05))
+    funct = Mock(__name__="Mock", return_value=("OK", "text/plain", "heyyyy"))
+    app._add_route("/test/<int:id>", funct, methods=["GET"])
+
+    event = {
+        "path": "/test/1",
+        "httpMethod": "GET",
+        "headers": {},
+        "queryStringParameters": {},
+    }
+    assert app(event, {})["body"] == "heyyyy"
+    assert app(event, {})["body"] == "heyyyy"
+    funct.assert_called_once()
+    assert app.hedge.stats["reads"] == 2
+    assert not app.hedge.stats["fired"]
+
+    # duplicate read when the first one is slow
+    reads = []
+
+    def get(key):
+        reads.append(key)
+        if len(reads) == 1:
+            time.sleep(0.3)
+        return MemoryCache.get(cache, key)
+
+    with patch.object(cache, "get", side_effect=get):
+        start = time.time()
+        assert app(event, {})["body"] == "heyyyy"
+        assert time.time() - start < 0.2
+    assert app.hedge.stats["fired"] == 1
+    assert app.hedge.stats["won"] == 1
+    funct.assert_called_once()
+
+    # endpoint computation when the read is slow
+    app.hedge = Hedge(delay=0.05, compute=True)
+    with patch.object(cache, "get", side_effect=lambda key: time.sleep(0.3)):
+        start = time.time()
+        assert app(event, {})["body"] == "heyyyy"
+        assert time.time() - start < 0.2
+    assert funct.call_count == 2
+    assert app.hedge.stats["won"] == 1
+
+    # a miss waits for the hedge computation
+    funct.side_effect = lambda id: time.sleep(0.2) or ("OK", "text/plain", "yo")
+    event["path"] = "/test/2"
+    with patch.object(cache, "get", side_effect=lambda key: time.sleep(0.1) or None):
+        assert app(event, {})["body"] == "yo"
+    assert funct.call_count == 3
+    assert app.hedge.stats["won"] == 2
+
+    for h in app.log.handlers:
+        app.log.removeHandler(h)
+
+
+def test_proxy_API_singleFlightStale():
+    """Test single-flight followers do not serve the expired entry."""
+    cache = MemoryCache()
+    app = proxy.API(
+        name="test",
+        cache_layer=cache,
+        single_flight=SingleFlight(wait=1, poll_interval=0.01),
+    )
+    funct = Mock(__name__="Mock", return_value=("OK", "text/plain", "heyyyy"))
+    app._add_route(
+        "/test/<int:id>", funct, methods=["GET"], cache_ttl=10, stale_if_error=600
+    )
+
+    event = {
+        "path": "/test/1",
+        "httpMethod": "GET",
+        "headers": {},
+        "queryStringParameters": {},
+    }
+    key = app.routes[-1].cache_key.build({"id": 1})
+    now = time.time()
+    cache.set(
+        key, ("OK", "text/plain", "old", dict(created=now - 20, expires=now - 10))
+    )
+
+    # another container holds the lease and stores a new entry
+    assert cache.add(f"{key}.lease", "token")
+    new = ("OK", "text/plain", "new", dict(created=now, expires=now + 60))
+    threading.Timer(0.1, lambda: cache.set(key, new)).start()
+    assert app(event, {})["body"] == "new"
+    funct.assert_not_called()
+    assert app.single_flight.stats["waited"] == 1
+
+    for h in app.log.handlers:
+        app.log.removeHandler(h)
@@ -0,0 +1,111 @@
+"""Test lambda-proxy-cache redis backend."""
+
+import time
+
+from lambda_proxy_cache.backends.redis import RedisCache, get_pool
+
+
+class FakeRedis(object):
+    """In-process redis stand-in."""
+
+    def __init__(self):
+        """Initialize database."""
+        self.data = {}
+
+    def _get(self, key):
+        value, expires = self.data.get(key, (None, None))
+        if expires is not None and expires <= time.time():
+            self.data.pop(key)
+            return None
+        return value
+
+    def set(self, key, value, ex=None, nx=False):
+        """SET."""
+        assert isinstance(value, bytes)
+        if nx and self._get(key) is not None:
+            return None
+        self.data[key] = (value, time.time() + ex if ex else None)
+        return True
+
+    def get(self, key):
+        """GET."""
+        return self._get(key)
+
+    def mget(self, keys):
+        """MGET."""
+        return [self._get(key) for key in keys]
+
+    def delete(self, key):
+        """DEL."""
+        return 1 if self.data.pop(key, None) else 0
+
+    def pipeline(self, transaction=True):
+        """Create pipeline."""
+        return FakePipeline(self)
+
+
+class FakePipeline(object):
+    """In-process redis pipeline stand-in."""
+
+    def __init__(self, client):
+        """Initialize pipeline."""
+        self.client = client
+        self.commands = []
+
+    def set(self, *args, **kwargs):
+        """Queue SET."""
+        self.commands.append((args, kwargs))
+
+    def execute(self, raise_on_error=True):
+        """Run queued commands."""
+        return [self.client.set(*args, **kwargs) for args, kwargs in self.commands]
+
+
+def test_RedisCache():
+    """Should store binary-safe entries with ttl."""
+    client = FakeRedis()
+    cache = RedisCache(client=client, time=60)
+    value = ("OK", "image/png", b"\x89PNG\r\n\x00")
+    assert cache.set("key", value)
+    assert cache.get("key") == value
+    assert client.data["key"][1] <= time.time() + 60
+
+    assert cache.set("short", value, ttl=1)
+    client.data["short"] = (client.data["short"][0], time.time() - 1)
+    assert not cache.get("short")
+
+    assert not cache.add("key", value)
+    assert cache.add("lease", "uuid", ttl=10)
+    assert cache.get("lease") == "uuid"
+
+    assert cache.delete("key")
+    assert not cache.get("key")
+    assert not cache.delete("key")
+
+
+def test_RedisCache_many():
+    """Should use MGET and pipelines."""
+    client = FakeRedis()
+    cache = RedisCache(client=client)
+    assert cache.set_many({"a": ("OK", "text/plain", "a"), "b": "b"}, ttl=10) == []
+    assert cache.get_many(["a", "b", "c"]) == {"a": ("OK", "text/plain", "a"), "b": "b"}
+    assert cache.get_many([]) == {}
+
+
+def test_RedisCache_pool():
+    """Should share connection pools and fail silently when redis is down."""
+    cache = RedisCache(port=1, socket_connect_timeout=0.1)
+    assert (
+        cache.client.connection_pool
+        is RedisCache(port=1, socket_connect_timeout=0.1).client.connection_pool
+    )
+    assert get_pool("redis://localhost:1/0") is not cache.client.connection_pool
+
+    kwargs = cache.client.connection_pool.connection_kwargs
+    assert kwargs["port"] == 1
+    assert not kwargs["decode_responses"]
+
+    assert not cache.set("key", "value")
+    assert not cache.get("key")
+    assert cache.get_many(["key"]) == {}
+    assert cache.set_many({"key": "value"}) == ["key"]
@@ -0,0 +1,99 @@
+"""Test lambda-proxy-cache request coalescing."""
+
+import time
+import threading
+
+import pytest
+from mock import Mock
+
+from lambda_proxy_cache.backends.memcache import MemcachedCache
+from lambda_proxy_cache.backends.memory import MemoryCache
+from lambda_proxy_cache.singleflight import SingleFlight
+
+
+def test_SingleFlight_threads():
+    """Should compute only once for concurrent threads."""
+    cache = MemoryCache()
+    flight = SingleFlight()
+
+    def compute():
+        time.sleep(0.2)
+        cache.set("key", ("OK", "text/plain", "heyyyy"))
+        return ("OK", "text/plain", "heyyyy")
+
+    compute = Mock(side_effect=compute)
+    results = []
+
+    def run():
+        results.append(flight.do(cache, "key", compute))
+
+    threads = [threading.Thread(target=run) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    compute.assert_called_once()
+    assert results == [("OK", "text/plain", "heyyyy")] * 5
+    assert flight.stats["coalesced"] == 4
+    assert flight.stats["leases"] == 1
+    # lease is released
+    assert not cache.get("key.lease")
+
+
+def test_SingleFlight_lease():
+    """Should wait for the lease holder result."""
+    cache = MemoryCache()
+    flight = SingleFlight(wait=1, poll_interval=0.01)
+    compute = Mock(return_value=("OK", "text/plain", "heyyyy"))
+
+    # Another invocation holds the lease
+    assert cache.add("key.lease", "token")
+    threading.Timer(0.1, lambda: cache.set("key", ("OK", "text/plain", "yo"))).start()
+    assert flight.do(cache, "key", compute) == ("OK", "text/plain", "yo")
+    compute.assert_not_called()
+    assert flight.stats["waited"] == 1
+
+    # Expired entry still stored: only a newer entry is the lease holder result
+    stale = ("OK", "text/plain", "old", {"created": 1, "expires": 2})
+    cache.set("stale", stale)
+    assert cache.add("stale.lease", "token")
+    fresh = ("OK", "text/plain", "new", {"created": 3, "expires": 4})
+    threading.Timer(0.1, lambda: cache.set("stale", fresh)).start()
+    assert flight.do(cache, "stale", compute, seen=stale) == fresh
+    compute.assert_not_called()
+
+    # Lease holder never stores the result
+    assert cache.add("other.lease", "token")
+    assert flight.do(cache, "other", compute, timeout=0.05) == compute.return_value
+    compute.assert_called_once()
+    assert flight.stats["wait_timeouts"] == 1
+
+
+def test_SingleFlight_error():
+    """Should raise endpoint errors and release the lease."""
+    cache = MemoryCache()
+    flight = SingleFlight()
+    with pytest.raises(ValueError):
+        flight.do(cache, "key", Mock(side_effect=ValueError("nope")))
+    assert not cache.get("key.lease")
+
+    compute = Mock(return_value=("OK", "text/plain", "heyyyy"))
+    flight = SingleFlight(distributed=False)
+    assert flight.do(cache, "key", compute)
+    assert not flight.stats["leases"]
+
+
+def test_SingleFlight_cacheError():
+    """Should not wait for a lease holder when the cache layer fails."""
+    # nothing listens on port 1: the lease is refused
+    cache = MemcachedCache(servers=["127.0.0.1:1"])
+    flight = SingleFlight(wait=5)
+    compute = Mock(return_value=("OK", "text/plain", "heyyyy"))
+
+    start = time.time()
+    assert flight.do(cache, "key", compute) == compute.return_value
+    assert time.time() - start < 1
+    compute.assert_called_once()
+    assert flight.stats["lease_errors"] == 1
+    assert not flight.stats["wait_timeouts"]
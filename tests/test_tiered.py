@@ -0,0 +1,131 @@
+"""Test lambda-proxy-cache tiered backend."""
+
+import time
+
+import pytest
+from mock import Mock
+
+from lambda_proxy_cache.backends.base import LambdaProxyCacheBase
+from lambda_proxy_cache.backends.memory import MemoryCache
+from lambda_proxy_cache.backends.tiered import Tier, TieredCache
+from lambda_proxy_cache.entry import EXPIRY
+
+
+def test_TieredCache():
+    """Should read through tiers and promote hits."""
+    l1 = MemoryCache()
+    l2 = Mock(LambdaProxyCacheBase)
+    l2.get.return_value = None
+    l3 = Mock(LambdaProxyCacheBase)
+    l3.get.return_value = ("OK", "text/plain", "heyyyy")
+
+    cache = TieredCache([l1, Tier(l2, ttl=60), l3])
+    assert cache.get("key") == ("OK", "text/plain", "heyyyy")
+    assert l1.get("key") == ("OK", "text/plain", "heyyyy")
+    l2.set.assert_called_with("key", ("OK", "text/plain", "heyyyy"), ttl=60)
+    l3.set.assert_not_called()
+    assert cache.stats["tier2_hits"] == 1
+
+    l3.reset_mock()
+    assert cache.get("key")
+    l3.get.assert_not_called()
+    assert cache.stats["tier0_hits"] == 1
+
+    l3.get.return_value = None
+    assert not cache.get("nope")
+    assert cache.stats["misses"] == 1
+
+
+def test_TieredCache_many():
+    """Should read through tiers in batches and promote hits."""
+    l1 = MemoryCache()
+    l1.set("a", ("OK", "text/plain", "a"))
+    l2 = Mock(LambdaProxyCacheBase)
+    l2.get_many.return_value = {"b": ("OK", "text/plain", "b")}
+    l2.set_many.return_value = ["a"]
+
+    cache = TieredCache([l1, l2])
+    assert cache.get_many(["a", "b", "c"]) == {
+        "a": ("OK", "text/plain", "a"),
+        "b": ("OK", "text/plain", "b"),
+    }
+    l2.get_many.assert_called_once_with(["b", "c"])
+    assert l1.get("b")
+    assert cache.stats["tier0_hits"] == 1
+    assert cache.stats["tier1_hits"] == 1
+    assert cache.stats["misses"] == 1
+
+    # stored if written to one of the tiers
+    assert cache.set_many({"a": "a", "d": "d"}) == []
+
+
+def test_TieredCache_write():
+    """Should write to write-through tiers."""
+    l1 = Mock(LambdaProxyCacheBase)
+    l1.set.return_value = True
+    l2 = Mock(LambdaProxyCacheBase)
+
+    cache = TieredCache([Tier(l1, ttl=10), Tier(l2, write="around")])
+    assert cache.set("key", ("OK", "text/plain", "heyyyy"))
+    l1.set.assert_called_once_with("key", ("OK", "text/plain", "heyyyy"), ttl=10)
+    l2.set.assert_not_called()
+
+    cache = TieredCache([Tier(l1), Tier(l2)])
+    cache.set("key", ("OK", "text/plain", "heyyyy"), ttl=3600)
+    assert l2.set.call_args[1]["ttl"] == 3600
+    # entries carry their expiry
+    value = l2.set.call_args[0][1]
+    assert value[:3] == ("OK", "text/plain", "heyyyy")
+    assert value[3][EXPIRY] == pytest.approx(time.time() + 3600, abs=5)
+
+
+def test_TieredCache_promoteTTL():
+    """Should not keep promoted entries longer than their time to live."""
+    l1 = MemoryCache(time=432000)
+    l2 = MemoryCache()
+    cache = TieredCache([Tier(l1, write="around"), l2])
+
+    value = ("OK", "text/plain", "heyyyy", {"created": 1})
+    assert cache.set("key", value, ttl=60)
+    assert cache.get("key") == value
+    # promoted with the entry remaining time to live
+    assert l1._entries["key"][1] == pytest.approx(time.time() + 60, abs=5)
+
+    cache.set("page", {"statusCode": 200, "body": "heyyyy"}, ttl=30)
+    l1.clear()
+    assert cache.get_many(["key", "page"]) == {
+        "key": value,
+        "page": {"statusCode": 200, "body": "heyyyy"},
+    }
+    assert l1._entries["page"][1] == pytest.approx(time.time() + 30, abs=5)
+
+    # the faster tier time to live is a maximum
+    cache = TieredCache([Tier(MemoryCache(), ttl=10), l2])
+    assert cache.get("key") == value
+    expires = cache.tiers[0].backend._entries["key"][1]
+    assert expires == pytest.approx(time.time() + 10, abs=5)
+
+    # expired entries (e.g. not yet deleted by the backend) are misses
+    l2.set("old", ("OK", "text/plain", "old", {EXPIRY: time.time() - 1}))
+    assert cache.get("old") is None
+    assert cache.get_many(["old"]) == {}
+
+    # other sequences are stored as they are
+    cache.set("list", [1, 2, 3, 4], ttl=60)
+    assert cache.get("list") == [1, 2, 3, 4]
+
+    # entries without time to live are promoted with the tier settings
+    cache.set("forever", ("OK", "text/plain", "heyyyy"))
+    assert l2.get("forever") == ("OK", "text/plain", "heyyyy")
+
+
+def test_TieredCache_invalid():
+    """Should raise errors."""
+    with pytest.raises(ValueError):
+        TieredCache([])
+
+    with pytest.raises(ValueError):
+        Tier(MemoryCache(), write="back")
+
+    with pytest.raises(TypeError):
+        TieredCache([Mock()])
@@ -0,0 +1,57 @@
+"""Test lambda-proxy-cache write-behind queue."""
+
+import time
+import threading
+
+from mock import Mock
+
+from lambda_proxy_cache.backends.memory import MemoryCache
+from lambda_proxy_cache.writebehind import WriteBehind
+
+
+def test_WriteBehind_flush():
+    """Should write entries in the background and wait for them on flush."""
+    cache = MemoryCache()
+    writer = WriteBehind(flush_timeout=None)
+    assert writer.put(cache, "key", ("OK", "text/plain", "heyyyy"), ttl=10)
+    assert writer.flush()
+    assert cache.get("key") == ("OK", "text/plain", "heyyyy")
+    assert writer.stats["written"] == 1
+    assert writer.stats["flushes"] == 1
+
+
+def test_WriteBehind_deadline():
+    """Should stop waiting before the invocation deadline."""
+    release = threading.Event()
+    cache = Mock(set=Mock(side_effect=lambda *args, **kwargs: release.wait()))
+    writer = WriteBehind(flush_timeout=None, margin=0.1)
+    writer.put(cache, "key", "value")
+
+    start = time.time()
+    assert not writer.flush(remaining_time=0.2)
+    assert time.time() - start < 0.5
+    assert writer.stats["flush_timeouts"] == 1
+    assert writer.flush_time > 0
+
+    writer.flush_timeout = 0
+    assert not writer.flush()
+
+    release.set()
+    writer.flush_timeout = None
+    assert writer.flush()
+
+
+def test_WriteBehind_dropped():
+    """Should drop writes when the queue is full."""
+    release = threading.Event()
+    cache = Mock(set=Mock(side_effect=lambda *args, **kwargs: release.wait()))
+    writer = WriteBehind(max_size=1, flush_timeout=1)
+    assert writer.put(cache, "a", "value")
+    time.sleep(0.05)  # "a" is being written
+    assert writer.put(cache, "b", "value")
+    assert not writer.put(cache, "c", "value")
+    assert writer.stats["dropped"] == 1
+
+    release.set()
+    assert writer.flush()
+    assert writer.stats["written"] == 2